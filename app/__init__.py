@@ -1,6 +1,6 @@
 from flask import Flask
 from .config import Config
-from .extensions import db, login_manager, bcrypt, migrate, session
+from .extensions import db, login_manager, bcrypt, migrate, session, model_registry
 from app.monitoring import APIMonitor, SystemMonitor
 import colorlog
 from app.colorlog import configure_logger
@@ -16,6 +16,7 @@ def create_app(config_class=Config):
     login_manager.init_app(app)
     bcrypt.init_app(app)
     migrate.init_app(app, db)
+    model_registry.init_app(app)
 
     app.config['SESSION_TYPE'] = 'filesystem'
     session.init_app(app)
@@ -61,6 +62,10 @@ def create_app(config_class=Config):
         db.create_all()
         create_admin_user(app)
 
+    # Initialize background ingestion of uploaded syllabi
+    from app.services.ingestion_queue import IngestionQueue
+    app.ingestion_queue = IngestionQueue(app)
+
     # Ensure required directories exist
     os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
     os.makedirs(os.path.dirname(app.config['LOG_FILE']), exist_ok=True)
@@ -1,5 +1,6 @@
 # app/config.py
 import os
+import tempfile
 from datetime import timedelta
 
 class Config:
@@ -20,13 +21,143 @@ class Config:
     PERMANENT_SESSION_LIFETIME = timedelta(minutes=60)
     MAX_CHUNK_SIZE = 1000
     CHUNK_OVERLAP = 100
-    EMBEDDING_BATCH_SIZE = 8
+    # Encoding batches are bucketed by length and limited to the padded-token
+    # cost of EMBEDDING_BATCH_SIZE full-length sequences, so short chunks run
+    # in larger batches, up to MAX_BATCH_SIZE_EMBEDDINGS texts per pass
+    EMBEDDING_BATCH_SIZE = int(os.environ.get('EMBEDDING_BATCH_SIZE', 16))
     VECTOR_STORE_BATCH_SIZE = 50
-    MAX_BATCH_SIZE_EMBEDDINGS = 4
+    MAX_BATCH_SIZE_EMBEDDINGS = int(os.environ.get('MAX_BATCH_SIZE_EMBEDDINGS', 128))
+    # Chunks gathered from the ingestion stream per length-sorting window
+    EMBEDDING_SORT_WINDOW = 256
     MAX_BATCH_SIZE_STORAGE = 25
-    TEXT_CHUNK_SIZE = 1000
-    TEXT_CHUNK_OVERLAP = 100
+    # Chunk size and overlap are measured in TEXT_CHUNK_ENCODING tokens
+    TEXT_CHUNK_SIZE = 200
+    TEXT_CHUNK_OVERLAP = 20
+    TEXT_CHUNK_ENCODING = 'cl100k_base'
     CHUNK_PROCESSING_THRESHOLD = 100
+
+    # PDFs with at least this many pages are extracted across a process pool
+    PDF_PARALLEL_PAGE_THRESHOLD = 100
+    PDF_EXTRACTION_WORKERS = int(os.environ.get('PDF_EXTRACTION_WORKERS', min(4, os.cpu_count() or 1)))
+    PDF_PAGES_PER_TASK = 20
+
+    # Shared embedding model and vector store (see app/services/model_registry.py)
+    EMBEDDING_MODEL_NAME = 'paraphrase-MiniLM-L6-v2'
+    # 'sentence-transformers', 'sentence-transformers-quantized' or 'hashing'
+    EMBEDDING_BACKEND = os.environ.get('EMBEDDING_BACKEND', 'sentence-transformers')
+    # Quantized backend only: 'int8' on CPU, 'float16' on a GPU
+    EMBEDDING_PRECISION = os.environ.get('EMBEDDING_PRECISION', 'int8')
+    # Hashing backend only
+    EMBEDDING_DIMENSION = 384
+    CHROMA_PERSIST_DIR = os.path.join(tempfile.gettempdir(), "chroma_db")
+    # 'chroma', or 'numpy' for memory-mapped per-syllabus matrices searched by
+    # brute force (see app/services/numpy_vector_store.py)
+    VECTOR_STORE_BACKEND = os.environ.get('VECTOR_STORE_BACKEND', 'chroma')
+    NUMPY_VECTOR_STORE_DIR = os.path.join(tempfile.gettempdir(), "numpy_vectors")
+    # 'float16' halves the store's disk and page-cache footprint
+    NUMPY_VECTOR_STORE_DTYPE = os.environ.get('NUMPY_VECTOR_STORE_DTYPE', 'float32')
+    PRELOAD_EMBEDDING_MODEL = os.environ.get('PRELOAD_EMBEDDING_MODEL', '').lower() in ('1', 'true', 'yes')
+    # On-disk cache of chunk embeddings, keyed by model and normalized chunk text
+    EMBEDDING_CACHE_ENABLED = True
+    EMBEDDING_CACHE_PATH = os.path.join(tempfile.gettempdir(), "embedding_cache.sqlite3")
+    EMBEDDING_CACHE_MAX_MB = 256
+
+    # 'hybrid' fuses BM25 and vector rankings and answers literal lookups
+    # lexically; 'vector' or 'lexical' use one only. A lookup is literal when
+    # the best BM25 hit has every query term and the query quotes a phrase it
+    # contains, names a number or course code, or (with two or more terms)
+    # the hit outscores the next by RETRIEVAL_LITERAL_MARGIN times
+    RETRIEVAL_MODE = os.environ.get('RETRIEVAL_MODE', 'hybrid')
+    RETRIEVAL_RRF_K = 60
+    RETRIEVAL_LITERAL_MARGIN = 2.0
+    # Restrict retrieval to one syllabus section (grading, schedule, ...) when
+    # the question clearly targets it and the section alone can fill the results
+    RETRIEVAL_SECTION_FILTER = os.environ.get('RETRIEVAL_SECTION_FILTER', 'true').lower() in ('1', 'true', 'yes')
+    # Per-syllabus BM25 indexes built at ingestion (see app/services/lexical_index.py)
+    LEXICAL_INDEX_DIR = os.path.join(tempfile.gettempdir(), "lexical_index")
+    LEXICAL_INDEX_MAX_LOADED = 64
+
+    # In-process LRU of question embeddings; hits skip the embedding model.
+    # Set a TTL in seconds to bound how long a vector can be reused
+    QUERY_EMBEDDING_CACHE_SIZE = int(os.environ.get('QUERY_EMBEDDING_CACHE_SIZE', 1024))
+    QUERY_EMBEDDING_CACHE_TTL = float(os.environ.get('QUERY_EMBEDDING_CACHE_TTL', 0)) or None
+    # Question embeddings from concurrent chat requests are encoded together:
+    # the dispatcher waits up to QUERY_BATCH_MAX_WAIT_MS after the first
+    # request, or until QUERY_BATCH_MAX_SIZE are waiting
+    QUERY_BATCH_ENABLED = os.environ.get('QUERY_BATCH_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+    QUERY_BATCH_MAX_WAIT_MS = float(os.environ.get('QUERY_BATCH_MAX_WAIT_MS', 5))
+    QUERY_BATCH_MAX_SIZE = int(os.environ.get('QUERY_BATCH_MAX_SIZE', 16))
+    # In-process cache of chat answers per syllabus. A question whose embedding
+    # is at least ANSWER_CACHE_THRESHOLD cosine-similar to a cached question
+    # gets its answer without an LLM call; re-ingesting the syllabus clears it
+    ANSWER_CACHE_ENABLED = os.environ.get('ANSWER_CACHE_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+    ANSWER_CACHE_SIZE = int(os.environ.get('ANSWER_CACHE_SIZE', 2048))
+    ANSWER_CACHE_TTL = float(os.environ.get('ANSWER_CACHE_TTL', 24 * 3600)) or None
+    ANSWER_CACHE_THRESHOLD = float(os.environ.get('ANSWER_CACHE_THRESHOLD', 0.95))
+    # Chat completions go through one pooled client (app/services/llm_client.py).
+    # At most LLM_MAX_CONCURRENCY calls run upstream at once; others wait up to
+    # LLM_QUEUE_TIMEOUT seconds for a slot. LLM_TIMEOUT is each call's deadline,
+    # spanning up to LLM_MAX_RETRIES jittered retries. With LLM_HEDGE_ENABLED a
+    # call slower than the recent p95 (at least LLM_HEDGE_MIN_DELAY) is raced
+    # against a second request
+    LLM_MODEL = os.environ.get('LLM_MODEL', 'gpt-3.5-turbo')
+    LLM_MAX_CONCURRENCY = int(os.environ.get('LLM_MAX_CONCURRENCY', 8))
+    LLM_TIMEOUT = float(os.environ.get('LLM_TIMEOUT', 30))
+    LLM_QUEUE_TIMEOUT = float(os.environ.get('LLM_QUEUE_TIMEOUT', 10))
+    LLM_MAX_RETRIES = int(os.environ.get('LLM_MAX_RETRIES', 2))
+    LLM_BACKOFF_BASE = float(os.environ.get('LLM_BACKOFF_BASE', 0.5))
+    LLM_BACKOFF_MAX = float(os.environ.get('LLM_BACKOFF_MAX', 4))
+    LLM_HEDGE_ENABLED = os.environ.get('LLM_HEDGE_ENABLED', 'false').lower() in ('1', 'true', 'yes')
+    LLM_HEDGE_MIN_DELAY = float(os.environ.get('LLM_HEDGE_MIN_DELAY', 1))
+    # 'openai', or 'fake' for a local stand-in with simulated latency, token
+    # rate and errors (see app/services/llm_providers.py). LLM_BASE_URL points
+    # the OpenAI provider at a compatible server, such as the fake one in
+    # app/services/fake_llm_server.py
+    LLM_PROVIDER = os.environ.get('LLM_PROVIDER', 'openai')
+    LLM_BASE_URL = os.environ.get('LLM_BASE_URL') or None
+    LLM_FAKE_LATENCY_MS = float(os.environ.get('LLM_FAKE_LATENCY_MS', 300))
+    LLM_FAKE_LATENCY_DISTRIBUTION = os.environ.get('LLM_FAKE_LATENCY_DISTRIBUTION', 'lognormal')
+    LLM_FAKE_TOKENS_PER_SECOND = float(os.environ.get('LLM_FAKE_TOKENS_PER_SECOND', 50))
+    LLM_FAKE_ERROR_RATE = float(os.environ.get('LLM_FAKE_ERROR_RATE', 0))
+    # Concurrent chat requests asking the same question about the same syllabus
+    # version share one retrieval and LLM call; each still gets its own Chat row
+    CHAT_COALESCING_ENABLED = os.environ.get('CHAT_COALESCING_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+    # In-process LRU of each syllabus's chunk texts, vectors and joined document
+    SYLLABUS_CACHE_MAX_ENTRIES = 256
+    SYLLABUS_CACHE_MAX_MB = 64
+
+    # Cross-syllabus content search: one document vector plus up to
+    # GLOBAL_SEARCH_SECTIONS section vectors per syllabus, built at ingestion.
+    # Search is a scan over every row, so each extra section adds about a
+    # third to latency (benchmarks/bench_search.py)
+    GLOBAL_SEARCH_DIR = os.path.join(tempfile.gettempdir(), "global_search")
+    GLOBAL_SEARCH_SECTIONS = 2
+    GLOBAL_SEARCH_MIN_SCORE = 0.1
+    GLOBAL_SEARCH_MAX_PER_PAGE = 50
+
+    # Chunks retrieved per question; syllabi with at most
+    # RETRIEVAL_FULL_DOCUMENT_MAX_CHUNKS chunks are sent whole instead
+    RETRIEVAL_TOP_K = 4
+    RETRIEVAL_FULL_DOCUMENT_MAX_CHUNKS = 4
+    # Candidates fetched for context assembly, which ranks them by maximal
+    # marginal relevance, drops near-duplicates and merges adjacent chunks
+    # until the prompt context reaches CONTEXT_TOKEN_BUDGET tokens
+    CONTEXT_CANDIDATES = 12
+    CONTEXT_TOKEN_BUDGET = 1500
+    CONTEXT_MMR_LAMBDA = 0.7
+    CONTEXT_DUPLICATE_SIMILARITY = 0.95
+
+    # Background ingestion of uploaded syllabi (see app/services/ingestion_queue.py)
+    INGESTION_MAX_CONCURRENT_JOBS = int(os.environ.get('INGESTION_MAX_CONCURRENT_JOBS', 2))
+    INGESTION_ASYNC = True
+    # Re-queue jobs a crashed process left unfinished at startup. Jobs past
+    # queueing count as abandoned once they started INGESTION_STALE_JOB_TIMEOUT
+    # seconds ago, so those live workers are still processing are left alone
+    INGESTION_RECOVER_ON_STARTUP = True
+    INGESTION_STALE_JOB_TIMEOUT = int(os.environ.get('INGESTION_STALE_JOB_TIMEOUT', 15 * 60))
+    # Re-indexing a revised syllabus only touches chunks whose text changed;
+    # disable to rebuild the collection from scratch every time
+    INGESTION_INCREMENTAL = True
     
     # Logging configuration
     LOG_DIR = os.path.join(BASE_DIR, 'logs')
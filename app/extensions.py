@@ -3,10 +3,12 @@ from flask_login import LoginManager
 from flask_bcrypt import Bcrypt
 from flask_migrate import Migrate
 from flask_session import Session
+from app.services.model_registry import ModelRegistry
 
 # Initialize extensions
 db = SQLAlchemy()
 login_manager = LoginManager()
 bcrypt = Bcrypt()
 migrate = Migrate()
-session = Session()
\ No newline at end of file
+session = Session()
+model_registry = ModelRegistry()
\ No newline at end of file
@@ -15,4 +15,12 @@ class SyllabusUploadForm(FlaskForm):
                                  FileRequired(),
                                  FileAllowed(['pdf'], 'PDF files only!')
                              ])
-    submit = SubmitField('Upload Syllabus')
\ No newline at end of file
+    submit = SubmitField('Upload Syllabus')
+
+class SyllabusRevisionForm(FlaskForm):
+    syllabus_file = FileField('Revised Syllabus PDF',
+                             validators=[
+                                 FileRequired(),
+                                 FileAllowed(['pdf'], 'PDF files only!')
+                             ])
+    submit = SubmitField('Upload Revision')
\ No newline at end of file
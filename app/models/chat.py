@@ -12,4 +12,6 @@ class Chat(db.Model):
     response = db.Column(db.Text, nullable=False)
     timestamp = db.Column(db.DateTime, default=datetime.utcnow)
     response_time = db.Column(db.Float)
+    time_to_first_token = db.Column(db.Float)  # Seconds until the first streamed token
+    from_cache = db.Column(db.Boolean, default=False, server_default=db.false())  # Answer reused from the answer cache
     error_type = db.Column(db.String(50))
\ No newline at end of file
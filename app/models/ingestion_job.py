@@ -0,0 +1,62 @@
+from app.extensions import db
+from datetime import datetime
+
+class IngestionJob(db.Model):
+    __tablename__ = 'ingestion_jobs'
+
+    QUEUED = 'queued'
+    EXTRACTING = 'extracting'
+    EMBEDDING = 'embedding'
+    STORING = 'storing'
+    DONE = 'done'
+    FAILED = 'failed'
+
+    STAGES = (EXTRACTING, EMBEDDING, STORING)
+    ACTIVE_STATUSES = (QUEUED, EXTRACTING, EMBEDDING, STORING)
+
+    id = db.Column(db.Integer, primary_key=True)
+    syllabus_id = db.Column(db.Integer, db.ForeignKey('syllabi.id'), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default=QUEUED)
+    progress = db.Column(db.JSON)  # Fraction complete per stage
+    result = db.Column(db.JSON)  # Stage statistics reported by process_pdf
+    error = db.Column(db.Text)
+    # Revised upload this job indexes; it replaces the syllabus's file once the job succeeds
+    file_path = db.Column(db.String(255))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+
+    @classmethod
+    def content_version(cls, syllabus_id):
+        """Stamp of a syllabus's last finished ingestion, or None if it has none.
+
+        It changes whenever the syllabus is re-indexed, even partially by a
+        failed job, and is read from the database, so every process sees the
+        same value. The finish time keeps it unique if SQLite reuses ids.
+        """
+        job = (db.session.query(cls.id, cls.finished_at)
+               .filter(cls.syllabus_id == syllabus_id, cls.finished_at.isnot(None))
+               .order_by(cls.id.desc())
+               .first())
+        return f"{job.id}:{job.finished_at.isoformat()}" if job is not None else None
+
+    @property
+    def is_active(self):
+        return self.status in self.ACTIVE_STATUSES
+
+    def to_dict(self):
+        progress = self.progress or {}
+        return {
+            'id': self.id,
+            'syllabus_id': self.syllabus_id,
+            'status': self.status,
+            'progress': {stage: progress.get(stage, 0.0) for stage in self.STAGES},
+            'result': self.result,
+            'error': self.error,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
+
+    def __repr__(self):
+        return f'<IngestionJob {self.id} {self.status}>'
@@ -14,4 +14,21 @@ class Syllabus(db.Model):
     vector_store_id = db.Column(db.String(255))
     uploaded_at = db.Column(db.DateTime, default=datetime.utcnow)
     
-    chats = db.relationship('Chat', backref='syllabus', lazy='dynamic')
\ No newline at end of file
+    chats = db.relationship('Chat', backref='syllabus', lazy='dynamic')
+    ingestion_jobs = db.relationship('IngestionJob', backref='syllabus', lazy='dynamic',
+                                     cascade='all, delete-orphan')
+
+    @property
+    def latest_job(self):
+        from app.models.ingestion_job import IngestionJob
+        return self.ingestion_jobs.order_by(IngestionJob.id.desc()).first()
+
+    @property
+    def status(self):
+        """Report 'active', 'processing' or 'failed' from the ingestion state."""
+        if self.vector_store_id:
+            return 'active'
+        job = self.latest_job
+        if job is not None and job.status == job.FAILED:
+            return 'failed'
+        return 'processing'
\ No newline at end of file
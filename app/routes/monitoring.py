@@ -30,4 +30,18 @@ def system_stats():
     return jsonify({
         'current': current,
         'history': history
-    })
\ No newline at end of file
+    })
+
+@monitoring_bp.route('/monitoring/model-stats')
+@login_required
+@admin_required
+def model_stats():
+    """Get load time and memory statistics for the shared embedding model."""
+    return jsonify(current_app.model_registry.get_stats())
+
+@monitoring_bp.route('/monitoring/ingestion-stats')
+@login_required
+@admin_required
+def ingestion_stats():
+    """Get background ingestion queue statistics."""
+    return jsonify(current_app.ingestion_queue.get_stats())
\ No newline at end of file
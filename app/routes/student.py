@@ -1,15 +1,18 @@
 # app/routes/student.py
-from flask import Blueprint, render_template, jsonify, request, current_app, redirect, send_from_directory, flash, url_for
+from flask import Blueprint, render_template, jsonify, request, current_app, redirect, send_from_directory, flash, url_for, Response, stream_with_context
 from flask_login import login_required, current_user
 from app.models.syllabus import Syllabus
 from app.models.chat import Chat
 from app.services.chat_service import ChatService
+from app.services.llm_client import LLMSaturatedError
 from app.services.vector_store_service import VectorStoreService
 # from app import db
-from app.extensions import db, bcrypt  # Use this instead of from app import db
+from app.extensions import db, bcrypt, model_registry  # Use this instead of from app import db
 from functools import wraps
 from sqlalchemy import or_
 from flask import request
+import math
+import json
 
 student_bp = Blueprint('student', __name__)
 
@@ -61,10 +64,44 @@ def send_message(syllabus_id):
 
         return jsonify(result)
 
+    except LLMSaturatedError as e:
+        current_app.logger.warning(f"Rejected message: {str(e)}")
+        return jsonify({'error': 'The assistant is busy, please try again shortly'}), 503
     except Exception as e:
         current_app.logger.error(f"Error processing message: {str(e)}")
         return jsonify({'error': 'Internal server error'}), 500
 
+@student_bp.route('/student/chat/<int:syllabus_id>/stream', methods=['POST'])
+@login_required
+@student_required
+def stream_message(syllabus_id):
+    """Stream the answer as server-sent events: context, then tokens, then done."""
+    message = (request.get_json(silent=True) or {}).get('message')
+    if not message:
+        return jsonify({'error': 'Message is required'}), 400
+
+    chat_service = ChatService(VectorStoreService())
+    events = chat_service.stream_response(
+        user_id=current_user.id,
+        syllabus_id=syllabus_id,
+        message=message
+    )
+
+    def generate():
+        try:
+            for event, data in events:
+                yield f"event: {event}\ndata: {json.dumps(data, default=float)}\n\n"
+        finally:
+            # Runs when the client disconnects too, which cancels the upstream completion
+            events.close()
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        # Proxies must pass each event through as soon as it is written
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
 @student_bp.route('/student/chat/<int:syllabus_id>/history')
 @login_required
 @student_required
@@ -130,12 +167,68 @@ def dashboard():
                          department_filter=department_filter)
 
 
+@student_bp.route('/student/search')
+@login_required
+@student_required
+def search_syllabi():
+    """Rank syllabi by how well their content matches the query, one page at a time."""
+    query = request.args.get('q', '').strip()
+    department = request.args.get('department', '')
+    page = max(request.args.get('page', 1, type=int), 1)
+    per_page = min(max(request.args.get('per_page', 9, type=int), 1),
+                   current_app.config['GLOBAL_SEARCH_MAX_PER_PAGE'])
+    if not query:
+        return jsonify({'error': 'Query is required'}), 400
+
+    try:
+        hits, total = model_registry.get_search_index().search(
+            VectorStoreService().embed_query(query),
+            department=department or None,
+            page=page,
+            per_page=per_page,
+            min_score=current_app.config['GLOBAL_SEARCH_MIN_SCORE']
+        )
+        syllabi = {
+            syllabus.id: syllabus
+            for syllabus in Syllabus.query.filter(
+                Syllabus.id.in_([hit['syllabus_id'] for hit in hits]),
+                Syllabus.vector_store_id.isnot(None)
+            )
+        }
+
+        return jsonify({
+            'query': query,
+            'department': department,
+            'page': page,
+            'per_page': per_page,
+            'total': total,
+            'pages': math.ceil(total / per_page),
+            'results': [{
+                'id': hit['syllabus_id'],
+                'title': syllabi[hit['syllabus_id']].title,
+                'department': syllabi[hit['syllabus_id']].department,
+                'course_number': syllabi[hit['syllabus_id']].course_number,
+                'score': round(hit['score'], 4),
+                'page': hit['page']
+            } for hit in hits if hit['syllabus_id'] in syllabi]
+        })
+
+    except Exception as e:
+        current_app.logger.error(f"Error searching syllabi: {str(e)}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+
 @student_bp.route('/student/syllabus/<int:syllabus_id>/view')
 @login_required
 @student_required
 def view_pdf(syllabus_id):
+    """Show the syllabus, opened at ``page`` or at the start of a detected ``section``."""
     syllabus = Syllabus.query.get_or_404(syllabus_id)
-    return render_template('student/pdf_viewer.html', syllabus=syllabus)
+    page = request.args.get('page', type=int)
+    section = request.args.get('section')
+    if page is None and section:
+        page = VectorStoreService().get_section_page(syllabus_id, section)
+    return render_template('student/pdf_viewer.html', syllabus=syllabus, page=max(page or 1, 1))
 
 @student_bp.route('/student/syllabus/<int:syllabus_id>/pdf')
 @login_required
@@ -2,18 +2,18 @@ from flask import Blueprint, render_template, redirect, url_for, flash, request,
 from flask_login import login_required, current_user
 from app.models.syllabus import Syllabus
 # from app import db
-from app.extensions import db, bcrypt  # Use this instead of from app import db
-from app.forms.teacher_forms import SyllabusUploadForm
+from app.extensions import db, bcrypt, model_registry  # Use this instead of from app import db
+from app.forms.teacher_forms import SyllabusUploadForm, SyllabusRevisionForm
 from werkzeug.utils import secure_filename
 import os
 from datetime import datetime
 from functools import wraps
 from app.routes.admin import admin_required
-from app.services.pdf_service import process_pdf
 from sqlalchemy import func, distinct
 from flask import jsonify, send_from_directory
 from app.models.chat import Chat
 from app.models.user import User
+from app.models.ingestion_job import IngestionJob
 import traceback
 from flask import jsonify
 from sqlalchemy import func
@@ -43,9 +43,55 @@ def teacher_required(f):
 def dashboard():
     syllabi = Syllabus.query.filter_by(user_id=current_user.id).all()
     upload_form = SyllabusUploadForm()
+    revision_form = SyllabusRevisionForm()
     return render_template('teacher/dashboard.html', 
                          syllabi=syllabi,
-                         upload_form=upload_form)
+                         upload_form=upload_form,
+                         revision_form=revision_form)
+
+def save_uploaded_pdf(file):
+    """Save an uploaded PDF under a unique name and return (filename, path)."""
+    filename = secure_filename(file.filename)
+    # Microseconds keep a quick revision from overwriting the file it replaces
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S_%f')
+    unique_filename = f"{timestamp}_{filename}"
+    file_path = os.path.join(current_app.config['UPLOAD_FOLDER'], unique_filename)
+    
+    # Ensure upload directory exists
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+    
+    # Log file details
+    current_app.logger.info(f"Attempting to save file: {unique_filename}")
+    current_app.logger.info(f"File path: {file_path}")
+    
+    file.save(file_path)
+    
+    # Verify file was saved
+    if not os.path.exists(file_path):
+        raise FileNotFoundError(f"Failed to save file at {file_path}")
+    
+    return unique_filename, file_path
+
+def queued_response(job, syllabus, message):
+    """Answer JSON clients with the job to poll, and flash for browsers."""
+    if request.accept_mimetypes.best == 'application/json':
+        return jsonify({
+            'job_id': job.id,
+            'syllabus_id': syllabus.id,
+            'status': job.status,
+            'status_url': url_for('teacher.job_status', job_id=job.id)
+        }), 202
+    
+    flash(message, 'success')
+    return redirect(url_for('teacher.dashboard'))
+
+def still_processing_response(job):
+    """Refuse a change to a syllabus whose ingestion job is still running."""
+    if request.accept_mimetypes.best == 'application/json':
+        return jsonify({'error': 'Syllabus is still being processed', 'job_id': job.id}), 409
+    
+    flash('This syllabus is still being processed. Please try again shortly.', 'warning')
+    return redirect(url_for('teacher.dashboard'))
 
 @teacher_bp.route('/teacher/upload_syllabus', methods=['POST'])
 @login_required
@@ -55,24 +101,7 @@ def upload_syllabus():
     if form.validate_on_submit():
         try:
             # Save the PDF file
-            file = form.syllabus_file.data
-            filename = secure_filename(file.filename)
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            unique_filename = f"{timestamp}_{filename}"
-            file_path = os.path.join(current_app.config['UPLOAD_FOLDER'], unique_filename)
-            
-            # Ensure upload directory exists
-            os.makedirs(os.path.dirname(file_path), exist_ok=True)
-            
-            # Log file details
-            current_app.logger.info(f"Attempting to save file: {unique_filename}")
-            current_app.logger.info(f"File path: {file_path}")
-            
-            file.save(file_path)
-            
-            # Verify file was saved
-            if not os.path.exists(file_path):
-                raise FileNotFoundError(f"Failed to save file at {file_path}")
+            unique_filename, file_path = save_uploaded_pdf(form.syllabus_file.data)
             
             # Create syllabus record
             syllabus = Syllabus(
@@ -83,20 +112,18 @@ def upload_syllabus():
                 file_path=unique_filename
             )
             
-            # Add to session but don't commit yet
+            # Committed together, so a syllabus never exists without its job
             db.session.add(syllabus)
-            db.session.flush()  # This assigns an ID to syllabus without committing
-            
-            current_app.logger.info(f"Processing PDF for syllabus ID: {syllabus.id}")
-            
-            # Process PDF and generate embeddings
-            process_pdf(syllabus)
-            
-            # If we get here, processing was successful
+            job = current_app.ingestion_queue.add(syllabus)
             db.session.commit()
-            current_app.logger.info(f"Successfully processed and saved syllabus ID: {syllabus.id}")
             
-            flash('Syllabus uploaded successfully!', 'success')
+            # Extraction, embedding and storage run in the background so the
+            # request returns immediately; progress is polled via job_status
+            current_app.ingestion_queue.schedule(job)
+            current_app.logger.info(f"Queued ingestion job {job.id} for syllabus ID: {syllabus.id}")
+            
+            return queued_response(job, syllabus,
+                                   f'Syllabus uploaded! Processing has started (job #{job.id}).')
             
         except FileNotFoundError as e:
             db.session.rollback()
@@ -117,8 +144,10 @@ def upload_syllabus():
             error_msg = str(e)
             flash(f'Error uploading syllabus ({error_type}): {error_msg}. Please try again.', 'error')
             
-            # Clean up file if it was saved
-            if 'file_path' in locals() and os.path.exists(file_path):
+            # Clean up file if it was saved, unless it belongs to a committed
+            # job, which recovery will still process
+            committed = 'job' in locals() and job.id is not None
+            if 'file_path' in locals() and os.path.exists(file_path) and not committed:
                 try:
                     os.remove(file_path)
                     current_app.logger.info(f"Cleaned up file after error: {file_path}")
@@ -134,6 +163,54 @@ def upload_syllabus():
     
     return redirect(url_for('teacher.dashboard'))
 
+@teacher_bp.route('/teacher/syllabus/<int:syllabus_id>/revise', methods=['POST'])
+@login_required
+@teacher_required
+def revise_syllabus(syllabus_id):
+    """Replace a syllabus PDF and re-index only the chunks that changed."""
+    syllabus = Syllabus.query.get_or_404(syllabus_id)
+    
+    if syllabus.user_id != current_user.id:
+        flash('You do not have permission to revise this syllabus.', 'error')
+        return redirect(url_for('teacher.dashboard'))
+    
+    job = syllabus.latest_job
+    if job is not None and job.is_active:
+        return still_processing_response(job)
+    
+    form = SyllabusRevisionForm()
+    if not form.validate_on_submit():
+        current_app.logger.error(f"Form validation errors: {form.errors}")
+        for field, errors in form.errors.items():
+            for error in errors:
+                flash(f'{field}: {error}', 'error')
+        return redirect(url_for('teacher.dashboard'))
+    
+    try:
+        unique_filename, file_path = save_uploaded_pdf(form.syllabus_file.data)
+        
+        # Students keep querying the current collection while the new
+        # revision is diffed into it; the job swaps in the new file, and
+        # removes the old one, only once it succeeds
+        job = current_app.ingestion_queue.add(syllabus, file_path=unique_filename)
+        db.session.commit()
+        
+        current_app.ingestion_queue.schedule(job)
+        current_app.logger.info(f"Queued re-indexing job {job.id} for syllabus ID: {syllabus.id}")
+        
+        return queued_response(job, syllabus,
+                               f'Revision uploaded! Re-indexing has started (job #{job.id}).')
+    
+    except Exception as e:
+        db.session.rollback()
+        # Drop the revision unless a committed job will still index it
+        if 'file_path' in locals() and ('job' not in locals() or job.id is None) and os.path.exists(file_path):
+            os.remove(file_path)
+        current_app.logger.error(f"Error revising syllabus: {str(e)}")
+        current_app.logger.error(f"Full traceback: {traceback.format_exc()}")
+        flash(f'Error uploading revision: {str(e)}. Please try again.', 'error')
+        return redirect(url_for('teacher.dashboard'))
+
 @teacher_bp.route('/teacher/delete_syllabus/<int:syllabus_id>', methods=['POST'])
 @login_required
 @teacher_required
@@ -146,6 +223,11 @@ def delete_syllabus(syllabus_id):
             flash('You do not have permission to delete this syllabus.', 'error')
             return redirect(url_for('teacher.dashboard'))
         
+        # A running job would rebuild the indexes removed below
+        job = syllabus.latest_job
+        if job is not None and job.is_active:
+            return still_processing_response(job)
+        
         # Delete associated chat records first
         Chat.query.filter_by(syllabus_id=syllabus_id).delete()
         
@@ -157,13 +239,14 @@ def delete_syllabus(syllabus_id):
         # Delete chromadb collection if exists
         if syllabus.vector_store_id:
             try:
-                chroma_client = chromadb.PersistentClient(
-                    path=os.path.join(tempfile.gettempdir(), "chroma_db")
-                )
+                chroma_client = model_registry.get_chroma_client()
                 chroma_client.delete_collection(name=syllabus.vector_store_id)
                 logger.info(f"Deleted vector store collection: {syllabus.vector_store_id}")
             except Exception as e:
                 logger.warning(f"Error deleting vector store collection: {str(e)}")
+        model_registry.get_lexical_store().delete(syllabus.id)
+        model_registry.invalidate_syllabus(syllabus.id)
+        model_registry.get_search_index().remove(syllabus.id)
         
         # Delete syllabus record
         db.session.delete(syllabus)
@@ -195,20 +278,7 @@ def get_syllabus_details(syllabus_id):
         total_questions = db.session.query(func.count(Chat.id))\
             .filter(Chat.syllabus_id == syllabus_id).scalar() or 0
         
-        print("=========file content=========")
-        print({
-            'id': syllabus.id,
-            'title': syllabus.title,
-            'department': syllabus.department,
-            'course_number': syllabus.course_number,
-            'uploaded_at': syllabus.uploaded_at.isoformat(),
-            'status': 'active' if syllabus.vector_store_id else 'processing',
-            'stats': {
-                'views': total_views,
-                'questions': total_questions,
-                'avg_response_time': '0s'  # You can add actual calculation later
-            }
-        })
+        job = syllabus.latest_job
         
         return jsonify({
             'id': syllabus.id,
@@ -216,7 +286,8 @@ def get_syllabus_details(syllabus_id):
             'department': syllabus.department,
             'course_number': syllabus.course_number,
             'uploaded_at': syllabus.uploaded_at.isoformat(),
-            'status': 'active' if syllabus.vector_store_id else 'processing',
+            'status': syllabus.status,
+            'job': job.to_dict() if job else None,
             'stats': {
                 'views': total_views,
                 'questions': total_questions,
@@ -227,6 +298,17 @@ def get_syllabus_details(syllabus_id):
         current_app.logger.error(f"Error getting syllabus details: {str(e)}")
         return jsonify({'error': 'Internal server error'}), 500
 
+@teacher_bp.route('/teacher/jobs/<int:job_id>')
+@login_required
+@teacher_required
+def job_status(job_id):
+    job = IngestionJob.query.get_or_404(job_id)
+    
+    if job.syllabus.user_id != current_user.id:
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    return jsonify(job.to_dict())
+
 @teacher_bp.route('/teacher/download/<int:syllabus_id>')
 @login_required
 @teacher_required
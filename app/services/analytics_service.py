@@ -89,15 +89,20 @@ class AnalyticsService:
         try:
             cutoff_date = datetime.utcnow() - timedelta(days=days)
             
-            # Get hourly average response times
+            # Get hourly average response times; cached answers are counted apart
+            # so they do not hide the latency of generated ones
             response_times = db.session.query(
                 func.date_trunc('hour', Chat.timestamp).label('hour'),
                 func.avg(Chat.response_time).label('avg_time')
-            ).filter(Chat.timestamp >= cutoff_date)\
+            ).filter(Chat.timestamp >= cutoff_date, Chat.from_cache.isnot(True))\
              .group_by('hour')\
              .order_by('hour')\
              .all()
             
+            cached_answers = db.session.query(func.count(Chat.id))\
+             .filter(Chat.timestamp >= cutoff_date, Chat.from_cache.is_(True))\
+             .scalar()
+            
             return {
                 'response_times': [
                     {
@@ -105,7 +110,8 @@ class AnalyticsService:
                         'avg_time': float(avg_time)
                     }
                     for hour, avg_time in response_times
-                ]
+                ],
+                'cached_answers': cached_answers
             }
         except Exception as e:
             logger.error(f"Error getting response times: {str(e)}")
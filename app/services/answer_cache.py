@@ -0,0 +1,137 @@
+# app/services/answer_cache.py
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import numpy as np
+from app.services.query_embedding_cache import normalize_query
+
+logger = logging.getLogger(__name__)
+
+
+class AnswerCache:
+    """Bounded in-process LRU of chat answers, matched by question similarity.
+
+    Answers are stored per syllabus with the question's embedding. A new
+    question about the same syllabus whose embedding has cosine similarity
+    of at least ``threshold`` to a cached one (or the same normalized text)
+    gets that answer without an LLM call. Entries are tagged with the
+    syllabus's shared content version (see ``IngestionJob.content_version``)
+    read before the answer was generated, and only match lookups for that
+    version, so once the syllabus is re-indexed or deleted in any process
+    its old answers stop being served. ``invalidate`` also drops them right
+    away in the process that changed it. Entries older than ``ttl`` seconds
+    are treated as misses.
+    """
+
+    def __init__(self, max_entries: int = 2048, ttl: Optional[float] = None, threshold: float = 0.95):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.threshold = threshold
+        self._entries = OrderedDict()  # (syllabus id, embedding version, normalized question) -> entry
+        self._by_syllabus = {}  # syllabus id -> set of entry keys
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'exact_hits': 0, 'misses': 0, 'stores': 0, 'expired': 0, 'stale': 0,
+                       'evictions': 0, 'invalidations': 0, 'hit_similarity': 0.0}
+
+    def get(self, syllabus_id: int, content_version: Optional[str], embedding_version: str, question: str,
+            embed: Optional[Callable[[str], np.ndarray]] = None) -> Optional[Dict[str, Any]]:
+        """Return the cached {'answer', 'context', 'question', 'similarity'} for a question, or None.
+
+        A question with the same normalized text matches outright. Otherwise
+        ``embed(question)`` is called, only if the syllabus has cached
+        answers, and compared with their questions.
+        """
+        normalized = normalize_query(question)
+        exact_key = (syllabus_id, embedding_version, normalized)
+        now = time.monotonic()
+        with self._lock:
+            keys = [key for key in self._by_syllabus.get(syllabus_id, ()) if key[1] == embedding_version]
+            for key in keys:
+                if self._entries[key]['content_version'] != content_version:
+                    self._remove(key)
+                    self._stats['stale'] += 1
+                elif self.ttl is not None and now - self._entries[key]['stored_at'] > self.ttl:
+                    self._remove(key)
+                    self._stats['expired'] += 1
+            keys = [key for key in keys if key in self._entries]
+            vectors = [self._entries[key]['vector'] for key in keys]
+
+        best_key, similarity = None, 0.0
+        if exact_key in keys:
+            best_key, similarity = exact_key, 1.0
+        elif embed is not None and keys:
+            # Encoded outside the lock so other lookups are not held up
+            query = np.asarray(embed(question), dtype=np.float32).reshape(-1)
+            similarities = np.vstack(vectors) @ (query / (np.linalg.norm(query) or 1.0))
+            best = int(np.argmax(similarities))
+            if similarities[best] >= self.threshold:
+                best_key, similarity = keys[best], float(similarities[best])
+
+        with self._lock:
+            entry = self._entries.get(best_key) if best_key is not None else None
+            if entry is None:
+                self._stats['misses'] += 1
+                return None
+            self._entries.move_to_end(best_key)
+            self._stats['hits'] += 1
+            if best_key == exact_key:
+                self._stats['exact_hits'] += 1
+            self._stats['hit_similarity'] += similarity
+            return {'answer': entry['answer'], 'context': entry['context'],
+                    'question': entry['question'], 'similarity': similarity}
+
+    def put(self, syllabus_id: int, content_version: Optional[str], embedding_version: str, question: str,
+            vector: np.ndarray, answer: str, context: List[Dict[str, Any]]):
+        """Cache an answer generated from syllabus content ``content_version``."""
+        vector = np.asarray(vector, dtype=np.float32).reshape(-1)
+        vector = vector / (np.linalg.norm(vector) or 1.0)
+        key = (syllabus_id, embedding_version, normalize_query(question))
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = {'vector': vector, 'question': question, 'answer': answer, 'context': context,
+                                  'content_version': content_version, 'stored_at': time.monotonic()}
+            self._by_syllabus.setdefault(syllabus_id, set()).add(key)
+            self._stats['stores'] += 1
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+                self._stats['evictions'] += 1
+
+    def invalidate(self, syllabus_id: int):
+        """Drop a syllabus's answers after this process re-indexed or deleted it."""
+        with self._lock:
+            for key in list(self._by_syllabus.get(syllabus_id, ())):
+                self._remove(key)
+            self._stats['invalidations'] += 1
+
+    def _remove(self, key: Tuple):
+        if self._entries.pop(key, None) is None:
+            return
+        keys = self._by_syllabus.get(key[0])
+        keys.discard(key)
+        if not keys:
+            del self._by_syllabus[key[0]]
+
+    def get_stats(self):
+        """Get hit rate, eviction counts and the mean similarity of hits."""
+        with self._lock:
+            stats = dict(self._stats)
+            entries = len(self._entries)
+        lookups = stats['hits'] + stats['misses']
+        return {
+            'entries': entries,
+            'max_entries': self.max_entries,
+            'ttl_seconds': self.ttl,
+            'threshold': self.threshold,
+            'hits': stats['hits'],
+            'exact_hits': stats['exact_hits'],
+            'misses': stats['misses'],
+            'hit_rate': stats['hits'] / lookups if lookups else None,
+            'mean_hit_similarity': stats['hit_similarity'] / stats['hits'] if stats['hits'] else None,
+            'stores': stats['stores'],
+            'expired': stats['expired'],
+            'stale': stats['stale'],
+            'evictions': stats['evictions'],
+            'invalidations': stats['invalidations']
+        }
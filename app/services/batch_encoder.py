@@ -0,0 +1,110 @@
+# app/services/batch_encoder.py
+import logging
+import threading
+import time
+from typing import List
+import numpy as np
+from app.services.text_chunker import APPROXIMATE_TOKEN
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_SEQ_LENGTH = 256
+# [CLS] and [SEP] are added to every sequence
+SPECIAL_TOKENS = 2
+
+
+class BucketedEncoder:
+    """Length-bucketed, memory-budgeted front-end for ``model.encode``.
+
+    Texts are sorted by estimated token length so each forward pass holds
+    sequences of similar length and little padding. Batches are then sized
+    so that ``batch size x longest sequence`` stays within a padded-token
+    budget: short chunks go through in large batches that keep the BLAS
+    kernels busy, long ones in small batches that bound peak memory. The
+    budget is ``batch_size`` full-length sequences, and no batch holds more
+    than ``max_batch_size`` texts. Results are returned in input order.
+    """
+
+    def __init__(self, model, batch_size: int = 16, max_batch_size: int = 128,
+                 max_seq_length: int = None):
+        self.model = model
+        self.batch_size = batch_size
+        self.max_batch_size = max(max_batch_size, batch_size)
+        model_max_length = getattr(model, 'max_seq_length', None)
+        if max_seq_length is None:
+            max_seq_length = model_max_length if isinstance(model_max_length, int) else DEFAULT_MAX_SEQ_LENGTH
+        self.max_seq_length = max_seq_length
+        self.token_budget = batch_size * max_seq_length
+        self._lock = threading.Lock()
+        self._stats = {'texts': 0, 'batches': 0, 'seconds': 0.0, 'tokens': 0, 'padded_tokens': 0}
+
+    def estimate_tokens(self, text: str) -> int:
+        """Approximate the model's sequence length for ``text``, capped at its maximum."""
+        count = sum(1 for _ in APPROXIMATE_TOKEN.finditer(text)) + SPECIAL_TOKENS
+        return min(count, self.max_seq_length)
+
+    def plan_batches(self, lengths: List[int]) -> List[List[int]]:
+        """Group text indices into batches of similar length within the token budget."""
+        order = sorted(range(len(lengths)), key=lambda index: lengths[index], reverse=True)
+        batches = []
+        batch = []
+        for index in order:
+            # Sorted longest first, so the first text sets the batch's padded length
+            padded_length = lengths[batch[0]] if batch else lengths[index]
+            if batch and (len(batch) >= self.max_batch_size
+                          or (len(batch) + 1) * padded_length > self.token_budget):
+                batches.append(batch)
+                batch = []
+            batch.append(index)
+        if batch:
+            batches.append(batch)
+        return batches
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """Embed texts as a float32 matrix in input order."""
+        if not texts:
+            raise ValueError("No texts provided for embedding")
+
+        start_time = time.perf_counter()
+        lengths = [self.estimate_tokens(text) for text in texts]
+        batches = self.plan_batches(lengths)
+
+        embeddings = None
+        padded_tokens = 0
+        for batch in batches:
+            batch_embeddings = np.asarray(self.model.encode(
+                [texts[index] for index in batch],
+                batch_size=len(batch),
+                convert_to_numpy=True,
+                show_progress_bar=False
+            ), dtype=np.float32).reshape(len(batch), -1)
+            if embeddings is None:
+                embeddings = np.empty((len(texts), batch_embeddings.shape[1]), dtype=np.float32)
+            embeddings[batch] = batch_embeddings
+            padded_tokens += len(batch) * lengths[batch[0]]
+
+        seconds = time.perf_counter() - start_time
+        with self._lock:
+            self._stats['texts'] += len(texts)
+            self._stats['batches'] += len(batches)
+            self._stats['seconds'] += seconds
+            self._stats['tokens'] += sum(lengths)
+            self._stats['padded_tokens'] += padded_tokens
+        logger.debug(f"Encoded {len(texts)} texts in {len(batches)} batches "
+                     f"({len(texts) / seconds if seconds else 0:.1f} chunks/s)")
+        return embeddings
+
+    def get_stats(self):
+        """Get throughput and padding efficiency since startup."""
+        with self._lock:
+            stats = dict(self._stats)
+        return {
+            'batch_size': self.batch_size,
+            'max_batch_size': self.max_batch_size,
+            'token_budget': self.token_budget,
+            'texts': stats['texts'],
+            'batches': stats['batches'],
+            'mean_batch_size': stats['texts'] / stats['batches'] if stats['batches'] else None,
+            'chunks_per_second': stats['texts'] / stats['seconds'] if stats['seconds'] else None,
+            'padding_efficiency': stats['tokens'] / stats['padded_tokens'] if stats['padded_tokens'] else None
+        }
@@ -1,75 +1,288 @@
 # app/services/chat_service.py
-from typing import Dict, List
-import openai
+import time
+from typing import Any, Dict, Generator, List, Optional, Tuple
 from flask import current_app
 from app.models.chat import Chat
 # from app import db
-from app.extensions import db, bcrypt  # Use this instead of from app import db
+from app.extensions import db, bcrypt, model_registry  # Use this instead of from app import db
 import json
 
 from app.services.vector_store_service import VectorStoreService
+from app.services.context_assembler import ContextAssembler
+from app.services.query_embedding_cache import normalize_query
+from app.services.single_flight import FlightAbandoned
+
+NO_CONTENT_RESPONSE = "I apologize, but I couldn't find the syllabus content. Please try again later."
+
 
 class ChatService:
-    def __init__(self, vector_store_service: VectorStoreService):
+    def __init__(self, vector_store_service: VectorStoreService, context_assembler: ContextAssembler = None):
         self.vector_store = vector_store_service
+        self.context_assembler = context_assembler or ContextAssembler()
+
+    def build_messages(self, context: List[Dict], message: str) -> List[Dict]:
+        """Build the chat prompt from retrieved syllabus chunks and the question."""
+        syllabus_content = "\n\n".join(item['text'] for item in context)
+        return [
+            {
+                "role": "system",
+                "content": "You are a helpful assistant that answers questions about course syllabi. "
+                        "Use the provided syllabus content to answer questions accurately. "
+                        "If you can't find relevant information in the syllabus, say so."
+            },
+            {
+                "role": "user",
+                "content": f"Here is the syllabus content:\n\n{syllabus_content}\n\n"
+                        f"Question: {message}\n\n"
+                        "Please answer based on the syllabus content provided."
+            }
+        ]
+
+    def prepare_context(self, syllabus_id: int, message: str
+                        ) -> Optional[Tuple[List[Dict[str, Any]], Dict[str, Any]]]:
+        """Retrieve candidate chunks and fit the best of them into the token budget.
+
+        Returns (context, assembly stats), or None if the syllabus has no content.
+        """
+        candidates = self.vector_store.get_relevant_context(
+            syllabus_id, message,
+            num_results=current_app.config['CONTEXT_CANDIDATES'],
+            include_embeddings=True
+        )
+        if not candidates:
+            return None
+        context, context_stats = self.context_assembler.assemble(candidates)
+        current_app.logger.info(f"Context for syllabus {syllabus_id}: {context_stats}")
+        return context, context_stats
+
+    def lookup_answer(self, syllabus_id: int, content_version: Optional[str], message: str
+                      ) -> Optional[Dict[str, Any]]:
+        """Find the answer to an equivalent earlier question about this version of the syllabus.
+
+        Lookup failures are logged and treated as misses.
+        """
+        answer_cache = model_registry.get_answer_cache()
+        if answer_cache is None:
+            return None
+        try:
+            cached = answer_cache.get(syllabus_id, content_version, model_registry.get_backend_version(), message,
+                                      self.vector_store.embed_query)
+        except Exception as e:
+            current_app.logger.error(f"Error looking up cached answer: {str(e)}")
+            return None
+        if cached is not None:
+            current_app.logger.info(f"Answered from cache for syllabus {syllabus_id} "
+                                    f"(similarity {cached['similarity']:.3f} to {cached['question']!r})")
+        return cached
+
+    def remember_answer(self, syllabus_id: int, content_version: Optional[str], message: str, answer: str,
+                        context: List[Dict[str, Any]]):
+        """Cache a generated answer for later equivalent questions."""
+        answer_cache = model_registry.get_answer_cache()
+        if answer_cache is None:
+            return
+        try:
+            answer_cache.put(syllabus_id, content_version, model_registry.get_backend_version(), message,
+                             self.vector_store.embed_query(message), answer, context)
+        except Exception as e:
+            current_app.logger.error(f"Error caching answer: {str(e)}")
+
+    def flight_key(self, syllabus_id: int, content_version: Optional[str], message: str
+                   ) -> Tuple[int, Optional[str], str]:
+        """Key under which concurrent equivalent questions share one answer."""
+        return syllabus_id, content_version, normalize_query(message)
+
+    def answer_question(self, syllabus_id: int, message: str, content_version: Optional[str]) -> Optional[Dict]:
+        """Retrieve context and generate an answer, caching it for later equivalent questions.
+
+        Returns {'response', 'context', 'context_stats'}, or None if the syllabus has no content.
+        """
+        prepared = self.prepare_context(syllabus_id, message)
+        if prepared is None:
+            return None
+        context, context_stats = prepared
+
+        # Generate response using ChatGPT
+        response_text = model_registry.get_llm_client().complete(
+            self.build_messages(context, message), temperature=0.7, max_tokens=500
+        )
+        self.remember_answer(syllabus_id, content_version, message, response_text, context)
+        return {'response': response_text, 'context': context, 'context_stats': context_stats}
+
+    def save_chat(self, user_id: int, syllabus_id: int, message: str, response: str, response_time: float,
+                  **fields) -> Chat:
+        chat = Chat(
+            user_id=user_id,
+            syllabus_id=syllabus_id,
+            message=message,
+            response=response,
+            response_time=response_time,
+            **fields
+        )
+        db.session.add(chat)
+        db.session.commit()
+        return chat
 
     def generate_response(self, user_id: int, syllabus_id: int, message: str) -> Dict:
-        """Generate a response using GPT and relevant context."""
+        """Generate a response using GPT and relevant context.
+
+        Concurrent requests with the same question about the same syllabus
+        version share one retrieval and completion ('coalesced' in the
+        result); each still saves its own chat.
+        """
         try:
-            # Get full syllabus content
-            context = self.vector_store.get_relevant_context(syllabus_id, message)
-            
-            if not context:
+            start_time = time.perf_counter()
+            # Read before anything is retrieved, so a concurrent re-index retires what this produces
+            content_version = model_registry.content_version(syllabus_id)
+            cached = self.lookup_answer(syllabus_id, content_version, message)
+            if cached is not None:
+                self.save_chat(user_id, syllabus_id, message, cached['answer'], time.perf_counter() - start_time,
+                               from_cache=True)
                 return {
-                    'response': "I apologize, but I couldn't find the syllabus content. Please try again later.",
-                    'context': []
-                }
-            
-            # Use the full content as context
-            syllabus_content = context[0]['text']
-            
-            # Prepare messages for ChatGPT
-            messages = [
-                {
-                    "role": "system",
-                    "content": "You are a helpful assistant that answers questions about course syllabi. "
-                            "Use the provided syllabus content to answer questions accurately. "
-                            "If you can't find relevant information in the syllabus, say so."
-                },
-                {
-                    "role": "user",
-                    "content": f"Here is the syllabus content:\n\n{syllabus_content}\n\n"
-                            f"Question: {message}\n\n"
-                            "Please answer based on the syllabus content provided."
+                    'response': cached['answer'],
+                    'context': cached['context'],
+                    'cached': True
                 }
-            ]
-
-            # Generate response using ChatGPT
-            response = openai.ChatCompletion.create(
-                model="gpt-3.5-turbo",
-                messages=messages,
-                temperature=0.7,
-                max_tokens=500
-            )
 
-            # Extract the response text
-            response_text = response['choices'][0]['message']['content']
+            def compute():
+                return self.answer_question(syllabus_id, message, content_version)
+
+            single_flight = model_registry.get_single_flight()
+            if single_flight is None:
+                answer, coalesced = compute(), False
+            else:
+                answer, coalesced = single_flight.do(self.flight_key(syllabus_id, content_version, message), compute)
+            if answer is None:
+                return {
+                    'response': NO_CONTENT_RESPONSE,
+                    'context': []
+                }
 
             # Save the chat interaction
-            chat = Chat(
-                user_id=user_id,
-                syllabus_id=syllabus_id,
-                message=message,
-                response=response_text
-            )
-            db.session.add(chat)
-            db.session.commit()
+            self.save_chat(user_id, syllabus_id, message, answer['response'], time.perf_counter() - start_time)
 
             return {
-                'response': response_text,
-                'context': context
+                'response': answer['response'],
+                'context': answer['context'],
+                'context_stats': answer['context_stats'],
+                'cached': False,
+                'coalesced': coalesced
             }
 
         except Exception as e:
             current_app.logger.error(f"Error generating response: {str(e)}")
-            raise
\ No newline at end of file
+            raise
+
+    def stream_response(self, user_id: int, syllabus_id: int, message: str
+                        ) -> Generator[Tuple[str, Dict[str, Any]], None, None]:
+        """Generate a response as (event, data) pairs while the model writes it.
+
+        Yields one 'context' event, a 'token' event per piece of text as the
+        completion streams in, then 'done' with the saved chat id and timings
+        ('error' instead if generation fails). A cached answer, or one shared
+        with an identical question already being answered, arrives as a
+        single token. The chat is saved once the completion finishes. If the
+        consumer stops early, as when the client disconnects, the upstream
+        request is closed and nothing is saved.
+        """
+        start_time = time.perf_counter()
+        stream = None
+        finished = False
+        single_flight = model_registry.get_single_flight()
+        key = None
+        leading = False
+        try:
+            # Read before anything is retrieved, so a concurrent re-index retires what this produces
+            content_version = model_registry.content_version(syllabus_id)
+            cached = self.lookup_answer(syllabus_id, content_version, message)
+            if cached is not None:
+                response_time = time.perf_counter() - start_time
+                chat = self.save_chat(user_id, syllabus_id, message, cached['answer'], response_time,
+                                      time_to_first_token=response_time, from_cache=True)
+                finished = True
+                yield 'context', {'context': cached['context']}
+                yield 'token', {'text': cached['answer']}
+                yield 'done', {'chat_id': chat.id, 'time_to_first_token': response_time,
+                               'response_time': response_time, 'cached': True}
+                return
+
+            if single_flight is not None:
+                key = self.flight_key(syllabus_id, content_version, message)
+            while single_flight is not None:
+                future, leading = single_flight.begin(key)
+                if leading:
+                    break
+                try:
+                    answer = future.result()
+                except FlightAbandoned:
+                    continue
+                finished = True
+                if answer is None:
+                    yield 'context', {'context': []}
+                    yield 'token', {'text': NO_CONTENT_RESPONSE}
+                    yield 'done', {'chat_id': None}
+                    return
+                response_time = time.perf_counter() - start_time
+                chat = self.save_chat(user_id, syllabus_id, message, answer['response'], response_time,
+                                      time_to_first_token=response_time)
+                yield 'context', {'context': answer['context'], 'context_stats': answer['context_stats']}
+                yield 'token', {'text': answer['response']}
+                yield 'done', {'chat_id': chat.id, 'time_to_first_token': response_time,
+                               'response_time': response_time, 'cached': False, 'coalesced': True}
+                return
+
+            prepared = self.prepare_context(syllabus_id, message)
+            if prepared is None:
+                if leading:
+                    single_flight.finish(key, result=None)
+                    leading = False
+                yield 'context', {'context': []}
+                yield 'token', {'text': NO_CONTENT_RESPONSE}
+                yield 'done', {'chat_id': None}
+                finished = True
+                return
+            context, context_stats = prepared
+            yield 'context', {'context': context, 'context_stats': context_stats}
+
+            stream = model_registry.get_llm_client().stream(
+                self.build_messages(context, message), temperature=0.7, max_tokens=500
+            )
+            parts = []
+            time_to_first_token = None
+            for text in stream:
+                if time_to_first_token is None:
+                    time_to_first_token = time.perf_counter() - start_time
+                parts.append(text)
+                yield 'token', {'text': text}
+            finished = True
+            response = "".join(parts)
+            if leading:
+                single_flight.finish(key, result={'response': response, 'context': context,
+                                                  'context_stats': context_stats})
+                leading = False
+
+            response_time = time.perf_counter() - start_time
+            chat = self.save_chat(user_id, syllabus_id, message, response, response_time,
+                                  time_to_first_token=time_to_first_token)
+            self.remember_answer(syllabus_id, content_version, chat.message, chat.response, context)
+            current_app.logger.info(f"Streamed response for syllabus {syllabus_id}: "
+                                    f"first token {time_to_first_token or 0:.3f}s, total {response_time:.3f}s")
+            yield 'done', {'chat_id': chat.id, 'time_to_first_token': time_to_first_token,
+                           'response_time': response_time, 'cached': False}
+
+        except Exception as e:
+            finished = True
+            if leading:
+                single_flight.finish(key, error=e)
+                leading = False
+            current_app.logger.error(f"Error streaming response: {str(e)}")
+            yield 'error', {'error': 'Internal server error'}
+        finally:
+            if leading:
+                # Let questions waiting on this answer compute their own
+                single_flight.finish(key, error=FlightAbandoned())
+            if not finished:
+                current_app.logger.info(f"Client left after {time.perf_counter() - start_time:.3f}s; "
+                                        f"cancelling response for syllabus {syllabus_id}")
+                if stream is not None:
+                    stream.close()
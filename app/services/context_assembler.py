@@ -0,0 +1,144 @@
+# app/services/context_assembler.py
+import logging
+from typing import List, Dict, Any, Tuple
+import numpy as np
+from app.config import Config
+from app.services.text_chunker import TextChunker, APPROXIMATE_TOKEN
+
+logger = logging.getLogger(__name__)
+
+
+class ContextAssembler:
+    """Turns retrieved chunk candidates into a prompt context within a token budget.
+
+    Candidates are ranked by maximal marginal relevance, trading their
+    similarity to the question against their similarity to chunks already
+    chosen, so overlapping or repeated chunks stop crowding out new
+    information. Near-duplicates are dropped outright. Chosen chunks that are
+    adjacent in the document are merged with their shared overlap removed,
+    and chunks are added only while the merged context fits ``token_budget``
+    tokens. Blocks come back in document order.
+    """
+
+    def __init__(self, token_budget: int = None, mmr_lambda: float = None,
+                 duplicate_similarity: float = None, chunker: TextChunker = None):
+        self.token_budget = token_budget or Config.CONTEXT_TOKEN_BUDGET
+        self.mmr_lambda = Config.CONTEXT_MMR_LAMBDA if mmr_lambda is None else mmr_lambda
+        self.duplicate_similarity = duplicate_similarity or Config.CONTEXT_DUPLICATE_SIMILARITY
+        self.chunker = chunker or TextChunker()
+
+    def assemble(self, candidates: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+        """Return (context blocks, stats) for candidates from VectorStoreService."""
+        candidate_tokens = sum(self.chunker.count_tokens(candidate['text']) for candidate in candidates)
+        ranked, duplicates = self._rank(candidates)
+
+        selected = []
+        tokens_used = 0
+        skipped_for_budget = 0
+        for candidate in ranked:
+            blocks = self._merge(selected + [candidate])
+            tokens = sum(block['tokens'] for block in blocks)
+            if tokens > self.token_budget:
+                skipped_for_budget += 1
+                continue
+            selected.append(candidate)
+            tokens_used = tokens
+
+        blocks = self._merge(selected)
+        if not selected and ranked:
+            # Even the best chunk is over budget: send as much of it as fits
+            block = self._merge(ranked[:1])[0]
+            block['text'] = self._truncate(block['text'], self.token_budget)
+            block['tokens'] = self.chunker.count_tokens(block['text'])
+            blocks = [block]
+            tokens_used = block['tokens']
+
+        stats = {
+            'candidates': len(candidates),
+            'selected': len(selected),
+            'near_duplicates': duplicates,
+            'over_budget': skipped_for_budget,
+            'blocks': len(blocks),
+            'token_budget': self.token_budget,
+            'candidate_tokens': candidate_tokens,
+            'context_tokens': tokens_used,
+            'tokens_saved': candidate_tokens - tokens_used
+        }
+        logger.debug(f"Assembled context: {stats}")
+        for block in blocks:
+            del block['tokens']
+        return blocks, stats
+
+    def _rank(self, candidates: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], int]:
+        """Order candidates by maximal marginal relevance and drop near-duplicates."""
+        if not candidates or any(candidate.get('embedding') is None for candidate in candidates):
+            return sorted(candidates, key=lambda candidate: candidate['similarity'], reverse=True), 0
+
+        vectors = np.vstack([np.asarray(candidate['embedding'], dtype=np.float32) for candidate in candidates])
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors = vectors / np.where(norms == 0, 1, norms)
+        pairwise = vectors @ vectors.T
+        relevance = np.array([candidate['similarity'] for candidate in candidates])
+        if all(candidate.get('score') for candidate in candidates):
+            # Hybrid retrieval already ranked by fused score; keep that order as relevance
+            scores = np.array([candidate['score'] for candidate in candidates])
+            relevance = scores / scores.max()
+
+        remaining = list(range(len(candidates)))
+        chosen = []
+        duplicates = 0
+        while remaining:
+            if chosen:
+                redundancy = pairwise[np.ix_(remaining, chosen)].max(axis=1)
+            else:
+                redundancy = np.zeros(len(remaining))
+            scores = self.mmr_lambda * relevance[remaining] - (1 - self.mmr_lambda) * redundancy
+            best = int(np.argmax(scores))
+            index = remaining.pop(best)
+            if redundancy[best] >= self.duplicate_similarity:
+                duplicates += 1
+                continue
+            chosen.append(index)
+        return [candidates[index] for index in chosen], duplicates
+
+    def _merge(self, chunks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Merge chunks that are consecutive in the document, removing their overlap."""
+        ordered = sorted(chunks, key=lambda chunk: (chunk.get('position') is None, chunk.get('position') or 0))
+        blocks = []
+        for chunk in ordered:
+            previous = blocks[-1] if blocks else None
+            if (previous is not None and chunk.get('position') is not None
+                    and previous['positions'][-1] + 1 == chunk['position']):
+                previous['text'] = self._join(previous, chunk)
+                previous['end'] = chunk.get('end')
+                previous['positions'].append(chunk['position'])
+                previous['similarity'] = max(previous['similarity'], chunk['similarity'])
+                continue
+            blocks.append({
+                'text': chunk['text'],
+                'similarity': chunk['similarity'],
+                'page': chunk.get('page'),
+                'section': chunk.get('section'),
+                'positions': [chunk['position']] if chunk.get('position') is not None else [],
+                'end': chunk.get('end')
+            })
+
+        for block in blocks:
+            block['tokens'] = self.chunker.count_tokens(block['text'])
+        return [{key: value for key, value in block.items() if key != 'end'} for block in blocks]
+
+    @staticmethod
+    def _join(block: Dict[str, Any], chunk: Dict[str, Any]) -> str:
+        # Chunk text is the document slice [start, end), so the overlap is exact
+        if block.get('end') is not None and chunk.get('start') is not None and block['end'] > chunk['start']:
+            return block['text'] + chunk['text'][block['end'] - chunk['start']:]
+        return f"{block['text']} {chunk['text']}"
+
+    def _truncate(self, text: str, max_tokens: int) -> str:
+        encoding = self.chunker.encoding
+        if encoding is not None:
+            return encoding.decode(encoding.encode_ordinary(text)[:max_tokens])
+        matches = list(APPROXIMATE_TOKEN.finditer(text))
+        if len(matches) <= max_tokens:
+            return text
+        return text[:matches[max_tokens].start()].rstrip()
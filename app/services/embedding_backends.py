@@ -0,0 +1,170 @@
+# app/services/embedding_backends.py
+import logging
+import re
+from abc import ABC, abstractmethod
+import zlib
+from typing import List
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+HASHING_TOKEN = re.compile(r'\w+')
+
+
+# Collections created before backends were pluggable were all built by this model
+LEGACY_EMBEDDING_VERSION = 'sentence-transformers/paraphrase-MiniLM-L6-v2'
+
+
+class EmbeddingMismatchError(ValueError):
+    """A collection was built by a different embedding backend than the one querying it."""
+
+
+def collection_embedding_version(collection) -> str:
+    """Return the backend version recorded on a Chroma collection."""
+    return (collection.metadata or {}).get('embedding_version', LEGACY_EMBEDDING_VERSION)
+
+
+class EmbeddingBackend(ABC):
+    """Interface every embedding backend implements.
+
+    ``version`` identifies the vector space a backend produces: two backends
+    with the same version produce interchangeable vectors. Collections record
+    it at creation so queries from a different backend can be refused.
+    """
+    name = None
+    max_seq_length = 256
+
+    def __init__(self, model_name: str, **options):
+        self.model_name = model_name
+        self.options = options
+
+    @property
+    @abstractmethod
+    def version(self) -> str:
+        """Identifier of the vector space this backend produces."""
+
+    @property
+    @abstractmethod
+    def dimension(self) -> int:
+        """Length of the vectors this backend produces."""
+
+    def load(self):
+        """Load model files; called once by the registry before first use."""
+        return self
+
+    @abstractmethod
+    def encode(self, texts: List[str], batch_size: int = 32, **kwargs) -> np.ndarray:
+        """Return one embedding row per text."""
+
+
+class SentenceTransformerBackend(EmbeddingBackend):
+    """The sentence-transformers model named by EMBEDDING_MODEL_NAME."""
+    name = 'sentence-transformers'
+
+    def __init__(self, model_name: str, **options):
+        super().__init__(model_name, **options)
+        self.model = None
+
+    @property
+    def version(self) -> str:
+        return f"sentence-transformers/{self.model_name}"
+
+    @property
+    def dimension(self) -> int:
+        return self.model.get_sentence_embedding_dimension()
+
+    @property
+    def max_seq_length(self) -> int:
+        return self.model.max_seq_length if self.model is not None else EmbeddingBackend.max_seq_length
+
+    def load(self):
+        # Imported lazily: pulling in torch is a large part of the load cost
+        import sentence_transformers
+        logger.info(f"Loading sentence transformer model: {self.model_name}")
+        self.model = sentence_transformers.SentenceTransformer(self.model_name)
+        return self
+
+    def encode(self, texts: List[str], batch_size: int = 32, **kwargs) -> np.ndarray:
+        kwargs.setdefault('convert_to_numpy', True)
+        kwargs.setdefault('show_progress_bar', False)
+        return self.model.encode(texts, batch_size=batch_size, **kwargs)
+
+
+class QuantizedSentenceTransformerBackend(SentenceTransformerBackend):
+    """The same model with int8 dynamically quantized linear layers, or float16 on a GPU.
+
+    Vectors differ slightly from the full-precision model, so the precision
+    is part of the version and collections must be rebuilt to switch.
+    """
+    name = 'sentence-transformers-quantized'
+
+    @property
+    def precision(self) -> str:
+        return self.options.get('precision') or 'int8'
+
+    @property
+    def version(self) -> str:
+        return f"sentence-transformers/{self.model_name}@{self.precision}"
+
+    def load(self):
+        super().load()
+        import torch
+        if self.precision == 'float16':
+            if not torch.cuda.is_available():
+                raise ValueError("float16 embeddings need a CUDA device; use int8 on CPU-only hosts")
+            self.model = self.model.to('cuda').half()
+        elif self.precision == 'int8':
+            self.model = torch.quantization.quantize_dynamic(self.model, {torch.nn.Linear}, dtype=torch.qint8)
+        else:
+            raise ValueError(f"Unsupported embedding precision: {self.precision}")
+        logger.info(f"Using {self.precision} weights for {self.model_name}")
+        return self
+
+
+class HashingBackend(EmbeddingBackend):
+    """Model-free embedder: signed feature hashing of word unigrams and bigrams.
+
+    Needs no model files and costs a regex scan plus a CRC per feature, so it
+    suits CI, load tests and latency-critical deployments. Retrieval quality
+    is lexical, not semantic.
+    """
+    name = 'hashing'
+
+    @property
+    def version(self) -> str:
+        return f"hashing-v1/{self.dimension}"
+
+    @property
+    def dimension(self) -> int:
+        return self.options.get('dimension') or 384
+
+    def encode(self, texts: List[str], batch_size: int = 32, **kwargs) -> np.ndarray:
+        dimension = self.dimension
+        embeddings = np.zeros((len(texts), dimension), dtype=np.float32)
+        for row, text in enumerate(texts):
+            tokens = HASHING_TOKEN.findall(text.lower())
+            features = tokens + [f"{first} {second}" for first, second in zip(tokens, tokens[1:])]
+            if not features:
+                continue
+            hashes = np.fromiter((zlib.crc32(feature.encode('utf-8')) for feature in features),
+                                 dtype=np.uint32, count=len(features))
+            # The top bit picks the sign so colliding features tend to cancel
+            signs = np.where(hashes >> 31, 1.0, -1.0).astype(np.float32)
+            np.add.at(embeddings[row], hashes % dimension, signs)
+            norm = np.linalg.norm(embeddings[row])
+            if norm:
+                embeddings[row] /= norm
+        return embeddings
+
+
+BACKENDS = {
+    backend.name: backend
+    for backend in (SentenceTransformerBackend, QuantizedSentenceTransformerBackend, HashingBackend)
+}
+
+
+def create_backend(name: str, model_name: str, **options) -> EmbeddingBackend:
+    """Instantiate the backend registered under ``name`` without loading it."""
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown embedding backend {name!r}; choose from {sorted(BACKENDS)}")
+    return BACKENDS[name](model_name, **options)
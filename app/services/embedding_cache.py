@@ -0,0 +1,158 @@
+# app/services/embedding_cache.py
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+from typing import List, Dict
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+class EmbeddingCache:
+    """Persistent float32 embedding cache keyed by model and chunk text.
+
+    Entries live in a small SQLite file so they survive restarts and are
+    shared by every worker process on the host. Keys are a SHA-256 of the
+    model name and the whitespace-normalized text, so re-uploading a mostly
+    unchanged syllabus only embeds the chunks that actually changed. The
+    file is kept under ``max_bytes`` by evicting least recently used entries.
+    """
+
+    def __init__(self, path: str, max_bytes: int = 256 * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'writes': 0, 'evictions': 0}
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._connection = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        self._connection.execute(
+            'CREATE TABLE IF NOT EXISTS embeddings ('
+            ' key TEXT PRIMARY KEY,'
+            ' model TEXT NOT NULL,'
+            ' vector BLOB NOT NULL,'
+            ' size INTEGER NOT NULL,'
+            ' last_access REAL NOT NULL)'
+        )
+        self._connection.execute(
+            'CREATE INDEX IF NOT EXISTS embeddings_last_access ON embeddings (last_access)'
+        )
+        self._connection.commit()
+        # Running estimate; the real size is only summed when it passes the cap
+        self._approx_bytes = self._connection.execute(
+            'SELECT COALESCE(SUM(size), 0) FROM embeddings'
+        ).fetchone()[0]
+
+    @staticmethod
+    def make_key(model_name: str, text: str) -> str:
+        normalized = " ".join(unicodedata.normalize('NFC', text).split())
+        return hashlib.sha256(f"{model_name}\0{normalized}".encode('utf-8')).hexdigest()
+
+    def get_many(self, model_name: str, texts: List[str]) -> Dict[int, np.ndarray]:
+        """Return cached vectors by index into ``texts``; misses are omitted."""
+        keys = [self.make_key(model_name, text) for text in texts]
+        unique_keys = list(dict.fromkeys(keys))
+        found = {}
+
+        with self._lock:
+            # Stay well below SQLite's bound-parameter limit
+            for i in range(0, len(unique_keys), 500):
+                batch = unique_keys[i:i + 500]
+                placeholders = ','.join('?' * len(batch))
+                rows = self._connection.execute(
+                    f'SELECT key, vector FROM embeddings WHERE key IN ({placeholders})', batch
+                ).fetchall()
+                for key, vector in rows:
+                    found[key] = np.frombuffer(vector, dtype=np.float32)
+
+            if found:
+                now = time.time()
+                self._connection.executemany(
+                    'UPDATE embeddings SET last_access = ? WHERE key = ?',
+                    [(now, key) for key in found]
+                )
+                self._connection.commit()
+
+        results = {index: found[key] for index, key in enumerate(keys) if key in found}
+        self._stats['hits'] += len(results)
+        self._stats['misses'] += len(texts) - len(results)
+        return results
+
+    def put_many(self, model_name: str, texts: List[str], vectors: np.ndarray):
+        """Store one float32 vector per text and evict old entries if needed."""
+        now = time.time()
+        rows = []
+        for text, vector in zip(texts, vectors):
+            blob = np.asarray(vector, dtype=np.float32).tobytes()
+            rows.append((self.make_key(model_name, text), model_name, blob, len(blob), now))
+
+        with self._lock:
+            self._connection.executemany(
+                'INSERT OR REPLACE INTO embeddings (key, model, vector, size, last_access) '
+                'VALUES (?, ?, ?, ?, ?)',
+                rows
+            )
+            self._connection.commit()
+            self._stats['writes'] += len(rows)
+            self._approx_bytes += sum(row[3] for row in rows)
+            if self._approx_bytes > self.max_bytes:
+                self._evict()
+
+    def clear(self):
+        with self._lock:
+            self._connection.execute('DELETE FROM embeddings')
+            self._connection.commit()
+            self._approx_bytes = 0
+
+    def get_stats(self):
+        """Get hit/miss counters and the current cache size."""
+        with self._lock:
+            entries, total_bytes = self._connection.execute(
+                'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM embeddings'
+            ).fetchone()
+        lookups = self._stats['hits'] + self._stats['misses']
+        return {
+            'path': self.path,
+            'entries': entries,
+            'size_mb': total_bytes / (1024 * 1024),
+            'max_size_mb': self.max_bytes / (1024 * 1024),
+            'hits': self._stats['hits'],
+            'misses': self._stats['misses'],
+            'hit_rate': self._stats['hits'] / lookups if lookups else None,
+            'writes': self._stats['writes'],
+            'evictions': self._stats['evictions']
+        }
+
+    def _evict(self):
+        total_bytes = self._connection.execute(
+            'SELECT COALESCE(SUM(size), 0) FROM embeddings'
+        ).fetchone()[0]
+        if total_bytes <= self.max_bytes:
+            self._approx_bytes = total_bytes
+            return
+
+        # Evict down to 90% of the cap so we don't evict on every write
+        target = int(self.max_bytes * 0.9)
+        evicted = 0
+        rows = self._connection.execute(
+            'SELECT key, size FROM embeddings ORDER BY last_access ASC'
+        )
+        stale_keys = []
+        for key, size in rows:
+            if total_bytes <= target:
+                break
+            stale_keys.append((key,))
+            total_bytes -= size
+            evicted += 1
+
+        self._connection.executemany('DELETE FROM embeddings WHERE key = ?', stale_keys)
+        self._connection.commit()
+        self._approx_bytes = total_bytes
+        self._stats['evictions'] += evicted
+        logger.info(f"Evicted {evicted} embeddings from cache {self.path}")
@@ -0,0 +1,129 @@
+# app/services/fake_llm_server.py
+"""Serve the fake LLM provider over an OpenAI-compatible chat completions API.
+
+Lets the app, or a load test, exercise the real HTTP path (connection
+pool, timeouts, retries on 500s) without calling a paid model. Point the
+app at it with the OpenAI provider:
+
+    python -m app.services.fake_llm_server --port 8081 --latency-ms 400 --error-rate 0.01
+    LLM_PROVIDER=openai LLM_BASE_URL=http://127.0.0.1:8081/v1 OPENAI_API_KEY=fake flask run
+
+Simulated failures are answered with HTTP 500, which the client retries.
+"""
+import argparse
+import json
+import logging
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from app.services.llm_providers import FakeProvider, LATENCY_DISTRIBUTIONS, ProviderError
+
+logger = logging.getLogger(__name__)
+
+
+class FakeLLMRequestHandler(BaseHTTPRequestHandler):
+    # Keep-alive, so clients reuse pooled connections as they would upstream
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        if self.path.rstrip('/') not in ('/v1/chat/completions', '/chat/completions'):
+            self._send_json(404, {'error': {'message': f"Unknown path {self.path}", 'type': 'invalid_request_error'}})
+            return
+        body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+        messages, model = body.get('messages', []), body.get('model', 'fake')
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        try:
+            if body.get('stream'):
+                pieces = self.server.provider.stream(messages, model, None, max_tokens=body.get('max_tokens'))
+                self._send_stream(completion_id, model, pieces)
+            else:
+                text = self.server.provider.complete(messages, model, None, max_tokens=body.get('max_tokens'))
+                self._send_json(200, {
+                    'id': completion_id,
+                    'object': 'chat.completion',
+                    'created': int(time.time()),
+                    'model': model,
+                    'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': text},
+                                 'finish_reason': 'stop'}],
+                    'usage': {'prompt_tokens': 0, 'completion_tokens': len(text.split()),
+                              'total_tokens': len(text.split())}
+                })
+        except ProviderError as e:
+            self._send_json(500, {'error': {'message': str(e), 'type': 'server_error'}})
+
+    def _send_json(self, status: int, payload: dict):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_stream(self, completion_id: str, model: str, pieces):
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+
+        def chunk(delta, finish_reason=None):
+            return {'id': completion_id, 'object': 'chat.completion.chunk', 'created': int(time.time()),
+                    'model': model, 'choices': [{'index': 0, 'delta': delta, 'finish_reason': finish_reason}]}
+
+        try:
+            self._write_chunk(chunk({'role': 'assistant', 'content': ''}))
+            for piece in pieces:
+                self._write_chunk(chunk({'content': piece}))
+            self._write_chunk(chunk({}, 'stop'))
+            self._write_chunk('[DONE]')
+            self.wfile.write(b'0\r\n\r\n')
+        except (BrokenPipeError, ConnectionResetError):
+            # The client abandoned the stream
+            self.close_connection = True
+        finally:
+            pieces.close()
+
+    def _write_chunk(self, payload):
+        data = f"data: {payload if isinstance(payload, str) else json.dumps(payload)}\n\n".encode()
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+    def log_message(self, format, *args):
+        logger.debug(f"{self.address_string()} {format % args}")
+
+
+def create_server(provider: FakeProvider, host: str = '127.0.0.1', port: int = 8081) -> ThreadingHTTPServer:
+    """Return a threaded server answering with ``provider``; call serve_forever() to run it."""
+    server = ThreadingHTTPServer((host, port), FakeLLMRequestHandler)
+    server.daemon_threads = True
+    server.provider = provider
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8081)
+    parser.add_argument('--latency-ms', type=float, default=300, help='Median time to first token')
+    parser.add_argument('--latency-distribution', default='lognormal', choices=LATENCY_DISTRIBUTIONS)
+    parser.add_argument('--latency-sigma', type=float, default=0.5, help='Spread of the lognormal distribution')
+    parser.add_argument('--tokens-per-second', type=float, default=50)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--answer-tokens', type=int, default=40)
+    parser.add_argument('--seed', type=int)
+    args = parser.parse_args()
+
+    provider = FakeProvider(latency_ms=args.latency_ms, latency_distribution=args.latency_distribution,
+                            latency_sigma=args.latency_sigma, tokens_per_second=args.tokens_per_second,
+                            error_rate=args.error_rate, answer_tokens=args.answer_tokens, seed=args.seed)
+    server = create_server(provider, args.host, args.port)
+    print(f"Fake LLM listening on http://{args.host}:{server.server_address[1]}/v1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
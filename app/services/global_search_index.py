@@ -0,0 +1,301 @@
+# app/services/global_search_index.py
+import logging
+import os
+import re
+import tempfile
+import threading
+import time
+from typing import List, Dict, Any, Optional, Tuple
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+UNSAFE_PATH_CHARACTERS = re.compile(r'[^A-Za-z0-9._-]+')
+ENTRY_NAME = re.compile(r'syllabus_(\d+)\.npz')
+
+
+def section_vectors(vectors: np.ndarray, pages: List[Optional[int]], max_sections: int
+                    ) -> Tuple[np.ndarray, np.ndarray]:
+    """Summarize a syllabus as one document vector plus up to ``max_sections`` section vectors.
+
+    ``vectors`` are chunk embeddings in document order. Sections are
+    contiguous runs of chunks; each vector is the normalized mean of its
+    chunks. Returns (vectors, first page of each row, -1 for the document row).
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    groups = np.array_split(np.arange(len(vectors)), min(max_sections, len(vectors)))
+    rows = [vectors.mean(axis=0)] + [vectors[group].mean(axis=0) for group in groups]
+    row_pages = [-1] + [pages[group[0]] if pages[group[0]] is not None else -1 for group in groups]
+    rows = np.vstack(rows)
+    norms = np.linalg.norm(rows, axis=1, keepdims=True)
+    return rows / np.where(norms == 0, 1, norms), np.asarray(row_pages, dtype=np.int32)
+
+
+class GlobalSearchIndex:
+    """Cross-syllabus content search over one document vector and a few section vectors per syllabus.
+
+    Each syllabus occupies a slot of ``1 + max_sections`` rows in one
+    preallocated float32 matrix, so a search is a single matrix-vector
+    product, a max over each slot's rows and ``argpartition`` for the
+    requested page. A syllabus scores as its best-matching row, so a course
+    that covers a topic in one section ranks even if the rest is unrelated.
+
+    Slots are freed on delete and reused on upload, so updates never rebuild
+    the matrix. Each syllabus is also saved to its own small file, the
+    source of truth for other processes. When the directory changes, only
+    the files added, replaced or deleted since the last look are reloaded.
+    Files are written in a sibling staging directory and moved into place,
+    so readers never see a partial file. The directory holds vectors of a
+    single embedding version.
+    """
+
+    def __init__(self, directory: str, max_sections: int = 2):
+        self.directory = directory
+        self.staging_directory = f"{directory.rstrip(os.sep)}.staging"
+        self.max_sections = max_sections
+        self.rows_per_slot = 1 + max_sections
+        self._lock = threading.Lock()
+        self._loaded_version = None
+        self._file_versions = {}  # file name -> version of the file last placed from it
+        self._departments = {}
+        self._reset(dimension=None, capacity=0)
+        self._stats = {'searches': 0, 'search_seconds': 0.0, 'upserts': 0, 'removals': 0, 'reloads': 0,
+                       'reloaded_entries': 0}
+
+    def _reset(self, dimension: Optional[int], capacity: int):
+        self.dimension = dimension
+        self._slots = {}  # syllabus id -> slot
+        self._free = []
+        self._used = 0
+        self._slot_syllabus = np.full(capacity, -1, dtype=np.int64)
+        self._slot_department = np.full(capacity, -1, dtype=np.int32)
+        self._valid = np.zeros((capacity, self.rows_per_slot), dtype=bool)
+        self._pages = np.full((capacity, self.rows_per_slot), -1, dtype=np.int32)
+        self._vectors = np.zeros((capacity, self.rows_per_slot, dimension or 0), dtype=np.float32)
+
+    def __len__(self):
+        self._ensure_loaded()
+        return len(self._slots)
+
+    def path(self, syllabus_id: int) -> str:
+        return os.path.join(self.directory, f"syllabus_{syllabus_id}.npz")
+
+    def upsert(self, syllabus_id: int, department: Optional[str], vectors: np.ndarray, pages: np.ndarray):
+        """Add or replace a syllabus's rows, as built by ``section_vectors``."""
+        vectors = np.asarray(vectors, dtype=np.float32)[:self.rows_per_slot]
+        pages = np.asarray(pages, dtype=np.int32)[:self.rows_per_slot]
+        self._ensure_loaded()
+        os.makedirs(self.directory, exist_ok=True)
+        os.makedirs(self.staging_directory, exist_ok=True)
+        path = self.path(syllabus_id)
+        descriptor, temporary_path = tempfile.mkstemp(suffix='.npz', dir=self.staging_directory)
+        try:
+            with os.fdopen(descriptor, 'wb') as file:
+                np.savez(file, vectors=vectors, pages=pages, department=np.asarray(department or ''))
+        except BaseException:
+            os.remove(temporary_path)
+            raise
+        with self._lock:
+            os.replace(temporary_path, path)
+            self._place(syllabus_id, department or '', vectors, pages)
+            self._file_versions[os.path.basename(path)] = self._file_version(path)
+            self._stats['upserts'] += 1
+
+    def remove(self, syllabus_id: int):
+        self._ensure_loaded()
+        with self._lock:
+            try:
+                os.remove(self.path(syllabus_id))
+            except FileNotFoundError:
+                pass
+            self._release(syllabus_id)
+            self._file_versions.pop(os.path.basename(self.path(syllabus_id)), None)
+            self._stats['removals'] += 1
+
+    def search(self, query_vector: np.ndarray, department: Optional[str] = None, page: int = 1,
+               per_page: int = 10, min_score: float = 0.0) -> Tuple[List[Dict[str, Any]], int]:
+        """Return (one page of {syllabus_id, score, page} ranked by relevance, total matches)."""
+        self._ensure_loaded()
+        start_time = time.perf_counter()
+        with self._lock:
+            try:
+                return self._search(query_vector, department, page, per_page, min_score)
+            finally:
+                self._stats['searches'] += 1
+                self._stats['search_seconds'] += time.perf_counter() - start_time
+
+    def _search(self, query_vector, department, page, per_page, min_score):
+        used = self._used
+        if not self._slots or used == 0:
+            return [], 0
+        query = np.asarray(query_vector, dtype=np.float32).reshape(-1)
+        if query.shape[0] != self.dimension:
+            raise ValueError(f"Query has dimension {query.shape[0]}, index has {self.dimension}")
+        norm = np.linalg.norm(query)
+        if norm:
+            query = query / norm
+
+        similarities = (self._vectors[:used].reshape(-1, self.dimension) @ query).reshape(used, self.rows_per_slot)
+        similarities[~self._valid[:used]] = -np.inf
+        best_rows = similarities.argmax(axis=1)
+        scores = similarities[np.arange(used), best_rows]
+
+        matches = (self._slot_syllabus[:used] >= 0) & (scores >= min_score)
+        if department:
+            code = self._departments.get(department)
+            if code is None:
+                return [], 0
+            matches &= self._slot_department[:used] == code
+        candidates = np.flatnonzero(matches)
+        total = len(candidates)
+
+        first, last = (page - 1) * per_page, page * per_page
+        if first >= total:
+            return [], total
+        if last < total:
+            candidates = candidates[np.argpartition(-scores[candidates], last - 1)[:last]]
+        ranked = candidates[np.argsort(-scores[candidates], kind='stable')][first:last]
+        return [{
+            'syllabus_id': int(self._slot_syllabus[slot]),
+            'score': float(scores[slot]),
+            # Page where the best-matching section starts; None when the whole document matched best
+            'page': int(self._pages[slot, best_rows[slot]]) if self._pages[slot, best_rows[slot]] >= 0 else None
+        } for slot in ranked], total
+
+    def _place(self, syllabus_id: int, department: str, vectors: np.ndarray, pages: np.ndarray):
+        if self.dimension != vectors.shape[1]:
+            if self._slots:
+                raise ValueError(f"Vectors have dimension {vectors.shape[1]}, index has {self.dimension}")
+            self._reset(dimension=vectors.shape[1], capacity=len(self._slot_syllabus))
+
+        slot = self._slots.get(syllabus_id)
+        if slot is None:
+            slot = self._free.pop() if self._free else self._next_slot()
+            self._slots[syllabus_id] = slot
+        count = len(vectors)
+        self._slot_syllabus[slot] = syllabus_id
+        self._slot_department[slot] = self._departments.setdefault(department, len(self._departments))
+        self._vectors[slot] = 0
+        self._vectors[slot, :count] = vectors
+        self._valid[slot] = False
+        self._valid[slot, :count] = True
+        self._pages[slot] = -1
+        self._pages[slot, :count] = pages
+
+    def _next_slot(self) -> int:
+        if self._used == len(self._slot_syllabus):
+            self._grow(max(64, 2 * len(self._slot_syllabus)))
+        self._used += 1
+        return self._used - 1
+
+    def _grow(self, capacity: int):
+        used = self._used
+        arrays = (self._slot_syllabus, self._slot_department, self._valid, self._pages, self._vectors)
+        slots, free = self._slots, self._free
+        self._reset(self.dimension, capacity)
+        for old, new in zip(arrays, (self._slot_syllabus, self._slot_department, self._valid,
+                                     self._pages, self._vectors)):
+            new[:used] = old[:used]
+        self._slots, self._free, self._used = slots, free, used
+
+    def _release(self, syllabus_id: int):
+        slot = self._slots.pop(syllabus_id, None)
+        if slot is None:
+            return
+        self._slot_syllabus[slot] = -1
+        self._valid[slot] = False
+        self._free.append(slot)
+
+    def _directory_version(self):
+        try:
+            stat = os.stat(self.directory)
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns
+
+    @staticmethod
+    def _file_version(path: str):
+        """Identity of a file's current contents; files are replaced, never rewritten, so the inode changes."""
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+    def _ensure_loaded(self):
+        """Reload the syllabus files another process added, replaced or deleted since the last look.
+
+        The directory mtime is a cheap check that anything changed. Files
+        are listed and read without the lock, so searches keep running; a
+        change is only applied if no upsert or removal here touched that
+        file in the meantime.
+        """
+        version = self._directory_version()
+        if version == self._loaded_version:
+            return
+        start_time = time.perf_counter()
+        current = {}
+        for name in os.listdir(self.directory) if version is not None else []:
+            if ENTRY_NAME.fullmatch(name):
+                current[name] = self._file_version(os.path.join(self.directory, name))
+        with self._lock:
+            known = dict(self._file_versions)
+        changed = [name for name, file_version in current.items()
+                   if file_version is not None and known.get(name) != file_version]
+        deleted = [name for name in known if name not in current]
+
+        loaded = {}
+        for name in changed:
+            try:
+                with np.load(os.path.join(self.directory, name), allow_pickle=False) as data:
+                    loaded[name] = (str(data['department']), data['vectors'], data['pages'])
+            except FileNotFoundError:
+                deleted.append(name)
+            except (OSError, ValueError) as e:
+                logger.warning(f"Skipping unreadable search index entry {name}: {str(e)}")
+
+        with self._lock:
+            for name in deleted:
+                if self._file_versions.get(name) == known.get(name):
+                    self._release(int(ENTRY_NAME.fullmatch(name).group(1)))
+                    self._file_versions.pop(name, None)
+            for name, (department, vectors, pages) in loaded.items():
+                if self._file_versions.get(name) != known.get(name):
+                    continue
+                try:
+                    self._place(int(ENTRY_NAME.fullmatch(name).group(1)), department, vectors, pages)
+                except ValueError as e:
+                    logger.warning(f"Skipping unreadable search index entry {name}: {str(e)}")
+                    continue
+                self._file_versions[name] = current[name]
+            self._loaded_version = version
+            self._stats['reloads'] += 1
+            self._stats['reloaded_entries'] += len(loaded) + len(deleted)
+        if loaded or deleted:
+            logger.info(f"Reloaded {len(loaded)} and dropped {len(deleted)} search index entries "
+                        f"in {time.perf_counter() - start_time:.2f}s")
+
+    def get_stats(self):
+        """Get index size and mean search latency."""
+        with self._lock:
+            stats = dict(self._stats)
+            syllabi = len(self._slots)
+            memory_bytes = self._vectors.nbytes
+        searches = stats['searches']
+        return {
+            'directory': self.directory,
+            'syllabi': syllabi,
+            'dimension': self.dimension,
+            'memory_mb': memory_bytes / (1024 * 1024),
+            'searches': searches,
+            'mean_search_ms': stats['search_seconds'] / searches * 1000 if searches else None,
+            'upserts': stats['upserts'],
+            'removals': stats['removals'],
+            'reloads': stats['reloads'],
+            'reloaded_entries': stats['reloaded_entries']
+        }
+
+
+def version_directory(root: str, embedding_version: str) -> str:
+    """Directory holding the search index for one embedding version."""
+    return os.path.join(root, UNSAFE_PATH_CHARACTERS.sub('_', embedding_version))
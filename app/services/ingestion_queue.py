@@ -0,0 +1,218 @@
+# app/services/ingestion_queue.py
+import logging
+import os
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from app.extensions import db
+from app.models.ingestion_job import IngestionJob
+from app.models.syllabus import Syllabus
+from app.services.pdf_service import process_pdf
+
+logger = logging.getLogger(__name__)
+
+# Minimum progress change between job status commits
+PROGRESS_STEP = 0.05
+
+class IngestionQueue:
+    """Runs syllabus ingestion jobs on a bounded local worker pool.
+
+    Jobs are persisted in the ``ingestion_jobs`` table, so their status can be
+    polled from any request and jobs abandoned by a crashed process are picked
+    up again at startup. The pool size caps how many PDFs are processed at once.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self.max_workers = 2
+        self.run_async = True
+        self.stale_after = 15 * 60
+        self._executor = None
+        self._lock = threading.Lock()
+        self._running = 0
+        self._stats = {'submitted': 0, 'completed': 0, 'failed': 0}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.max_workers = app.config.get('INGESTION_MAX_CONCURRENT_JOBS', 2)
+        self.run_async = app.config.get('INGESTION_ASYNC', True)
+        self.stale_after = app.config.get('INGESTION_STALE_JOB_TIMEOUT', 15 * 60)
+        app.extensions['ingestion_queue'] = self
+
+        if app.config.get('INGESTION_RECOVER_ON_STARTUP', True):
+            with app.app_context():
+                self.recover()
+
+    @property
+    def executor(self):
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.max_workers,
+                        thread_name_prefix='ingestion'
+                    )
+        return self._executor
+
+    def add(self, syllabus: Syllabus, file_path: str = None) -> IngestionJob:
+        """Add a queued job for the syllabus to the session.
+
+        The caller commits it together with the syllabus changes it
+        processes, then hands it to ``schedule``; a job committed but never
+        scheduled is picked up by ``recover``. ``file_path`` names a revised
+        upload to index; the syllabus keeps its current file until the job
+        succeeds.
+        """
+        job = IngestionJob(syllabus=syllabus, status=IngestionJob.QUEUED, progress={}, file_path=file_path)
+        db.session.add(job)
+        return job
+
+    def schedule(self, job: IngestionJob):
+        """Start a committed job."""
+        with self._lock:
+            self._stats['submitted'] += 1
+        logger.info(f"Queued ingestion job {job.id} for syllabus {job.syllabus_id}")
+        self._schedule(job.id)
+
+    def recover(self):
+        """Re-queue jobs left unfinished by a process that is gone.
+
+        Queued jobs are scheduled again; claiming is atomic, so one still
+        queued in a live process runs only once. A job past queueing is only
+        taken over once it started more than ``stale_after`` seconds ago, so
+        jobs other live processes are working on are left alone.
+        """
+        cutoff = datetime.utcnow() - timedelta(seconds=self.stale_after)
+        try:
+            jobs = IngestionJob.query.filter(
+                (IngestionJob.status == IngestionJob.QUEUED) |
+                (IngestionJob.status.in_(IngestionJob.STAGES) &
+                 (IngestionJob.started_at.is_(None) | (IngestionJob.started_at < cutoff)))
+            ).order_by(IngestionJob.id).all()
+        except Exception as e:
+            # The table may not exist yet on a fresh database
+            logger.debug(f"Skipping ingestion job recovery: {str(e)}")
+            db.session.rollback()
+            return 0
+
+        for job in jobs:
+            job.status = IngestionJob.QUEUED
+            job.progress = {}
+        db.session.commit()
+
+        for job in jobs:
+            logger.info(f"Recovering ingestion job {job.id} for syllabus {job.syllabus_id}")
+            self._schedule(job.id)
+        return len(jobs)
+
+    def get_stats(self):
+        """Get queue depth and job counters for monitoring."""
+        with self._lock:
+            stats = dict(self._stats)
+            running = self._running
+        return {
+            'max_workers': self.max_workers,
+            'running': running,
+            'submitted': stats['submitted'],
+            'completed': stats['completed'],
+            'failed': stats['failed']
+        }
+
+    def shutdown(self, wait=True):
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait)
+            self._executor = None
+
+    def _schedule(self, job_id: int):
+        if self.run_async:
+            self.executor.submit(self._run_job, job_id)
+        else:
+            self._run_job(job_id)
+            # The job ran in its own session; drop the caller's stale copies
+            db.session.expire_all()
+
+    def _claim(self, job_id: int) -> bool:
+        """Atomically move a queued job to its first stage."""
+        claimed = IngestionJob.query.filter_by(id=job_id, status=IngestionJob.QUEUED).update({
+            'status': IngestionJob.EXTRACTING,
+            'started_at': datetime.utcnow()
+        })
+        db.session.commit()
+        return claimed == 1
+
+    def _run_job(self, job_id: int):
+        with self.app.app_context():
+            with self._lock:
+                self._running += 1
+            try:
+                if not self._claim(job_id):
+                    logger.info(f"Ingestion job {job_id} was already claimed or removed")
+                    return
+
+                job = db.session.get(IngestionJob, job_id)
+                syllabus = db.session.get(Syllabus, job.syllabus_id)
+                if syllabus is None:
+                    raise ValueError(f"Syllabus {job.syllabus_id} no longer exists")
+
+                def report_progress(stage, fraction):
+                    progress = dict(job.progress or {})
+                    fraction = round(min(max(fraction, 0.0), 1.0), 3)
+                    # Stages overlap while pages stream through the pipeline,
+                    # so only commit meaningful steps and never move backwards
+                    if fraction < 1.0 and fraction - progress.get(stage, 0.0) < PROGRESS_STEP:
+                        return
+                    progress[stage] = fraction
+                    job.progress = progress
+                    if IngestionJob.STAGES.index(stage) > IngestionJob.STAGES.index(job.status):
+                        job.status = stage
+                    db.session.commit()
+
+                result = process_pdf(syllabus, progress_callback=report_progress, file_name=job.file_path)
+
+                replaced_file = None
+                if job.file_path and job.file_path != syllabus.file_path:
+                    replaced_file, syllabus.file_path = syllabus.file_path, job.file_path
+                job.status = IngestionJob.DONE
+                job.progress = {stage: 1.0 for stage in IngestionJob.STAGES}
+                job.result = result
+                job.finished_at = datetime.utcnow()
+                db.session.commit()
+                if replaced_file:
+                    self._remove_upload(replaced_file)
+                with self._lock:
+                    self._stats['completed'] += 1
+                logger.info(f"Ingestion job {job_id} finished for syllabus {syllabus.id}")
+
+            except Exception as e:
+                db.session.rollback()
+                logger.error(f"Ingestion job {job_id} failed: {str(e)}")
+                logger.error(f"Traceback: {traceback.format_exc()}")
+                with self._lock:
+                    self._stats['failed'] += 1
+                job = db.session.get(IngestionJob, job_id)
+                if job is not None:
+                    job.status = IngestionJob.FAILED
+                    job.error = f"{type(e).__name__}: {str(e)}"
+                    job.finished_at = datetime.utcnow()
+                    db.session.commit()
+                    # The revision never became the syllabus's file; the old one still backs its index
+                    syllabus = db.session.get(Syllabus, job.syllabus_id)
+                    if job.file_path and (syllabus is None or job.file_path != syllabus.file_path):
+                        self._remove_upload(job.file_path)
+            finally:
+                with self._lock:
+                    self._running -= 1
+                db.session.remove()
+
+    def _remove_upload(self, file_name: str):
+        file_path = os.path.join(self.app.config['UPLOAD_FOLDER'], file_name)
+        try:
+            os.remove(file_path)
+            logger.info(f"Removed superseded upload {file_path}")
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.warning(f"Could not remove upload {file_path}: {str(e)}")
@@ -0,0 +1,306 @@
+# app/services/lexical_index.py
+import logging
+import os
+import re
+import tempfile
+import threading
+import time
+from collections import Counter, OrderedDict
+from typing import List, Dict, Any, Iterable, Optional, Tuple
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+LEXICAL_TOKEN = re.compile(r'\w+')
+# Question words and function words carry no lexical signal in student questions
+STOPWORDS = frozenset("""
+a an and are as at be by can do does for from how i if in is it me my of on or the
+there this to was what when where which who why will with you your
+""".split())
+
+DEFAULT_INDEX_DIR = os.path.join(tempfile.gettempdir(), "lexical_index")
+METADATA_FIELDS = ('page', 'position', 'start', 'end')
+TEXT_METADATA_FIELDS = ('section', 'heading')
+
+
+def tokenize(text: str) -> List[str]:
+    return [token for token in LEXICAL_TOKEN.findall(text.lower()) if token not in STOPWORDS]
+
+
+class LexicalIndex:
+    """Immutable BM25 index over one syllabus's chunks.
+
+    Postings are stored as flat NumPy arrays in CSR layout (per-term offsets
+    into one doc-index array and one term-frequency array), alongside a
+    forward index of each chunk's terms so re-ingestion only tokenizes the
+    chunks that changed. Chunk text and location metadata are kept too, so a
+    lexical search needs neither Chroma nor the embedding model.
+    """
+
+    def __init__(self, arrays: Dict[str, np.ndarray], k1: float = 1.2, b: float = 0.75):
+        for field in TEXT_METADATA_FIELDS:
+            # Indexes saved before sections were detected have none
+            arrays.setdefault(field, np.full(len(arrays['ids']), '', dtype=str))
+        self.arrays = arrays
+        self.k1 = k1
+        self.b = b
+        self.ids = arrays['ids']
+        self.vocabulary = {term: term_id for term_id, term in enumerate(arrays['vocabulary'].tolist())}
+        self._text_bytes = arrays['text_bytes']
+        self._text_offsets = arrays['text_offsets']
+
+        lengths = np.diff(arrays['doc_offsets']).astype(np.float32)
+        average_length = lengths.mean() if len(lengths) else 0.0
+        # Per-document BM25 length normalization, precomputed once
+        self._length_norm = self.k1 * (1 - self.b + self.b * lengths / (average_length or 1.0))
+        document_frequency = np.diff(arrays['term_offsets']).astype(np.float32)
+        self._idf = np.log1p((len(self.ids) - document_frequency + 0.5) / (document_frequency + 0.5))
+
+    def __len__(self):
+        return len(self.ids)
+
+    @classmethod
+    def build(cls, documents: Iterable[Tuple[str, str, Dict[str, Any]]]) -> 'LexicalIndex':
+        """Build from (chunk id, text, metadata) triples."""
+        return cls.from_documents([cls._tokenized(chunk_id, text, metadata)
+                                   for chunk_id, text, metadata in documents])
+
+    @staticmethod
+    def _tokenized(chunk_id: str, text: str, metadata: Dict[str, Any]) -> Dict[str, Any]:
+        return {'id': chunk_id, 'text': text, 'metadata': metadata or {}, 'terms': Counter(tokenize(text))}
+
+    def documents(self) -> Iterable[Dict[str, Any]]:
+        """Yield the stored chunks with their term counts, for rebuilding."""
+        vocabulary = self.arrays['vocabulary']
+        doc_offsets = self.arrays['doc_offsets']
+        for index, chunk_id in enumerate(self.ids.tolist()):
+            first, last = doc_offsets[index], doc_offsets[index + 1]
+            yield {
+                'id': chunk_id,
+                'text': self.text(index),
+                'metadata': self.metadata(index),
+                'terms': Counter(dict(zip(vocabulary[self.arrays['doc_terms'][first:last]].tolist(),
+                                          self.arrays['doc_tfs'][first:last].tolist())))
+            }
+
+    def update(self, added: Iterable[Tuple[str, str, Dict[str, Any]]], removed_ids: Iterable[str],
+               metadata_updates: Dict[str, Dict[str, Any]] = None) -> 'LexicalIndex':
+        """Return a new index with chunks added, removed and relocated.
+
+        Only added chunks are tokenized; unchanged ones reuse their stored
+        term counts.
+        """
+        removed = set(removed_ids)
+        metadata_updates = metadata_updates or {}
+        documents = []
+        for document in self.documents():
+            if document['id'] in removed:
+                continue
+            if document['id'] in metadata_updates:
+                document['metadata'] = metadata_updates[document['id']]
+            documents.append(document)
+        documents.extend(self._tokenized(chunk_id, text, metadata) for chunk_id, text, metadata in added)
+        return self.from_documents(documents)
+
+    @classmethod
+    def from_documents(cls, documents: List[Dict[str, Any]]) -> 'LexicalIndex':
+        vocabulary = {}
+        doc_offsets = [0]
+        doc_terms = []
+        doc_tfs = []
+        for document in documents:
+            for term, count in document['terms'].items():
+                doc_terms.append(vocabulary.setdefault(term, len(vocabulary)))
+                doc_tfs.append(count)
+            doc_offsets.append(len(doc_terms))
+
+        doc_terms = np.asarray(doc_terms, dtype=np.int32)
+        doc_tfs = np.asarray(doc_tfs, dtype=np.int32)
+        doc_offsets = np.asarray(doc_offsets, dtype=np.int64)
+        # Invert the forward index: sort postings by term, keeping doc order
+        doc_of_posting = np.repeat(np.arange(len(documents), dtype=np.int32), np.diff(doc_offsets))
+        order = np.argsort(doc_terms, kind='stable')
+        term_offsets = np.zeros(len(vocabulary) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(doc_terms, minlength=len(vocabulary)), out=term_offsets[1:])
+
+        encoded = [document['text'].encode('utf-8') for document in documents]
+        text_offsets = np.zeros(len(documents) + 1, dtype=np.int64)
+        np.cumsum([len(text) for text in encoded], out=text_offsets[1:])
+
+        arrays = {
+            'ids': np.asarray([document['id'] for document in documents], dtype=str),
+            'vocabulary': np.asarray(list(vocabulary), dtype=str),
+            'doc_offsets': doc_offsets,
+            'doc_terms': doc_terms,
+            'doc_tfs': doc_tfs,
+            'term_offsets': term_offsets,
+            'postings_docs': doc_of_posting[order],
+            'postings_tfs': doc_tfs[order],
+            'text_bytes': np.frombuffer(b''.join(encoded), dtype=np.uint8),
+            'text_offsets': text_offsets
+        }
+        for field in METADATA_FIELDS:
+            arrays[field] = np.asarray([document['metadata'].get(field, -1) for document in documents],
+                                       dtype=np.int64)
+        for field in TEXT_METADATA_FIELDS:
+            arrays[field] = np.asarray([document['metadata'].get(field, '') for document in documents], dtype=str)
+        return cls(arrays)
+
+    def text(self, index: int) -> str:
+        return self._text_bytes[self._text_offsets[index]:self._text_offsets[index + 1]].tobytes().decode('utf-8')
+
+    def metadata(self, index: int) -> Dict[str, Any]:
+        metadata = {field: int(self.arrays[field][index]) for field in METADATA_FIELDS
+                    if self.arrays[field][index] >= 0}
+        metadata.update((field, str(self.arrays[field][index])) for field in TEXT_METADATA_FIELDS
+                        if self.arrays[field][index])
+        return metadata
+
+    def section_count(self, section: str) -> int:
+        """Number of chunks in a detected syllabus section."""
+        return int(np.count_nonzero(self.arrays['section'] == section))
+
+    def query_terms(self, query: str) -> Tuple[List[str], List[int]]:
+        """Return (query terms, ids of those present in the vocabulary)."""
+        terms = list(dict.fromkeys(tokenize(query)))
+        return terms, [self.vocabulary[term] for term in terms if term in self.vocabulary]
+
+    def search(self, query: str, k: int = 10, section: str = None) -> List[Dict[str, Any]]:
+        """Return up to ``k`` chunks ranked by BM25, each with matched-term count.
+
+        With ``section``, only chunks in that syllabus section are ranked.
+        """
+        terms, term_ids = self.query_terms(query)
+        if not term_ids or not len(self.ids):
+            return []
+
+        scores = np.zeros(len(self.ids), dtype=np.float32)
+        matched = np.zeros(len(self.ids), dtype=np.int32)
+        term_offsets = self.arrays['term_offsets']
+        for term_id in term_ids:
+            first, last = term_offsets[term_id], term_offsets[term_id + 1]
+            docs = self.arrays['postings_docs'][first:last]
+            tfs = self.arrays['postings_tfs'][first:last].astype(np.float32)
+            scores[docs] += self._idf[term_id] * tfs * (self.k1 + 1) / (tfs + self._length_norm[docs])
+            matched[docs] += 1
+
+        if section is not None:
+            scores[self.arrays['section'] != section] = 0
+        hits = np.flatnonzero(scores)
+        if len(hits) > k:
+            hits = hits[np.argpartition(-scores[hits], k - 1)[:k]]
+        hits = hits[np.argsort(-scores[hits], kind='stable')]
+        return [{
+            'id': str(self.ids[index]),
+            'text': self.text(index),
+            'score': float(scores[index]),
+            'matched_terms': int(matched[index]),
+            'query_terms': len(terms),
+            **self.metadata(index)
+        } for index in hits]
+
+    def save(self, path: str):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temporary_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp.npz"
+        np.savez(temporary_path, **self.arrays)
+        # Atomic swap so concurrent readers never see a half-written index
+        os.replace(temporary_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> 'LexicalIndex':
+        with np.load(path, allow_pickle=False) as data:
+            return cls({name: data[name] for name in data.files})
+
+
+class LexicalIndexStore:
+    """Per-syllabus lexical indexes on disk, with a small in-process LRU of loaded ones."""
+
+    def __init__(self, directory: str = DEFAULT_INDEX_DIR, max_loaded: int = 64):
+        self.directory = directory
+        self.max_loaded = max_loaded
+        self._loaded = OrderedDict()  # syllabus id -> (file mtime, index)
+        self._lock = threading.Lock()
+        self._stats = {'searches': 0, 'fast_path': 0, 'section_filtered': 0, 'loads': 0, 'builds': 0,
+                       'search_seconds': 0.0}
+
+    def path(self, syllabus_id: int) -> str:
+        return os.path.join(self.directory, f"syllabus_{syllabus_id}.npz")
+
+    def get(self, syllabus_id: int) -> Optional[LexicalIndex]:
+        """Return the syllabus index, reloading it if another process rewrote it."""
+        path = self.path(syllabus_id)
+        try:
+            modified = os.path.getmtime(path)
+        except OSError:
+            return None
+
+        with self._lock:
+            entry = self._loaded.get(syllabus_id)
+            if entry is not None and entry[0] == modified:
+                self._loaded.move_to_end(syllabus_id)
+                return entry[1]
+
+        index = LexicalIndex.load(path)
+        with self._lock:
+            self._stats['loads'] += 1
+            self._loaded[syllabus_id] = (modified, index)
+            self._loaded.move_to_end(syllabus_id)
+            while len(self._loaded) > self.max_loaded:
+                self._loaded.popitem(last=False)
+        return index
+
+    def put(self, syllabus_id: int, index: LexicalIndex):
+        path = self.path(syllabus_id)
+        index.save(path)
+        with self._lock:
+            self._stats['builds'] += 1
+            self._loaded[syllabus_id] = (os.path.getmtime(path), index)
+            self._loaded.move_to_end(syllabus_id)
+
+    def delete(self, syllabus_id: int):
+        with self._lock:
+            self._loaded.pop(syllabus_id, None)
+        try:
+            os.remove(self.path(syllabus_id))
+        except FileNotFoundError:
+            pass
+
+    def search(self, syllabus_id: int, query: str, k: int = 10,
+               section: str = None) -> Optional[List[Dict[str, Any]]]:
+        """Search one syllabus, or return None if it has no lexical index."""
+        index = self.get(syllabus_id)
+        if index is None:
+            return None
+        start_time = time.perf_counter()
+        results = index.search(query, k, section=section)
+        with self._lock:
+            self._stats['searches'] += 1
+            self._stats['search_seconds'] += time.perf_counter() - start_time
+        return results
+
+    def record_fast_path(self):
+        with self._lock:
+            self._stats['fast_path'] += 1
+
+    def record_section_filter(self):
+        with self._lock:
+            self._stats['section_filtered'] += 1
+
+    def get_stats(self):
+        """Get search counts and mean lexical search latency."""
+        with self._lock:
+            stats = dict(self._stats)
+            loaded = len(self._loaded)
+        searches = stats['searches']
+        return {
+            'directory': self.directory,
+            'loaded_indexes': loaded,
+            'searches': searches,
+            'fast_path_answers': stats['fast_path'],
+            'section_filtered_queries': stats['section_filtered'],
+            'mean_search_us': stats['search_seconds'] / searches * 1e6 if searches else None,
+            'loads': stats['loads'],
+            'builds': stats['builds']
+        }
@@ -0,0 +1,256 @@
+# app/services/llm_client.py
+import logging
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Generator, List, Optional
+import openai
+from app.services.llm_providers import LLMProvider, OpenAIProvider, ProviderError, ProviderTimeoutError
+
+logger = logging.getLogger(__name__)
+
+# Recent attempt latencies kept for percentile reporting and the hedge delay
+LATENCY_SAMPLES = 1000
+# Requests are only hedged once this many latencies give a usable p95
+MIN_HEDGE_SAMPLES = 20
+
+# Failures worth another attempt: the request may well succeed if repeated
+RETRYABLE_ERRORS = (openai.APIConnectionError, openai.RateLimitError, openai.InternalServerError, ProviderError)
+TIMEOUT_ERRORS = (openai.APITimeoutError, ProviderTimeoutError)
+
+
+class LLMError(RuntimeError):
+    """A completion could not be produced within the client's limits."""
+
+
+class LLMSaturatedError(LLMError):
+    """Every upstream slot stayed busy until the call's deadline or queue timeout."""
+
+
+class LLMTimeoutError(LLMError):
+    """The call's deadline passed before a completion arrived."""
+
+
+class LLMClient:
+    """Shared, concurrency-limited client for chat completions.
+
+    All calls go to one provider (see app.services.llm_providers), by
+    default OpenAI over a persistent connection pool. A semaphore caps
+    calls in flight upstream at ``max_concurrency``; a call that finds
+    every slot busy waits up to ``queue_timeout`` for one, so a slow
+    upstream backs requests up here instead of tying up every worker.
+    Each call has a deadline of ``timeout`` seconds, covering queueing,
+    every attempt and the backoff between them. Connection errors,
+    timeouts, rate limits and 5xx responses are retried up to
+    ``max_retries`` times with full-jitter exponential backoff.
+
+    With ``hedge`` set, a completion still running after the p95 of recent
+    attempt latencies (at least ``hedge_min_delay``) is raced against a
+    second identical request, if a slot is free, and the first to succeed
+    is returned. Streams are never hedged; their deadline covers the wait
+    for the response to start, and each read after that is bounded by the
+    same timeout.
+    """
+
+    def __init__(self, provider: Optional[LLMProvider] = None, model: str = 'gpt-3.5-turbo',
+                 max_concurrency: int = 8, timeout: float = 30.0, queue_timeout: float = 10.0,
+                 max_retries: int = 2, backoff_base: float = 0.5, backoff_max: float = 4.0,
+                 hedge: bool = False, hedge_min_delay: float = 1.0):
+        self.model = model
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.queue_timeout = queue_timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.hedge = hedge
+        self.hedge_min_delay = hedge_min_delay
+        self.provider = provider or OpenAIProvider(max_connections=max_concurrency)
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._executor = (ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix='llm-hedge')
+                          if hedge else None)
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=LATENCY_SAMPLES)
+        self._in_flight = 0
+        self._stats = {'calls': 0, 'streams': 0, 'attempts': 0, 'retries': 0, 'timeouts': 0, 'errors': 0,
+                       'saturated': 0, 'rejected': 0, 'queue_wait_seconds': 0.0, 'peak_in_flight': 0,
+                       'hedges': 0, 'hedge_wins': 0}
+
+    def complete(self, messages: List[Dict[str, str]], **params) -> str:
+        """Return the text of a chat completion for ``messages``."""
+        deadline = time.monotonic() + self.timeout
+
+        def create(timeout):
+            return self.provider.complete(messages, self.model, timeout, **params)
+
+        with self._lock:
+            self._stats['calls'] += 1
+        self._acquire(deadline)
+        if self._executor is None:
+            try:
+                return self._call(deadline, create)
+            finally:
+                self._release()
+        return self._hedged(deadline, create)
+
+    def stream(self, messages: List[Dict[str, str]], **params) -> Generator[str, None, None]:
+        """Yield the pieces of a streamed chat completion as they arrive.
+
+        The upstream slot is held until the stream is exhausted or the
+        generator is closed, which also abandons the upstream response.
+        """
+        deadline = time.monotonic() + self.timeout
+
+        def create(timeout):
+            return self.provider.stream(messages, self.model, timeout, **params)
+
+        with self._lock:
+            self._stats['calls'] += 1
+            self._stats['streams'] += 1
+        self._acquire(deadline)
+        stream = None
+        try:
+            stream = self._call(deadline, create)
+            yield from stream
+        finally:
+            if stream is not None:
+                stream.close()
+            self._release()
+
+    def hedge_delay(self) -> Optional[float]:
+        """Seconds to wait before hedging a completion, or None until enough latencies are known."""
+        with self._lock:
+            if len(self._latencies) < MIN_HEDGE_SAMPLES:
+                return None
+            latencies = sorted(self._latencies)
+        return max(self.hedge_min_delay, latencies[int(0.95 * (len(latencies) - 1))])
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+        self.provider.close()
+
+    def _acquire(self, deadline: float, block: bool = True) -> bool:
+        """Take an upstream slot, waiting up to the queue timeout if ``block``."""
+        if not self._slots.acquire(blocking=False):
+            if not block:
+                return False
+            started = time.monotonic()
+            with self._lock:
+                self._stats['saturated'] += 1
+            acquired = self._slots.acquire(timeout=max(0.0, min(self.queue_timeout, deadline - started)))
+            with self._lock:
+                self._stats['queue_wait_seconds'] += time.monotonic() - started
+                if not acquired:
+                    self._stats['rejected'] += 1
+            if not acquired:
+                raise LLMSaturatedError(f"All {self.max_concurrency} LLM slots are busy")
+        with self._lock:
+            self._in_flight += 1
+            self._stats['peak_in_flight'] = max(self._stats['peak_in_flight'], self._in_flight)
+        return True
+
+    def _release(self):
+        with self._lock:
+            self._in_flight -= 1
+        self._slots.release()
+
+    def _call(self, deadline: float, create: Callable[[float], Any]) -> Any:
+        """Run ``create(timeout)`` until it succeeds, retries run out or the deadline passes."""
+        attempt = 0
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise LLMTimeoutError(f"LLM call timed out after {self.timeout}s")
+            started = time.monotonic()
+            with self._lock:
+                self._stats['attempts'] += 1
+            try:
+                result = create(remaining)
+            except RETRYABLE_ERRORS as e:
+                delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+                with self._lock:
+                    self._stats['timeouts' if isinstance(e, TIMEOUT_ERRORS) else 'errors'] += 1
+                    if attempt >= self.max_retries or time.monotonic() + delay >= deadline:
+                        raise
+                    self._stats['retries'] += 1
+                logger.warning(f"LLM attempt {attempt + 1} failed ({type(e).__name__}: {str(e)}); "
+                               f"retrying in {delay:.2f}s")
+                time.sleep(delay)
+                attempt += 1
+                continue
+            except Exception:
+                with self._lock:
+                    self._stats['errors'] += 1
+                raise
+            with self._lock:
+                self._latencies.append(time.monotonic() - started)
+            return result
+
+    def _submit(self, deadline: float, create: Callable[[float], Any]):
+        """Run a call on the hedging pool; it gives back its slot when done."""
+        future = self._executor.submit(self._call, deadline, create)
+        future.add_done_callback(lambda _: self._release())
+        return future
+
+    def _hedged(self, deadline: float, create: Callable[[float], Any]) -> Any:
+        futures = [self._submit(deadline, create)]
+        delay = self.hedge_delay()
+        if delay is not None:
+            done, _ = wait(futures, timeout=max(0.0, min(delay, deadline - time.monotonic())))
+            # Hedge only with a spare slot, so hedging never adds to queueing
+            if not done and self._acquire(deadline, block=False):
+                futures.append(self._submit(deadline, create))
+                with self._lock:
+                    self._stats['hedges'] += 1
+
+        pending, error = set(futures), None
+        while pending:
+            done, pending = wait(pending, timeout=max(0.0, deadline - time.monotonic()),
+                                 return_when=FIRST_COMPLETED)
+            if not done:
+                with self._lock:
+                    self._stats['timeouts'] += 1
+                raise LLMTimeoutError(f"LLM call timed out after {self.timeout}s")
+            for future in done:
+                if future.exception() is None:
+                    if future is not futures[0]:
+                        with self._lock:
+                            self._stats['hedge_wins'] += 1
+                    return future.result()
+                error = future.exception()
+        raise error
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get pool saturation, retry and hedging counts and attempt latency percentiles."""
+        with self._lock:
+            stats = dict(self._stats)
+            in_flight = self._in_flight
+            latencies = sorted(self._latencies)
+
+        def percentile(fraction):
+            return latencies[min(len(latencies) - 1, int(fraction * len(latencies)))] * 1000 if latencies else None
+
+        return {
+            'provider': self.provider.name,
+            'model': self.model,
+            'max_concurrency': self.max_concurrency,
+            'in_flight': in_flight,
+            'peak_in_flight': stats['peak_in_flight'],
+            'calls': stats['calls'],
+            'streams': stats['streams'],
+            'attempts': stats['attempts'],
+            'retries': stats['retries'],
+            'timeouts': stats['timeouts'],
+            'errors': stats['errors'],
+            'saturated': stats['saturated'],
+            'rejected': stats['rejected'],
+            'mean_queue_wait_ms': (stats['queue_wait_seconds'] / stats['saturated'] * 1000
+                                   if stats['saturated'] else None),
+            'hedges': stats['hedges'],
+            'hedge_wins': stats['hedge_wins'],
+            'latency_p50_ms': percentile(0.5),
+            'latency_p95_ms': percentile(0.95)
+        }
@@ -0,0 +1,177 @@
+# app/services/llm_providers.py
+import hashlib
+import json
+import logging
+import random
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Dict, Iterator, List, Optional
+import httpx
+import openai
+
+logger = logging.getLogger(__name__)
+
+LATENCY_DISTRIBUTIONS = ('constant', 'uniform', 'exponential', 'lognormal')
+
+
+class ProviderError(RuntimeError):
+    """A provider failed in a way another attempt may not."""
+
+
+class ProviderTimeoutError(ProviderError):
+    """A provider did not answer within the call's timeout."""
+
+
+class LLMProvider(ABC):
+    """Interface every chat completion provider implements.
+
+    Providers make single attempts; pooling limits, deadlines, retries and
+    hedging are layered on top by LLMClient. ``timeout`` is the time left
+    for the attempt in seconds, or None for no limit.
+    """
+    name = None
+
+    @abstractmethod
+    def complete(self, messages: List[Dict[str, str]], model: str, timeout: Optional[float], **params) -> str:
+        """Return the completion text for ``messages``."""
+
+    @abstractmethod
+    def stream(self, messages: List[Dict[str, str]], model: str, timeout: Optional[float],
+               **params) -> Iterator[str]:
+        """Start a streamed completion and return an iterator over its text pieces.
+
+        The request is made before this returns, so failures to start it are
+        raised here; closing the iterator abandons the response.
+        """
+
+    def close(self):
+        """Release connections held by the provider."""
+
+
+class OpenAIProvider(LLMProvider):
+    """OpenAI's chat completions API, or any server speaking it at ``base_url``.
+
+    Requests share one persistent httpx connection pool of
+    ``max_connections``. The SDK's own retries are off.
+    """
+    name = 'openai'
+
+    def __init__(self, base_url: Optional[str] = None, api_key: Optional[str] = None, max_connections: int = 8):
+        self.base_url = base_url
+        self._http_client = httpx.Client(limits=httpx.Limits(max_connections=max_connections,
+                                                             max_keepalive_connections=max_connections))
+        self.client = openai.OpenAI(base_url=base_url, api_key=api_key, http_client=self._http_client,
+                                    max_retries=0)
+
+    def complete(self, messages, model, timeout, **params):
+        response = self.client.chat.completions.create(model=model, messages=messages, timeout=timeout, **params)
+        return response.choices[0].message.content
+
+    def stream(self, messages, model, timeout, **params):
+        response = self.client.chat.completions.create(model=model, messages=messages, stream=True,
+                                                       timeout=timeout, **params)
+        return self._pieces(response)
+
+    @staticmethod
+    def _pieces(response):
+        try:
+            for chunk in response:
+                text = chunk.choices[0].delta.content if chunk.choices else None
+                if text:
+                    yield text
+        finally:
+            response.response.close()
+
+    def close(self):
+        self._http_client.close()
+
+
+class FakeProvider(LLMProvider):
+    """Local stand-in for an LLM, for load testing without upstream calls.
+
+    Each attempt waits a time to first token drawn from
+    ``latency_distribution`` (median about ``latency_ms``), fails with
+    probability ``error_rate``, then produces its answer at
+    ``tokens_per_second``. The answer depends only on the messages: a
+    digest of them followed by the opening words of the question and
+    syllabus text, up to ``answer_tokens`` words (or ``max_tokens``).
+    """
+    name = 'fake'
+
+    def __init__(self, latency_ms: float = 300.0, latency_distribution: str = 'lognormal',
+                 latency_sigma: float = 0.5, tokens_per_second: float = 50.0, error_rate: float = 0.0,
+                 answer_tokens: int = 40, seed: Optional[int] = None):
+        if latency_distribution not in LATENCY_DISTRIBUTIONS:
+            raise ValueError(f"Unknown latency distribution {latency_distribution!r}; "
+                             f"choose from {list(LATENCY_DISTRIBUTIONS)}")
+        self.latency = latency_ms / 1000
+        self.latency_distribution = latency_distribution
+        self.latency_sigma = latency_sigma
+        self.tokens_per_second = tokens_per_second
+        self.error_rate = error_rate
+        self.answer_tokens = answer_tokens
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def sample_latency(self) -> float:
+        """Draw a time to first token in seconds."""
+        with self._lock:
+            if self.latency_distribution == 'uniform':
+                return self._random.uniform(0, 2 * self.latency)
+            if self.latency_distribution == 'exponential':
+                return self._random.expovariate(1 / self.latency) if self.latency else 0.0
+            if self.latency_distribution == 'lognormal':
+                return self.latency * self._random.lognormvariate(0, self.latency_sigma)
+            return self.latency
+
+    def answer(self, messages: List[Dict[str, str]], max_tokens: Optional[int] = None) -> List[str]:
+        """Return the deterministic answer to ``messages`` as its streamed pieces."""
+        digest = hashlib.sha1(json.dumps(messages, sort_keys=True).encode()).hexdigest()[:12]
+        limit = min(self.answer_tokens, max_tokens or self.answer_tokens)
+        words = [f"[fake {digest}]"] + (messages[-1]['content'].split() if messages else [])
+        return [word if index == 0 else f" {word}" for index, word in enumerate(words[:limit])]
+
+    def complete(self, messages, model, timeout, max_tokens=None, **params):
+        deadline = self._start(timeout)
+        pieces = self.answer(messages, max_tokens)
+        self._sleep(len(pieces) / self.tokens_per_second, deadline)
+        return "".join(pieces)
+
+    def stream(self, messages, model, timeout, max_tokens=None, **params):
+        deadline = self._start(timeout)
+        return self._pieces(self.answer(messages, max_tokens), deadline)
+
+    def _pieces(self, pieces, deadline):
+        for index, piece in enumerate(pieces):
+            if index:
+                self._sleep(1 / self.tokens_per_second, deadline)
+            yield piece
+
+    def _start(self, timeout: Optional[float]) -> Optional[float]:
+        """Wait out the time to first token and maybe fail; return the attempt's deadline."""
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        latency = self.sample_latency()
+        with self._lock:
+            failed = self._random.random() < self.error_rate
+        self._sleep(latency, deadline)
+        if failed:
+            raise ProviderError("Simulated upstream error")
+        return deadline
+
+    @staticmethod
+    def _sleep(seconds: float, deadline: Optional[float]):
+        if deadline is not None and time.monotonic() + seconds > deadline:
+            time.sleep(max(0.0, deadline - time.monotonic()))
+            raise ProviderTimeoutError("Simulated upstream timeout")
+        time.sleep(seconds)
+
+
+PROVIDERS = {provider.name: provider for provider in (OpenAIProvider, FakeProvider)}
+
+
+def create_provider(name: str, **options) -> LLMProvider:
+    """Instantiate the provider registered under ``name``."""
+    if name not in PROVIDERS:
+        raise ValueError(f"Unknown LLM provider {name!r}; choose from {sorted(PROVIDERS)}")
+    return PROVIDERS[name](**options)
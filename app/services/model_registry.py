@@ -0,0 +1,467 @@
+# app/services/model_registry.py
+import logging
+import os
+import tempfile
+import threading
+import time
+import traceback
+import chromadb
+import psutil
+from flask import has_app_context
+from app.services.answer_cache import AnswerCache
+from app.services.batch_encoder import BucketedEncoder
+from app.services.embedding_backends import create_backend
+from app.services.embedding_cache import EmbeddingCache
+from app.services.global_search_index import GlobalSearchIndex, version_directory
+from app.services.lexical_index import LexicalIndexStore, DEFAULT_INDEX_DIR
+from app.services.llm_client import LLMClient
+from app.services.llm_providers import create_provider
+from app.services.numpy_vector_store import NumpyVectorClient
+from app.services.query_batcher import QueryBatcher
+from app.services.query_embedding_cache import QueryEmbeddingCache
+from app.services.single_flight import SingleFlight
+from app.services.syllabus_cache import SyllabusContentCache
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_EMBEDDING_MODEL = 'paraphrase-MiniLM-L6-v2'
+DEFAULT_EMBEDDING_BACKEND = 'sentence-transformers'
+DEFAULT_PERSIST_DIR = os.path.join(tempfile.gettempdir(), "chroma_db")
+DEFAULT_NUMPY_VECTOR_STORE_DIR = os.path.join(tempfile.gettempdir(), "numpy_vectors")
+DEFAULT_GLOBAL_SEARCH_DIR = os.path.join(tempfile.gettempdir(), "global_search")
+DEFAULT_EMBEDDING_CACHE_PATH = os.path.join(tempfile.gettempdir(), "embedding_cache.sqlite3")
+
+
+class ModelRegistry:
+    """Process-wide, lazily loaded embedding backend, vector store client and embedding cache.
+
+    Loading the sentence transformer and opening the persistent Chroma client
+    each take seconds, so every service shares the single instance held here
+    instead of building its own per request. The embedding backend is chosen
+    by EMBEDDING_BACKEND; see app.services.embedding_backends. The vector
+    store is chosen by VECTOR_STORE_BACKEND: Chroma, or the Chroma-compatible
+    NumPy store in app.services.numpy_vector_store.
+    """
+
+    def __init__(self, app=None):
+        self.model_name = DEFAULT_EMBEDDING_MODEL
+        self.backend_name = DEFAULT_EMBEDDING_BACKEND
+        self.backend_options = {}
+        self.persist_dir = DEFAULT_PERSIST_DIR
+        self.vector_store_backend = 'chroma'
+        self.numpy_vector_store_dtype = 'float32'
+        self.embedding_cache_enabled = True
+        self.embedding_cache_path = DEFAULT_EMBEDDING_CACHE_PATH
+        self.embedding_cache_max_mb = 256
+        self.embedding_batch_size = 16
+        self.max_embedding_batch_size = 128
+        self._model = None
+        self._encoder = None
+        self._chroma_client = None
+        self._embedding_cache = None
+        self.lexical_index_dir = DEFAULT_INDEX_DIR
+        self.lexical_index_max_loaded = 64
+        self._lexical_store = None
+        self.syllabus_cache_max_entries = 256
+        self.syllabus_cache_max_mb = 64
+        self._syllabus_cache = None
+        self.query_cache_size = 1024
+        self.query_cache_ttl = None
+        self._query_cache = None
+        self.query_batch_enabled = True
+        self.query_batch_max_wait_ms = 5
+        self.query_batch_max_size = 16
+        self._query_batcher = None
+        self.answer_cache_enabled = True
+        self.answer_cache_size = 2048
+        self.answer_cache_ttl = None
+        self.answer_cache_threshold = 0.95
+        self._answer_cache = None
+        self.chat_coalescing_enabled = True
+        self._single_flight = None
+        self.llm_provider = 'openai'
+        self.llm_provider_options = {}
+        self.llm_options = {}
+        self._llm_client = None
+        self.global_search_dir = DEFAULT_GLOBAL_SEARCH_DIR
+        self.global_search_sections = 2
+        self._search_index = None
+        self._cache_lock = threading.Lock()
+        # Separate locks so a slow model load never blocks Chroma-only callers
+        self._model_lock = threading.Lock()
+        self._client_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            'model': {'loaded': False, 'load_time': None, 'memory_delta_mb': None, 'requests': 0},
+            'chroma_client': {'loaded': False, 'load_time': None, 'memory_delta_mb': None, 'requests': 0}
+        }
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        model_name = app.config.get('EMBEDDING_MODEL_NAME', DEFAULT_EMBEDDING_MODEL)
+        vector_store_backend = app.config.get('VECTOR_STORE_BACKEND', 'chroma')
+        if vector_store_backend == 'numpy':
+            persist_dir = app.config.get('NUMPY_VECTOR_STORE_DIR', DEFAULT_NUMPY_VECTOR_STORE_DIR)
+        else:
+            persist_dir = app.config.get('CHROMA_PERSIST_DIR', DEFAULT_PERSIST_DIR)
+
+        backend_name = app.config.get('EMBEDDING_BACKEND', DEFAULT_EMBEDDING_BACKEND)
+        backend_options = {
+            'precision': app.config.get('EMBEDDING_PRECISION'),
+            'dimension': app.config.get('EMBEDDING_DIMENSION')
+        }
+
+        if self._model is not None and (model_name, backend_name) != (self.model_name, self.backend_name):
+            logger.warning(f"Embedding backend already loaded as {self.backend_name}/{self.model_name}; "
+                           f"ignoring {backend_name}/{model_name}")
+        else:
+            self.model_name = model_name
+            self.backend_name = backend_name
+            self.backend_options = backend_options
+
+        if (self._chroma_client is not None
+                and (vector_store_backend, persist_dir) != (self.vector_store_backend, self.persist_dir)):
+            logger.warning(f"{self.vector_store_backend} vector store already open at {self.persist_dir}; "
+                           f"ignoring {vector_store_backend} at {persist_dir}")
+        else:
+            self.vector_store_backend = vector_store_backend
+            self.persist_dir = persist_dir
+        self.numpy_vector_store_dtype = app.config.get('NUMPY_VECTOR_STORE_DTYPE', 'float32')
+
+        self.embedding_cache_enabled = app.config.get('EMBEDDING_CACHE_ENABLED', True)
+        self.embedding_cache_path = app.config.get('EMBEDDING_CACHE_PATH', DEFAULT_EMBEDDING_CACHE_PATH)
+        self.embedding_cache_max_mb = app.config.get('EMBEDDING_CACHE_MAX_MB', 256)
+        self.lexical_index_dir = app.config.get('LEXICAL_INDEX_DIR', DEFAULT_INDEX_DIR)
+        self.lexical_index_max_loaded = app.config.get('LEXICAL_INDEX_MAX_LOADED', 64)
+        self._lexical_store = None
+        self.syllabus_cache_max_entries = app.config.get('SYLLABUS_CACHE_MAX_ENTRIES', 256)
+        self.syllabus_cache_max_mb = app.config.get('SYLLABUS_CACHE_MAX_MB', 64)
+        self._syllabus_cache = None
+        self.query_cache_size = app.config.get('QUERY_EMBEDDING_CACHE_SIZE', 1024)
+        self.query_cache_ttl = app.config.get('QUERY_EMBEDDING_CACHE_TTL')
+        self._query_cache = None
+        self.query_batch_enabled = app.config.get('QUERY_BATCH_ENABLED', True)
+        self.query_batch_max_wait_ms = app.config.get('QUERY_BATCH_MAX_WAIT_MS', 5)
+        self.query_batch_max_size = app.config.get('QUERY_BATCH_MAX_SIZE', 16)
+        with self._cache_lock:
+            self._stop_query_batcher()
+        self.answer_cache_enabled = app.config.get('ANSWER_CACHE_ENABLED', True)
+        self.answer_cache_size = app.config.get('ANSWER_CACHE_SIZE', 2048)
+        self.answer_cache_ttl = app.config.get('ANSWER_CACHE_TTL')
+        self.answer_cache_threshold = app.config.get('ANSWER_CACHE_THRESHOLD', 0.95)
+        self._answer_cache = None
+        self.llm_options = {
+            'model': app.config.get('LLM_MODEL', 'gpt-3.5-turbo'),
+            'max_concurrency': app.config.get('LLM_MAX_CONCURRENCY', 8),
+            'timeout': app.config.get('LLM_TIMEOUT', 30),
+            'queue_timeout': app.config.get('LLM_QUEUE_TIMEOUT', 10),
+            'max_retries': app.config.get('LLM_MAX_RETRIES', 2),
+            'backoff_base': app.config.get('LLM_BACKOFF_BASE', 0.5),
+            'backoff_max': app.config.get('LLM_BACKOFF_MAX', 4),
+            'hedge': app.config.get('LLM_HEDGE_ENABLED', False),
+            'hedge_min_delay': app.config.get('LLM_HEDGE_MIN_DELAY', 1)
+        }
+        self.chat_coalescing_enabled = app.config.get('CHAT_COALESCING_ENABLED', True)
+        self._single_flight = None
+        self.llm_provider = app.config.get('LLM_PROVIDER', 'openai')
+        if self.llm_provider == 'fake':
+            self.llm_provider_options = {
+                'latency_ms': app.config.get('LLM_FAKE_LATENCY_MS', 300),
+                'latency_distribution': app.config.get('LLM_FAKE_LATENCY_DISTRIBUTION', 'lognormal'),
+                'tokens_per_second': app.config.get('LLM_FAKE_TOKENS_PER_SECOND', 50),
+                'error_rate': app.config.get('LLM_FAKE_ERROR_RATE', 0)
+            }
+        else:
+            self.llm_provider_options = {
+                'base_url': app.config.get('LLM_BASE_URL'),
+                'max_connections': self.llm_options['max_concurrency']
+            }
+        with self._cache_lock:
+            self._close_llm_client()
+        self.global_search_dir = app.config.get('GLOBAL_SEARCH_DIR', DEFAULT_GLOBAL_SEARCH_DIR)
+        self.global_search_sections = app.config.get('GLOBAL_SEARCH_SECTIONS', 2)
+        self._search_index = None
+        self.embedding_batch_size = app.config.get('EMBEDDING_BATCH_SIZE', 16)
+        self.max_embedding_batch_size = app.config.get('MAX_BATCH_SIZE_EMBEDDINGS', 128)
+
+        app.extensions['model_registry'] = self
+        app.model_registry = self
+
+        if app.config.get('PRELOAD_EMBEDDING_MODEL'):
+            self.warm_up()
+
+    def get_model(self):
+        """Return the shared embedding backend, loading it on first use."""
+        with self._stats_lock:
+            self._stats['model']['requests'] += 1
+        if self._model is None:
+            with self._model_lock:
+                if self._model is None:
+                    self._model = self._timed_load('model', self._load_model)
+        return self._model
+
+    def get_backend_version(self) -> str:
+        """Return the version of the configured embedding backend without loading it."""
+        if self._model is not None:
+            return self._model.version
+        return create_backend(self.backend_name, self.model_name, **self.backend_options).version
+
+    def get_encoder(self) -> BucketedEncoder:
+        """Return the shared length-bucketed encoder around the model."""
+        model = self.get_model()
+        if self._encoder is None or self._encoder.model is not model:
+            with self._model_lock:
+                if self._encoder is None or self._encoder.model is not model:
+                    self._encoder = BucketedEncoder(
+                        model,
+                        batch_size=self.embedding_batch_size,
+                        max_batch_size=self.max_embedding_batch_size
+                    )
+        return self._encoder
+
+    def get_chroma_client(self):
+        """Return the shared vector store client, opening it on first use.
+
+        This is a ChromaDB client or, with VECTOR_STORE_BACKEND = 'numpy',
+        a NumpyVectorClient exposing the same collection API.
+        """
+        with self._stats_lock:
+            self._stats['chroma_client']['requests'] += 1
+        if self._chroma_client is None:
+            with self._client_lock:
+                if self._chroma_client is None:
+                    self._chroma_client = self._timed_load('chroma_client', self._open_chroma_client)
+        return self._chroma_client
+
+    def get_embedding_cache(self):
+        """Return the shared on-disk embedding cache, or None if disabled."""
+        if not self.embedding_cache_enabled:
+            return None
+        if self._embedding_cache is None:
+            with self._cache_lock:
+                if self._embedding_cache is None:
+                    self._embedding_cache = EmbeddingCache(
+                        self.embedding_cache_path,
+                        max_bytes=int(self.embedding_cache_max_mb * 1024 * 1024)
+                    )
+        return self._embedding_cache
+
+    def get_lexical_store(self) -> LexicalIndexStore:
+        """Return the shared store of per-syllabus BM25 indexes."""
+        if self._lexical_store is None:
+            with self._cache_lock:
+                if self._lexical_store is None:
+                    self._lexical_store = LexicalIndexStore(
+                        self.lexical_index_dir,
+                        max_loaded=self.lexical_index_max_loaded
+                    )
+        return self._lexical_store
+
+    def get_syllabus_cache(self) -> SyllabusContentCache:
+        """Return the shared in-process cache of syllabus content."""
+        if self._syllabus_cache is None:
+            with self._cache_lock:
+                if self._syllabus_cache is None:
+                    self._syllabus_cache = SyllabusContentCache(
+                        max_entries=self.syllabus_cache_max_entries,
+                        max_bytes=int(self.syllabus_cache_max_mb * 1024 * 1024)
+                    )
+        return self._syllabus_cache
+
+    def get_query_cache(self) -> QueryEmbeddingCache:
+        """Return the shared in-process cache of question embeddings."""
+        if self._query_cache is None:
+            with self._cache_lock:
+                if self._query_cache is None:
+                    self._query_cache = QueryEmbeddingCache(
+                        max_entries=self.query_cache_size,
+                        ttl=self.query_cache_ttl
+                    )
+        return self._query_cache
+
+    def get_query_batcher(self):
+        """Return the shared query embedding dispatcher, or None if batching is disabled."""
+        if not self.query_batch_enabled:
+            return None
+        if self._query_batcher is None:
+            with self._cache_lock:
+                if self._query_batcher is None:
+                    self._query_batcher = QueryBatcher(
+                        lambda texts: self.get_model().encode(texts, batch_size=len(texts)),
+                        max_wait=self.query_batch_max_wait_ms / 1000,
+                        max_batch_size=self.query_batch_max_size
+                    )
+        return self._query_batcher
+
+    def get_answer_cache(self):
+        """Return the shared in-process cache of chat answers, or None if disabled."""
+        if not self.answer_cache_enabled:
+            return None
+        if self._answer_cache is None:
+            with self._cache_lock:
+                if self._answer_cache is None:
+                    self._answer_cache = AnswerCache(
+                        max_entries=self.answer_cache_size,
+                        ttl=self.answer_cache_ttl,
+                        threshold=self.answer_cache_threshold
+                    )
+        return self._answer_cache
+
+    def get_single_flight(self):
+        """Return the shared coalescer of identical in-flight chat questions, or None if disabled."""
+        if not self.chat_coalescing_enabled:
+            return None
+        if self._single_flight is None:
+            with self._cache_lock:
+                if self._single_flight is None:
+                    self._single_flight = SingleFlight()
+        return self._single_flight
+
+    def get_llm_client(self) -> LLMClient:
+        """Return the shared pooled, concurrency-limited chat completion client."""
+        if self._llm_client is None:
+            with self._cache_lock:
+                if self._llm_client is None:
+                    provider = create_provider(self.llm_provider, **self.llm_provider_options)
+                    self._llm_client = LLMClient(provider, **self.llm_options)
+        return self._llm_client
+
+    def content_version(self, syllabus_id: int):
+        """Return the version of a syllabus's indexed content shared by every process.
+
+        This is the stamp of its last finished ingestion job. Outside an app
+        context, as in the benchmarks, there is no database and only
+        ``invalidate_syllabus`` retires cached content, so it is None.
+        """
+        if not has_app_context():
+            return None
+        from app.models.ingestion_job import IngestionJob
+        return IngestionJob.content_version(syllabus_id)
+
+    def invalidate_syllabus(self, syllabus_id: int):
+        """Drop this process's cached content and answers for a syllabus it re-indexed or deleted.
+
+        Other processes notice through ``content_version`` instead.
+        """
+        self.get_syllabus_cache().invalidate(syllabus_id)
+        answer_cache = self.get_answer_cache()
+        if answer_cache is not None:
+            answer_cache.invalidate(syllabus_id)
+
+    def get_search_index(self) -> GlobalSearchIndex:
+        """Return the cross-syllabus search index for the current embedding version."""
+        directory = version_directory(self.global_search_dir, self.get_backend_version())
+        if self._search_index is None or self._search_index.directory != directory:
+            with self._cache_lock:
+                if self._search_index is None or self._search_index.directory != directory:
+                    self._search_index = GlobalSearchIndex(directory, max_sections=self.global_search_sections)
+        return self._search_index
+
+    def warm_up(self):
+        """Load the model and client in a background thread."""
+        def load():
+            try:
+                self.get_chroma_client()
+                self.get_model()
+            except Exception as e:
+                logger.error(f"Error warming up model registry: {str(e)}")
+
+        thread = threading.Thread(target=load, daemon=True)
+        thread.start()
+        return thread
+
+    def get_stats(self):
+        """Get load times, memory use and request counts for shared resources."""
+        process = psutil.Process()
+        with self._stats_lock:
+            model_stats = dict(self._stats['model'])
+            client_stats = dict(self._stats['chroma_client'])
+        return {
+            'model_name': self.model_name,
+            'backend': self.backend_name,
+            'version': getattr(self._model, 'version', None),
+            'vector_store': self.vector_store_backend,
+            'persist_dir': self.persist_dir,
+            'process_rss_mb': process.memory_info().rss / (1024 * 1024),
+            'model': model_stats,
+            'chroma_client': client_stats,
+            'encoder': self._encoder.get_stats() if self._encoder else None,
+            'embedding_cache': self._embedding_cache.get_stats() if self._embedding_cache else None,
+            'lexical_index': self._lexical_store.get_stats() if self._lexical_store else None,
+            'syllabus_cache': self._syllabus_cache.get_stats() if self._syllabus_cache else None,
+            'query_cache': self._query_cache.get_stats() if self._query_cache else None,
+            'query_batcher': self._query_batcher.get_stats() if self._query_batcher else None,
+            'answer_cache': self._answer_cache.get_stats() if self._answer_cache else None,
+            'single_flight': self._single_flight.get_stats() if self._single_flight else None,
+            'llm_client': self._llm_client.get_stats() if self._llm_client else None,
+            'search_index': self._search_index.get_stats() if self._search_index else None
+        }
+
+    def reset(self):
+        """Drop the loaded resources so the next request reloads them."""
+        with self._model_lock, self._client_lock, self._cache_lock:
+            self._model = None
+            self._encoder = None
+            self._chroma_client = None
+            self._embedding_cache = None
+            self._lexical_store = None
+            self._syllabus_cache = None
+            self._query_cache = None
+            self._stop_query_batcher()
+            self._answer_cache = None
+            self._single_flight = None
+            self._close_llm_client()
+            self._search_index = None
+            with self._stats_lock:
+                for stats in self._stats.values():
+                    stats.update({'loaded': False, 'load_time': None, 'memory_delta_mb': None, 'requests': 0})
+
+    def _stop_query_batcher(self):
+        """Stop the query batcher's dispatcher thread and drop it; call with ``_cache_lock`` held."""
+        if self._query_batcher is not None:
+            self._query_batcher.stop()
+        self._query_batcher = None
+
+    def _close_llm_client(self):
+        """Close the LLM client's connection pool and drop it; call with ``_cache_lock`` held."""
+        if self._llm_client is not None:
+            self._llm_client.close()
+        self._llm_client = None
+
+    def _load_model(self):
+        logger.info(f"Loading {self.backend_name} embedding backend")
+        return create_backend(self.backend_name, self.model_name, **self.backend_options).load()
+
+    def _open_chroma_client(self):
+        if self.vector_store_backend == 'numpy':
+            logger.info(f"Initializing NumPy vector store at {self.persist_dir} ({self.numpy_vector_store_dtype})")
+            return NumpyVectorClient(self.persist_dir, dtype=self.numpy_vector_store_dtype)
+        if self.vector_store_backend != 'chroma':
+            raise ValueError(f"Unknown vector store backend {self.vector_store_backend!r}; "
+                             f"choose 'chroma' or 'numpy'")
+        os.makedirs(self.persist_dir, exist_ok=True)
+        logger.info(f"Initializing ChromaDB with persist_dir: {self.persist_dir}")
+        return chromadb.PersistentClient(path=self.persist_dir)
+
+    def _timed_load(self, name, loader):
+        process = psutil.Process()
+        rss_before = process.memory_info().rss
+        start_time = time.time()
+        try:
+            resource = loader()
+        except Exception as e:
+            logger.error(f"Error loading {name}: {str(e)}")
+            logger.error(f"Traceback: {traceback.format_exc()}")
+            raise
+
+        load_time = time.time() - start_time
+        memory_delta_mb = (process.memory_info().rss - rss_before) / (1024 * 1024)
+        with self._stats_lock:
+            self._stats[name].update({
+                'loaded': True,
+                'load_time': load_time,
+                'memory_delta_mb': memory_delta_mb
+            })
+        logger.info(f"Loaded {name} in {load_time:.2f}s (+{memory_delta_mb:.1f} MB RSS)")
+        return resource
@@ -0,0 +1,291 @@
+# app/services/numpy_vector_store.py
+import json
+import logging
+import os
+import shutil
+import threading
+import uuid
+from typing import List, Dict, Any, Optional
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+MANIFEST = "manifest.json"
+SUPPORTED_DTYPES = ('float32', 'float16')
+
+
+class NumpyCollection:
+    """One syllabus stored as a contiguous vector matrix searched by brute force.
+
+    Each generation of the collection is three files: ``vectors-<gen>.npy``
+    (unit-length rows, float32 or float16), ``texts-<gen>.bin`` (UTF-8
+    documents back to back) and ``offsets-<gen>.npy`` (byte offsets into the
+    texts). ``manifest.json`` names the current generation and holds ids and
+    chunk metadata. Vector and text files are memory-mapped, so opening a
+    collection reads only the manifest, and a query is one matrix-vector
+    product plus ``argpartition``.
+
+    Writes build a new generation and swap the manifest atomically, so
+    readers in other processes always see a complete collection. Mirrors the
+    subset of the Chroma collection API the services use; only cosine space
+    and equality ``where`` filters are supported.
+    """
+
+    def __init__(self, directory: str, name: str, dtype: str = 'float32'):
+        self.directory = directory
+        self.name = name
+        self.dtype = dtype
+        self.metadata = {}
+        self._lock = threading.Lock()
+        self._manifest_version = None
+        self._ids = []
+        self._metadatas = []
+        self._positions = {}
+        self._vectors = None
+        self._texts = None
+        self._offsets = None
+
+    @property
+    def manifest_path(self) -> str:
+        return os.path.join(self.directory, MANIFEST)
+
+    def _refresh(self):
+        """Reopen the current generation if another writer replaced it."""
+        stat = os.stat(self.manifest_path)
+        # The manifest is replaced, never rewritten, so a new inode means a new generation
+        modified = (stat.st_ino, stat.st_mtime_ns)
+        if modified == self._manifest_version:
+            return
+        with open(self.manifest_path) as file:
+            manifest = json.load(file)
+        self.metadata = manifest['metadata']
+        self._ids = manifest['ids']
+        self._metadatas = manifest['metadatas']
+        self._positions = {chunk_id: row for row, chunk_id in enumerate(self._ids)}
+        generation = manifest['generation']
+        if generation is None:
+            self._vectors = None
+            self._texts = np.zeros(0, dtype=np.uint8)
+            self._offsets = np.zeros(1, dtype=np.int64)
+        else:
+            self._vectors = np.load(self._file('vectors', generation, 'npy'), mmap_mode='r')
+            self._offsets = np.load(self._file('offsets', generation, 'npy'), mmap_mode='r')
+            texts_path = self._file('texts', generation, 'bin')
+            # np.memmap refuses empty files, which an all-empty-text collection produces
+            self._texts = (np.memmap(texts_path, dtype=np.uint8, mode='r')
+                           if os.path.getsize(texts_path) else np.zeros(0, dtype=np.uint8))
+        self._manifest_version = modified
+
+    def _file(self, kind: str, generation: str, extension: str) -> str:
+        return os.path.join(self.directory, f"{kind}-{generation}.{extension}")
+
+    def _text(self, row: int) -> str:
+        return self._texts[self._offsets[row]:self._offsets[row + 1]].tobytes().decode('utf-8')
+
+    def count(self) -> int:
+        with self._lock:
+            self._refresh()
+            return len(self._ids)
+
+    def get(self, ids: List[str] = None, include: List[str] = None) -> Dict[str, Any]:
+        include = include or ['documents', 'metadatas']
+        with self._lock:
+            self._refresh()
+            if ids is None:
+                rows = list(range(len(self._ids)))
+            else:
+                # Unknown ids are skipped, as in Chroma
+                rows = [self._positions[chunk_id] for chunk_id in ids if chunk_id in self._positions]
+            return self._rows_result(rows, include)
+
+    def _rows_result(self, rows: List[int], include: List[str]) -> Dict[str, Any]:
+        result = {'ids': [self._ids[row] for row in rows]}
+        if 'documents' in include:
+            result['documents'] = [self._text(row) for row in rows]
+        if 'metadatas' in include:
+            result['metadatas'] = [self._metadatas[row] for row in rows]
+        if 'embeddings' in include:
+            dimension = self._vectors.shape[1] if self._vectors is not None else 0
+            result['embeddings'] = (np.asarray(self._vectors[rows], dtype=np.float32) if rows
+                                    else np.zeros((0, dimension), dtype=np.float32))
+        return result
+
+    def query(self, query_embeddings, n_results: int = 10, include: List[str] = None,
+              where: Dict[str, Any] = None) -> Dict[str, Any]:
+        include = include or ['documents', 'metadatas', 'distances']
+        results = {'ids': [], 'documents': [], 'metadatas': [], 'distances': [], 'embeddings': []}
+        with self._lock:
+            self._refresh()
+            candidates = self._matching_rows(where) if where else None
+            for query_embedding in query_embeddings:
+                rows, similarities = self._search(np.asarray(query_embedding, dtype=np.float32), n_results,
+                                                  candidates)
+                matched = self._rows_result(rows, include)
+                for key, value in matched.items():
+                    results[key].append(value)
+                # Cosine distance, as reported by Chroma collections in cosine space
+                results['distances'].append((1.0 - similarities).tolist())
+        return {key: value for key, value in results.items() if key == 'ids' or key in include}
+
+    def _matching_rows(self, where: Dict[str, Any]) -> np.ndarray:
+        """Rows whose metadata equals every ``{field: value}`` or ``{field: {'$eq': value}}`` condition."""
+        conditions = {}
+        for field, condition in where.items():
+            if isinstance(condition, dict):
+                if set(condition) != {'$eq'}:
+                    raise ValueError(f"Unsupported where condition on {field!r}: {condition}")
+                condition = condition['$eq']
+            conditions[field] = condition
+        return np.asarray([row for row, metadata in enumerate(self._metadatas)
+                           if all(metadata.get(field) == value for field, value in conditions.items())],
+                          dtype=np.int64)
+
+    def _search(self, query: np.ndarray, k: int, candidates: Optional[np.ndarray] = None):
+        if self._vectors is None or not len(self._ids) or (candidates is not None and not len(candidates)):
+            return [], np.zeros(0, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        vectors = self._vectors if candidates is None else self._vectors[candidates]
+        # float16 rows are widened for BLAS; float32 rows are used in place
+        similarities = vectors.astype(np.float32, copy=False) @ (query / norm if norm else query)
+        k = min(k, len(similarities))
+        top = np.argpartition(-similarities, k - 1)[:k] if k < len(similarities) else np.arange(k)
+        top = top[np.argsort(-similarities[top], kind='stable')]
+        rows = top if candidates is None else candidates[top]
+        return rows.tolist(), similarities[top]
+
+    def upsert(self, ids: List[str], embeddings, documents: List[str], metadatas: List[Dict[str, Any]] = None):
+        metadatas = metadatas or [{}] * len(ids)
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        with self._lock:
+            self._refresh()
+            rows = {chunk_id: self._row(row) for row, chunk_id in enumerate(self._ids)}
+            for chunk_id, vector, document, metadata in zip(ids, embeddings, documents, metadatas):
+                rows[chunk_id] = (vector, document, metadata or {})
+            self._write(rows)
+
+    def update(self, ids: List[str], metadatas: List[Dict[str, Any]]):
+        with self._lock:
+            self._refresh()
+            updates = dict(zip(ids, metadatas))
+            rows = {}
+            for row, chunk_id in enumerate(self._ids):
+                vector, document, metadata = self._row(row)
+                rows[chunk_id] = (vector, document, updates.get(chunk_id, metadata))
+            self._write(rows)
+
+    def delete(self, ids: List[str]):
+        removed = set(ids)
+        with self._lock:
+            self._refresh()
+            self._write({chunk_id: self._row(row) for row, chunk_id in enumerate(self._ids)
+                         if chunk_id not in removed})
+
+    def _row(self, row: int):
+        return np.asarray(self._vectors[row], dtype=np.float32), self._text(row), self._metadatas[row]
+
+    def _write(self, rows: Dict[str, tuple]):
+        """Write ``rows`` as a new generation and make it current."""
+        previous = self._generation()
+        generation = uuid.uuid4().hex if rows else None
+        if generation is not None:
+            vectors = np.vstack([vector for vector, _, _ in rows.values()]).astype(np.float32)
+            norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+            vectors = (vectors / np.where(norms == 0, 1, norms)).astype(self.dtype)
+            encoded = [document.encode('utf-8') for _, document, _ in rows.values()]
+            offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+            np.cumsum([len(text) for text in encoded], out=offsets[1:])
+            np.save(self._file('vectors', generation, 'npy'), vectors)
+            np.save(self._file('offsets', generation, 'npy'), offsets)
+            with open(self._file('texts', generation, 'bin'), 'wb') as file:
+                file.write(b''.join(encoded))
+
+        write_manifest(self.directory, {
+            'generation': generation,
+            'dtype': self.dtype,
+            'metadata': self.metadata,
+            'ids': list(rows),
+            'metadatas': [row_metadata for _, _, row_metadata in rows.values()]
+        })
+        self._manifest_version = None
+        self._refresh()
+        if previous is not None:
+            # Readers holding the old maps keep them valid on POSIX after unlink
+            for kind, extension in (('vectors', 'npy'), ('offsets', 'npy'), ('texts', 'bin')):
+                try:
+                    os.remove(self._file(kind, previous, extension))
+                except OSError:
+                    pass
+
+    def _generation(self) -> Optional[str]:
+        with open(self.manifest_path) as file:
+            return json.load(file)['generation']
+
+
+def write_manifest(directory: str, manifest: Dict[str, Any]):
+    temporary_path = os.path.join(directory, f"{MANIFEST}.{os.getpid()}.{threading.get_ident()}.tmp")
+    with open(temporary_path, 'w') as file:
+        json.dump(manifest, file)
+    os.replace(temporary_path, os.path.join(directory, MANIFEST))
+
+
+class NumpyVectorClient:
+    """Chroma-compatible client over a directory of memory-mapped collections.
+
+    Selected with VECTOR_STORE_BACKEND = 'numpy'. Collection objects are
+    cached per client and reopen themselves when another process rewrites
+    them.
+    """
+
+    def __init__(self, path: str, dtype: str = 'float32'):
+        if dtype not in SUPPORTED_DTYPES:
+            raise ValueError(f"Unsupported vector dtype {dtype!r}; choose from {SUPPORTED_DTYPES}")
+        self.path = path
+        self.dtype = dtype
+        self._collections = {}
+        self._lock = threading.Lock()
+        os.makedirs(path, exist_ok=True)
+
+    def _directory(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    def get_collection(self, name: str) -> NumpyCollection:
+        with self._lock:
+            collection = self._collections.get(name)
+            if collection is not None and os.path.exists(collection.manifest_path):
+                return collection
+            directory = self._directory(name)
+            if not os.path.exists(os.path.join(directory, MANIFEST)):
+                self._collections.pop(name, None)
+                raise ValueError(f"Collection {name} does not exist.")
+            collection = NumpyCollection(directory, name, self.dtype)
+            collection.count()
+            self._collections[name] = collection
+            return collection
+
+    def create_collection(self, name: str, metadata: Dict[str, Any] = None) -> NumpyCollection:
+        directory = self._directory(name)
+        with self._lock:
+            if os.path.exists(os.path.join(directory, MANIFEST)):
+                raise ValueError(f"Collection {name} already exists.")
+            os.makedirs(directory, exist_ok=True)
+            write_manifest(directory, {'generation': None, 'dtype': self.dtype, 'metadata': metadata or {},
+                                       'ids': [], 'metadatas': []})
+        return self.get_collection(name)
+
+    def get_or_create_collection(self, name: str, metadata: Dict[str, Any] = None) -> NumpyCollection:
+        try:
+            return self.get_collection(name)
+        except ValueError:
+            return self.create_collection(name, metadata)
+
+    def delete_collection(self, name: str):
+        with self._lock:
+            self._collections.pop(name, None)
+            directory = self._directory(name)
+            if not os.path.exists(directory):
+                raise ValueError(f"Collection {name} does not exist.")
+            shutil.rmtree(directory)
+
+    def list_collections(self) -> List[str]:
+        return sorted(name for name in os.listdir(self.path)
+                      if os.path.exists(os.path.join(self._directory(name), MANIFEST)))
@@ -0,0 +1,126 @@
+# app/services/pdf_extraction.py
+import logging
+import multiprocessing
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import List, Tuple, Optional, Generator
+import PyPDF2
+
+logger = logging.getLogger(__name__)
+
+# (page number, normalized text or None, error message or None)
+PageResult = Tuple[int, Optional[str], Optional[str]]
+
+_pool = None
+_pool_workers = 0
+_pool_lock = threading.Lock()
+
+
+def normalize_page_text(text: str) -> str:
+    """Remove null bytes and collapse whitespace."""
+    return " ".join(text.replace('\x00', '').split())
+
+
+def extract_page(pdf_reader, page_index: int) -> PageResult:
+    """Extract one page, capturing any error instead of raising it."""
+    try:
+        text = pdf_reader.pages[page_index].extract_text() or ''
+        return page_index + 1, normalize_page_text(text), None
+    except Exception as e:
+        return page_index + 1, None, str(e)
+
+
+def extract_page_range(file_path: str, first_page: int, last_page: int) -> List[PageResult]:
+    """Extract pages [first_page, last_page) in a worker process."""
+    with open(file_path, 'rb') as file:
+        pdf_reader = PyPDF2.PdfReader(file)
+        return [extract_page(pdf_reader, index) for index in range(first_page, last_page)]
+
+
+def extract_range_serially(file_path: str, first_page: int, last_page: int) -> List[PageResult]:
+    """Extract pages [first_page, last_page) in this process, reporting a failure on every page."""
+    try:
+        return extract_page_range(file_path, first_page, last_page)
+    except Exception as e:
+        return [(index + 1, None, str(e)) for index in range(first_page, last_page)]
+
+
+def get_pool(workers: int) -> ProcessPoolExecutor:
+    """Return the shared extraction pool, creating it on first use.
+
+    Workers are spawned rather than forked because the app runs background
+    threads, and the pool is kept for the life of the process so the spawn
+    and import cost is only paid once.
+    """
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is None or _pool_workers != workers:
+            if _pool is not None:
+                _pool.shutdown(wait=False)
+            _pool = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context('spawn')
+            )
+            _pool_workers = workers
+            logger.info(f"Started PDF extraction pool with {workers} workers")
+        return _pool
+
+
+def discard_pool(pool: ProcessPoolExecutor):
+    """Drop a broken pool so the next ``get_pool`` starts a fresh one."""
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+            _pool_workers = 0
+    pool.shutdown(wait=False)
+
+
+def iter_parallel_pages(file_path: str, total_pages: int, workers: int,
+                        pages_per_task: int) -> Generator[PageResult, None, None]:
+    """Extract page ranges across the process pool, yielding in page order.
+
+    At most two tasks per worker are in flight, so results that arrive
+    early never pile up beyond that window. A range whose task fails is
+    extracted again in this process; if a worker died and broke the pool,
+    the pool is replaced for the remaining ranges.
+    """
+    pool = get_pool(workers)
+    ranges = deque(
+        (first, min(first + pages_per_task, total_pages))
+        for first in range(0, total_pages, pages_per_task)
+    )
+    in_flight = deque()
+
+    try:
+        while ranges or in_flight:
+            while ranges and len(in_flight) < workers * 2:
+                first, last = ranges.popleft()
+                try:
+                    future = pool.submit(extract_page_range, file_path, first, last)
+                except BrokenProcessPool:
+                    # A worker died while the pool sat idle
+                    logger.error("PDF extraction pool is broken; restarting it")
+                    discard_pool(pool)
+                    pool = get_pool(workers)
+                    future = pool.submit(extract_page_range, file_path, first, last)
+                in_flight.append((first, last, pool, future))
+            first, last, task_pool, future = in_flight.popleft()
+            try:
+                results = future.result()
+            except BrokenProcessPool as e:
+                logger.error(f"PDF extraction pool broke on pages {first + 1}-{last}: {str(e)}; extracting them here")
+                discard_pool(task_pool)
+                # Ranges already queued on the broken pool fail the same way
+                if pool is task_pool:
+                    pool = get_pool(workers)
+                results = extract_range_serially(file_path, first, last)
+            except Exception as e:
+                logger.error(f"Error extracting pages {first + 1}-{last} in worker: {str(e)}; retrying serially")
+                results = extract_range_serially(file_path, first, last)
+            yield from results
+    finally:
+        for _, _, _, future in in_flight:
+            future.cancel()
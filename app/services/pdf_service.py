@@ -1,85 +1,102 @@
 # app/services/pdf_service.py
 import PyPDF2
+import hashlib
 import os
 import logging
 from werkzeug.utils import secure_filename
 from flask import current_app
-from typing import List, Generator
-import chromadb
-import tempfile
-from sentence_transformers import SentenceTransformer
+from typing import List, Generator, Iterable, Tuple, Dict, Any
 import numpy as np
 import traceback
 from chromadb.errors import InvalidCollectionException
-import gc
+from app.extensions import model_registry
+from app.services.pipeline_metrics import PipelineMetrics
+from app.services.text_chunker import TextChunker
+from app.services.embedding_backends import collection_embedding_version
+from app.services.lexical_index import LexicalIndex
+from app.services.global_search_index import section_vectors
+from app.services.syllabus_cache import SyllabusContent
+from app.services.syllabus_sections import SectionTracker
+from app.services.pdf_extraction import extract_page, iter_parallel_pages
+from app.config import Config
 
 logger = logging.getLogger(__name__)
 
 class PDFProcessor:
     def __init__(self):
-        try:
-            self.persist_dir = os.path.join(tempfile.gettempdir(), "chroma_db")
-            os.makedirs(self.persist_dir, exist_ok=True)
-            
-            logger.info(f"Initializing ChromaDB with persist_dir: {self.persist_dir}")
-            
-            self.chroma_client = chromadb.PersistentClient(
-                path=self.persist_dir
-            )
-            
-            logger.info("ChromaDB client initialized successfully")
+        # The model and ChromaDB client are shared process-wide and only
+        # loaded the first time a stage actually needs them
+        self.persist_dir = model_registry.persist_dir
+
+    @property
+    def chroma_client(self):
+        return model_registry.get_chroma_client()
+
+    @property
+    def model(self):
+        return model_registry.get_model()
+
+    def count_pages(self, file_path: str) -> int:
+        """Return the number of pages in a PDF without extracting any text."""
+        with open(file_path, 'rb') as file:
+            return len(PyPDF2.PdfReader(file).pages)
+
+    def iter_pages(self, file_path: str, progress_callback=None, workers: int = None,
+                   parallel_threshold: int = None, pages_per_task: int = None
+                   ) -> Generator[Tuple[int, str], None, None]:
+        """Yield (page_number, text) one page at a time with whitespace normalized.
+
+        Documents with at least ``parallel_threshold`` pages are split into
+        page ranges and extracted across a process pool, still yielding pages
+        in order. Pages that fail to extract are logged and skipped, as are
+        empty pages.
+        """
+        workers = workers or Config.PDF_EXTRACTION_WORKERS
+        parallel_threshold = parallel_threshold or Config.PDF_PARALLEL_PAGE_THRESHOLD
+        pages_per_task = pages_per_task or Config.PDF_PAGES_PER_TASK
+        logger.info(f"Attempting to extract text from PDF: {file_path}")
+        
+        if not os.path.exists(file_path):
+            raise FileNotFoundError(f"PDF file not found at path: {file_path}")
+        
+        with open(file_path, 'rb') as file:
+            pdf_reader = PyPDF2.PdfReader(file)
+            total_pages = len(pdf_reader.pages)
             
-            # Initialize the sentence transformer model
-            logger.info("Loading sentence transformer model")
-            self.model = SentenceTransformer('paraphrase-MiniLM-L6-v2')
-            logger.info("Sentence transformer model loaded successfully")
+            if workers > 1 and total_pages >= parallel_threshold:
+                logger.info(f"Extracting {total_pages} pages with {workers} worker processes")
+                results = iter_parallel_pages(file_path, total_pages, workers, pages_per_task)
+            else:
+                results = (extract_page(pdf_reader, index) for index in range(total_pages))
             
-        except Exception as e:
-            logger.error(f"Error initializing PDFProcessor: {str(e)}")
-            logger.error(f"Traceback: {traceback.format_exc()}")
-            raise
+            for page_number, page_text, error in results:
+                if progress_callback:
+                    progress_callback('extracting', page_number / total_pages)
+                
+                if error is not None:
+                    logger.error(f"Error on page {page_number}: {error}")
+                    continue
+                
+                logger.debug(f"Successfully extracted text from page {page_number}")
+                if page_text:
+                    yield page_number, page_text
 
     def extract_text_from_pdf(self, file_path: str) -> str:
         """Extract text content from a PDF file."""
         try:
-            logger.info(f"Attempting to extract text from PDF: {file_path}")
+            full_text = " ".join(page_text for _, page_text in self.iter_pages(file_path))
             
-            if not os.path.exists(file_path):
-                raise FileNotFoundError(f"PDF file not found at path: {file_path}")
+            if not full_text:
+                raise ValueError("No text content extracted from PDF")
             
-            with open(file_path, 'rb') as file:
-                # Create PDF reader object
-                pdf_reader = PyPDF2.PdfReader(file)
-                text = []
-                
-                # Extract text from each page
-                for page_num in range(len(pdf_reader.pages)):
-                    try:
-                        page = pdf_reader.pages[page_num]
-                        text.append(page.extract_text())
-                        logger.debug(f"Successfully extracted text from page {page_num + 1}")
-                    except Exception as e:
-                        logger.error(f"Error on page {page_num + 1}: {str(e)}")
-                
-                # Combine all text with proper spacing
-                full_text = " ".join(text)
-                
-                # Basic text cleaning
-                full_text = " ".join(full_text.split())  # Remove extra whitespace
-                full_text = full_text.replace('\x00', '')  # Remove null bytes
-                
-                if not full_text.strip():
-                    raise ValueError("No text content extracted from PDF")
-                
-                # Log a preview of the extracted text
-                logger.info(f"Text preview (first 200 chars): {full_text[:200]}")
-                return full_text
+            # Log a preview of the extracted text
+            logger.info(f"Text preview (first 200 chars): {full_text[:200]}")
+            return full_text
                 
         except Exception as e:
             logger.error(f"Error extracting text from PDF: {str(e)}")
             raise
 
-
     def verify_collection(self, collection_name: str) -> bool:
         """Verify that a collection exists and contains data."""
         try:
@@ -91,80 +108,99 @@ class PDFProcessor:
             logger.error(f"Error verifying collection {collection_name}: {str(e)}")
             return False
         
-    def create_text_chunks(self, text: str, chunk_size: int = 1000, overlap: int = 100) -> List[str]:
-            """Split text into overlapping chunks."""
-            try:
-                logger.info(f"Chunking text of length {len(text)} with chunk_size={chunk_size}, overlap={overlap}")
+    def create_text_chunks(self, text: str, chunk_size: int = None, overlap: int = None) -> List[str]:
+        """Split text into overlapping chunks of at most ``chunk_size`` tokens."""
+        try:
+            chunker = TextChunker(chunk_size, overlap)
+            logger.info(f"Chunking text of length {len(text)} with chunk_size={chunker.chunk_size}, "
+                        f"overlap={chunker.overlap} tokens")
+            
+            if not text:
+                raise ValueError("Input text is empty")
+            
+            chunks = [text[start:end] for start, end in chunker.chunk_offsets(text)]
+            logger.info(f"Created {len(chunks)} chunks")
+            return chunks
+
+        except Exception as e:
+            logger.error(f"Error chunking text: {str(e)}")
+            logger.error(f"Traceback: {traceback.format_exc()}")
+            raise
+
+    def iter_chunks(self, pages: Iterable[Tuple[int, str]], chunk_size: int = None,
+                    overlap: int = None) -> Generator[Dict[str, Any], None, None]:
+        """Chunk a stream of pages without materializing the full document.
+
+        Only the text that can still contribute to an unfinished chunk is
+        buffered, so memory stays bounded by the page and chunk size. Each
+        chunk carries its character offsets in the document, the page it
+        starts on and, once a heading has been seen, the section it falls in.
+        """
+        chunker = TextChunker(chunk_size, overlap)
+        sections = SectionTracker()
+        buffer = ''
+        buffer_offset = 0  # Document offset of buffer[0]
+        page_starts = []  # (document offset, page number), oldest first
+        document_length = 0
+        position = 0
+
+        def drain(final):
+            nonlocal buffer, buffer_offset, position
+            offsets, resume_offset = chunker.pack(buffer, final=final)
+            for start, end in offsets:
+                chunk_start = buffer_offset + start
+                while len(page_starts) > 1 and page_starts[1][0] <= chunk_start:
+                    page_starts.pop(0)
                 
-                if not text:
-                    raise ValueError("Input text is empty")
+                chunk_text = buffer[start:end]
+                if chunk_text.endswith('.pdf'):  # Verify it's not just a file path
+                    logger.warning(f"Skipping invalid chunk: {chunk_text}")
+                    continue
                 
-                chunks = []
-                start = 0
-                text_length = len(text)
-
-                while start < text_length:
-                    end = min(start + chunk_size, text_length)
-                    
-                    # Find the last period or newline in the chunk
-                    chunk = text[start:end]
-                    last_period_pos = max(
-                        chunk.rfind('. '),
-                        chunk.rfind('\n')
-                    )
-                    
-                    if last_period_pos != -1:
-                        # Adjust end position to include the period
-                        end = start + last_period_pos + 2
-                    
-                    # Get the chunk and clean it
-                    current_chunk = text[start:end].strip()
-                    
-                    if current_chunk:  # Only add non-empty chunks
-                        chunks.append(current_chunk)
-                    
-                    # Move the start position, considering overlap
-                    start = max(end - overlap, start + 1)  # Ensure we make progress
-                    
-                    # Free up memory
-                    del chunk
-                    gc.collect()
-                    
-                logger.info(f"Created {len(chunks)} chunks")
-                return chunks
-
-            except Exception as e:
-                logger.error(f"Error chunking text: {str(e)}")
-                logger.error(f"Traceback: {traceback.format_exc()}")
-                raise
-
-    def generate_embeddings(self, chunks: List[str]) -> List[List[float]]:
-        """Generate embeddings using sentence-transformers with memory optimization."""
+                yield {
+                    'text': chunk_text,
+                    'start': chunk_start,
+                    'end': buffer_offset + end,
+                    'page': page_starts[0][1],
+                    'position': position,
+                    **sections.locate(chunk_start, buffer_offset + end)
+                }
+                position += 1
+            buffer = buffer[resume_offset:]
+            buffer_offset += resume_offset
+
+        for page_number, page_text in pages:
+            if document_length:
+                buffer += ' '
+                document_length += 1
+            page_starts.append((document_length, page_number))
+            sections.add_page(document_length, page_text)
+            buffer += page_text
+            document_length += len(page_text)
+            yield from drain(final=False)
+
+        yield from drain(final=True)
+        logger.info(f"Created {position} chunks from {document_length} characters")
+
+    def generate_embeddings(self, chunks: List[str], progress_callback=None) -> np.ndarray:
+        """Generate embeddings using length-bucketed, memory-budgeted batches."""
         try:
             if not chunks:
                 raise ValueError("No chunks provided for embedding generation")
             
-            logger.info(f"Generating embeddings for chunks")
+            logger.info(f"Generating embeddings for {len(chunks)} chunks")
             
-            # Use smaller batch size to manage memory
-            batch_size = 4  # Reduced from 8 to 4
+            # Windows only bound how often progress is reported; batching
+            # within each window is decided by the encoder
+            window = Config.EMBEDDING_SORT_WINDOW
             embeddings = []
+            for i in range(0, len(chunks), window):
+                embeddings.append(self.embed_texts(chunks[i:i + window]))
+
+                if progress_callback:
+                    progress_callback('embedding', min(i + window, len(chunks)) / len(chunks))
             
-            # Process in smaller batches with garbage collection
-            import gc
-            for i in range(0, len(chunks), batch_size):
-                batch = chunks[i:i + batch_size]
-                logger.debug(f"Processing batch {i//batch_size + 1}/{(len(chunks)-1)//batch_size + 1}")
-                
-                # Generate embeddings for batch
-                batch_embeddings = self.model.encode(batch, convert_to_numpy=True)
-                embeddings.extend(batch_embeddings.tolist())
-                
-                # Clean up memory
-                del batch_embeddings
-                del batch
-                gc.collect()
-            
+            embeddings = np.vstack(embeddings)
             logger.info(f"Successfully generated {len(embeddings)} embeddings")
             return embeddings
             
@@ -173,102 +209,410 @@ class PDFProcessor:
             logger.error(f"Traceback: {traceback.format_exc()}")
             raise
 
-    def store_vectors(self, syllabus_id: int, chunks: List[str], embeddings: List[List[float]]) -> str:
-        """Store text chunks and their embeddings in ChromaDB."""
+    def store_vectors(self, syllabus_id: int, chunks: List[str], embeddings: np.ndarray,
+                      progress_callback=None, incremental: bool = True) -> str:
+        """Store text chunks and their embeddings in ChromaDB, tagged with their syllabus section."""
         try:
-            if not chunks or not embeddings:
+            if not chunks or len(embeddings) == 0:
                 raise ValueError("Empty chunks or embeddings provided")
                 
             collection_name = f"syllabus_{syllabus_id}"
             logger.info(f"Storing vectors for collection: {collection_name}")
             
-            # Clean and verify chunks
+            # Clean and verify chunks, keeping each embedding with its chunk
             cleaned_chunks = []
-            for chunk in chunks:
+            kept_indices = []
+            for index, chunk in enumerate(chunks):
                 # Basic cleaning
                 cleaned_chunk = chunk.strip()
                 cleaned_chunk = " ".join(cleaned_chunk.split())  # Normalize whitespace
                 
                 if cleaned_chunk and not cleaned_chunk.endswith('.pdf'):  # Verify it's not just a file path
                     cleaned_chunks.append(cleaned_chunk)
+                    kept_indices.append(index)
                 else:
                     logger.warning(f"Skipping invalid chunk: {chunk}")
             
             if not cleaned_chunks:
                 raise ValueError("No valid chunks after cleaning")
             
-            # Get or create collection
-            try:
-                # Delete existing collection if it exists
-                try:
-                    self.chroma_client.delete_collection(name=collection_name)
-                    logger.info(f"Deleted existing collection: {collection_name}")
-                except ValueError:
-                    pass
-                
-                # Create new collection
-                collection = self.chroma_client.create_collection(
-                    name=collection_name,
-                    metadata={"hnsw:space": "cosine"}
-                )
-                logger.info(f"Created new collection: {collection_name}")
-            except Exception as e:
-                logger.error(f"Error creating collection: {str(e)}")
-                raise
+            embeddings = np.asarray(embeddings, dtype=np.float32)[kept_indices]
+            # Sections are tracked over the chunks laid end to end
+            sections = SectionTracker()
+            records = []
+            offset = 0
+            for position, text in enumerate(cleaned_chunks):
+                sections.add_page(offset, text)
+                records.append({'text': text, 'position': position, **sections.locate(offset, offset + len(text))})
+                offset += len(text) + 1
+            chunk_records = list(self.assign_chunk_ids(records))
+            
+            collection, existing = self.open_collection(syllabus_id, incremental)
+            diff = ChunkDiff(existing)
+            new_indices = [chunk['position'] for chunk in diff.new_chunks(chunk_records)]
             
             # Store in batches
             batch_size = 50
-            for i in range(0, len(cleaned_chunks), batch_size):
-                end_idx = min(i + batch_size, len(cleaned_chunks))
-                batch_chunks = cleaned_chunks[i:end_idx]
-                batch_embeddings = embeddings[i:end_idx]
-                batch_ids = [f"chunk_{j}" for j in range(i, end_idx)]
-                
-                # Log the first chunk of each batch
-                logger.info(f"Sample chunk from batch {i//batch_size}: {batch_chunks[0][:100]}...")
-                
-                collection.add(
-                    embeddings=batch_embeddings,
-                    documents=batch_chunks,
-                    ids=batch_ids
-                )
+            batches = (
+                ([chunk_records[j] for j in new_indices[i:i + batch_size]],
+                 embeddings[new_indices[i:i + batch_size]])
+                for i in range(0, len(new_indices), batch_size)
+            )
+            stored = 0
+            for batch_chunks in self.store_vector_batches(collection, batches):
+                stored += len(batch_chunks)
+                if progress_callback:
+                    progress_callback('storing', stored / len(new_indices))
             
-            # Verify storage
-            sample_result = collection.peek()
-            logger.info(f"Storage verification - sample documents: {sample_result}")
+            self.apply_chunk_diff(collection, diff)
+            self.update_lexical_index(syllabus_id, collection, diff)
+            logger.info(f"Updated {collection_name}: {diff.report()}")
             
             return collection_name
             
         except Exception as e:
             logger.error(f"Error storing vectors: {str(e)}")
             raise
+        finally:
+            # The collection may have changed even if storing failed part way
+            model_registry.invalidate_syllabus(syllabus_id)
+
+    def iter_embedding_batches(self, chunks: Iterable[Dict[str, Any]], batch_size: int = None
+                               ) -> Generator[Tuple[List[Dict[str, Any]], np.ndarray], None, None]:
+        """Embed a stream of chunks, yielding (chunks, float32 matrix) per window.
 
-def process_pdf(syllabus) -> None:
-    """Main function to process PDF and generate embeddings."""
+        ``batch_size`` chunks are gathered at a time so the encoder has a
+        window to sort by length; they come back in document order.
+        """
+        batch_size = batch_size or Config.EMBEDDING_SORT_WINDOW
+        batch = []
+        for chunk in chunks:
+            batch.append(chunk)
+            if len(batch) == batch_size:
+                yield batch, self._encode_batch(batch)
+                batch = []
+        if batch:
+            yield batch, self._encode_batch(batch)
+
+    def _encode_batch(self, batch: List[Dict[str, Any]]) -> np.ndarray:
+        return self.embed_texts([chunk['text'] for chunk in batch])
+
+    def embed_texts(self, texts: List[str]) -> np.ndarray:
+        """Embed texts as a float32 matrix, only running the model on cache misses."""
+        if not texts:
+            raise ValueError("No texts provided for embedding")
+        
+        encoder = model_registry.get_encoder()
+        cache = model_registry.get_embedding_cache()
+        if cache is None:
+            return encoder.encode(texts)
+        
+        # Keyed by backend version so different vector spaces never mix
+        model_name = encoder.model.version
+        cached = cache.get_many(model_name, texts)
+        missing = [index for index in range(len(texts)) if index not in cached]
+        
+        computed = None
+        if missing:
+            missing_texts = [texts[index] for index in missing]
+            computed = encoder.encode(missing_texts)
+            cache.put_many(model_name, missing_texts, computed)
+        
+        dimension = computed.shape[1] if computed is not None else len(next(iter(cached.values())))
+        embeddings = np.empty((len(texts), dimension), dtype=np.float32)
+        for index, vector in cached.items():
+            embeddings[index] = vector
+        if missing:
+            embeddings[missing] = computed
+        return embeddings
+
+    @staticmethod
+    def make_chunk_id(text: str, occurrence: int = 0) -> str:
+        """Derive a stable id from a chunk's whitespace-normalized text.
+
+        Repeated identical chunks are told apart by their occurrence number.
+        """
+        normalized = " ".join(text.split())
+        digest = hashlib.sha256(normalized.encode('utf-8')).hexdigest()[:32]
+        return f"chunk_{digest}" if occurrence == 0 else f"chunk_{digest}_{occurrence}"
+
+    def assign_chunk_ids(self, chunks: Iterable[Dict[str, Any]]) -> Generator[Dict[str, Any], None, None]:
+        """Add a content-derived ``id`` to each chunk in a stream."""
+        occurrences = {}
+        for chunk in chunks:
+            base_id = self.make_chunk_id(chunk['text'])
+            occurrence = occurrences.get(base_id, 0)
+            occurrences[base_id] = occurrence + 1
+            chunk['id'] = base_id if occurrence == 0 else self.make_chunk_id(chunk['text'], occurrence)
+            yield chunk
+
+    def open_collection(self, syllabus_id: int, incremental: bool = True):
+        """Return (collection, existing chunk metadata by id) for a syllabus.
+
+        In incremental mode an existing collection is kept and its current
+        chunks are returned for diffing; otherwise, or if the collection was
+        built by a different embedding backend, it is rebuilt from empty.
+        """
+        collection_name = f"syllabus_{syllabus_id}"
+        backend = self.model
+        
+        collection = None
+        try:
+            collection = self.chroma_client.get_collection(name=collection_name)
+        except (InvalidCollectionException, ValueError):
+            pass
+        
+        if collection is not None:
+            built_by = collection_embedding_version(collection)
+            if built_by != backend.version:
+                logger.warning(f"Collection {collection_name} was built by {built_by}, "
+                               f"not {backend.version}; rebuilding it")
+                incremental = False
+            if not incremental:
+                self.chroma_client.delete_collection(name=collection_name)
+                logger.info(f"Deleted existing collection: {collection_name}")
+                collection = None
+        
+        if collection is None:
+            collection = self.chroma_client.create_collection(
+                name=collection_name,
+                metadata={
+                    "hnsw:space": "cosine",
+                    "embedding_version": backend.version,
+                    "embedding_dimension": backend.dimension
+                }
+            )
+            logger.info(f"Created new collection: {collection_name}")
+        
+        existing = {}
+        if collection.count():
+            stored = collection.get(include=['metadatas'])
+            existing = {
+                chunk_id: metadata or {}
+                for chunk_id, metadata in zip(stored['ids'], stored['metadatas'])
+            }
+        logger.info(f"Opened collection {collection_name} with {len(existing)} existing chunks")
+        return collection, existing
+
+    def store_vector_batches(self, collection,
+                             batches: Iterable[Tuple[List[Dict[str, Any]], np.ndarray]]
+                             ) -> Generator[List[Dict[str, Any]], None, None]:
+        """Upsert embedded chunk batches into a collection as they arrive.
+
+        Yields each batch of chunks once it has been stored.
+        """
+        for batch_chunks, batch_embeddings in batches:
+            collection.upsert(
+                embeddings=batch_embeddings,
+                documents=[chunk['text'] for chunk in batch_chunks],
+                metadatas=[chunk_metadata(chunk) for chunk in batch_chunks],
+                ids=[chunk['id'] for chunk in batch_chunks]
+            )
+            yield batch_chunks
+
+    def apply_chunk_diff(self, collection, diff: 'ChunkDiff', batch_size: int = 500):
+        """Refresh moved chunks' metadata and delete chunks no longer present.
+
+        Runs after the new chunks are stored, so the collection never lacks
+        the content of either revision while it is being updated.
+        """
+        for i in range(0, len(diff.moved), batch_size):
+            batch = diff.moved[i:i + batch_size]
+            collection.update(
+                ids=[chunk_id for chunk_id, _ in batch],
+                metadatas=[metadata for _, metadata in batch]
+            )
+        
+        removed_ids = diff.removed_ids
+        for i in range(0, len(removed_ids), batch_size):
+            collection.delete(ids=removed_ids[i:i + batch_size])
+        if removed_ids:
+            logger.info(f"Removed {len(removed_ids)} stale chunks from {collection.name}")
+
+    def update_lexical_index(self, syllabus_id: int, collection, diff: 'ChunkDiff',
+                             batch_size: int = 500) -> LexicalIndex:
+        """Bring the syllabus BM25 index in line with the collection after a diff.
+
+        The previous index is updated in place of a rebuild, so only added
+        chunks are tokenized. If it is missing or out of step with the
+        collection, unchanged chunks are read back from Chroma instead.
+        """
+        store = model_registry.get_lexical_store()
+        added = [(chunk['id'], chunk['text'], chunk_metadata(chunk)) for chunk in diff.added_chunks]
+        
+        previous = store.get(syllabus_id) if diff.existing else None
+        if previous is not None and set(previous.ids.tolist()) == set(diff.existing):
+            index = previous.update(added, diff.removed_ids, dict(diff.moved))
+        else:
+            unchanged_ids = [chunk_id for chunk_id in diff.seen if chunk_id in diff.existing]
+            moved = dict(diff.moved)
+            documents = list(added)
+            for i in range(0, len(unchanged_ids), batch_size):
+                stored = collection.get(ids=unchanged_ids[i:i + batch_size], include=['documents', 'metadatas'])
+                for chunk_id, text, metadata in zip(stored['ids'], stored['documents'], stored['metadatas']):
+                    documents.append((chunk_id, text, moved.get(chunk_id, metadata)))
+            index = LexicalIndex.build(documents)
+        
+        store.put(syllabus_id, index)
+        logger.info(f"Lexical index for syllabus {syllabus_id} has {len(index)} chunks")
+        return index
+
+    def update_search_index(self, syllabus_id: int, department: str, collection):
+        """Refresh the syllabus's document and section vectors in the global search index.
+
+        Failures are logged rather than raised: search is secondary to the
+        syllabus being available for chat.
+        """
+        try:
+            content = SyllabusContent.from_collection(collection)
+            search_index = model_registry.get_search_index()
+            if content.vectors is None:
+                search_index.remove(syllabus_id)
+                return
+            vectors, pages = section_vectors(
+                content.vectors,
+                [metadata.get('page') for metadata in content.metadatas],
+                search_index.max_sections
+            )
+            search_index.upsert(syllabus_id, department, vectors, pages)
+            logger.info(f"Indexed syllabus {syllabus_id} for search with {len(vectors) - 1} sections")
+        except Exception as e:
+            logger.error(f"Error updating search index for syllabus {syllabus_id}: {str(e)}")
+
+def chunk_metadata(chunk: Dict[str, Any]) -> Dict[str, Any]:
+    """Location metadata stored with a chunk; Chroma rejects None values."""
+    return {
+        key: chunk[key]
+        for key in ('page', 'start', 'end', 'position', 'section', 'heading')
+        if chunk.get(key) is not None
+    }
+
+class ChunkDiff:
+    """Sorts a re-chunked syllabus against the chunks already in its collection.
+
+    Because chunk ids are derived from content, a chunk whose text did not
+    change keeps its id and embedding even if edits elsewhere moved it.
+    """
+
+    def __init__(self, existing: Dict[str, Dict[str, Any]]):
+        self.existing = existing
+        self.seen = set()
+        self.added = 0
+        self.unchanged = 0
+        self.moved = []  # (id, metadata) of unchanged chunks at a new location
+        self.added_chunks = []  # Kept for the lexical index, which needs their text
+
+    def new_chunks(self, chunks: Iterable[Dict[str, Any]]) -> Generator[Dict[str, Any], None, None]:
+        """Yield only the chunks that still need embedding and storing."""
+        for chunk in chunks:
+            self.seen.add(chunk['id'])
+            stored_metadata = self.existing.get(chunk['id'])
+            if stored_metadata is None:
+                self.added += 1
+                self.added_chunks.append(chunk)
+                yield chunk
+                continue
+            
+            self.unchanged += 1
+            metadata = chunk_metadata(chunk)
+            if stored_metadata != metadata:
+                self.moved.append((chunk['id'], metadata))
+
+    @property
+    def removed_ids(self) -> List[str]:
+        return [chunk_id for chunk_id in self.existing if chunk_id not in self.seen]
+
+    def report(self) -> Dict[str, int]:
+        return {
+            'added': self.added,
+            'removed': len(self.removed_ids),
+            'unchanged': self.unchanged,
+            'moved': len(self.moved)
+        }
+
+def process_pdf(syllabus, progress_callback=None, file_name: str = None) -> dict:
+    """Main function to process PDF and generate embeddings.
+
+    Pages stream through chunking, embedding and storage one batch at a
+    time, so memory stays bounded regardless of document length. When the
+    syllabus was indexed before, only chunks whose text changed are embedded
+    and upserted, and chunks that disappeared are deleted at the end, so the
+    collection stays queryable throughout. ``progress_callback(stage,
+    fraction)`` is called as the extracting, embedding and storing stages
+    advance. ``file_name`` indexes that upload instead of the syllabus's
+    current file, as for a revision. Returns the index diff and per-stage
+    statistics.
+    """
     try:
         processor = PDFProcessor()
+        metrics = PipelineMetrics()
         
         # Get full file path
-        file_path = os.path.join(current_app.config['UPLOAD_FOLDER'], syllabus.file_path)
+        file_path = os.path.join(current_app.config['UPLOAD_FOLDER'], file_name or syllabus.file_path)
+        total_pages = processor.count_pages(file_path)
+        collection, existing = processor.open_collection(
+            syllabus.id,
+            incremental=current_app.config['INGESTION_INCREMENTAL']
+        )
+        diff = ChunkDiff(existing)
         
-        # Extract text
-        text = processor.extract_text_from_pdf(file_path)
-        logger.info(f"Extracted text length: {len(text)}")
+        pages = metrics.meter('extracting', processor.iter_pages(
+            file_path,
+            progress_callback,
+            workers=current_app.config['PDF_EXTRACTION_WORKERS'],
+            parallel_threshold=current_app.config['PDF_PARALLEL_PAGE_THRESHOLD'],
+            pages_per_task=current_app.config['PDF_PAGES_PER_TASK']
+        ))
+        chunks = metrics.meter('chunking', processor.iter_chunks(
+            pages,
+            chunk_size=current_app.config['TEXT_CHUNK_SIZE'],
+            overlap=current_app.config['TEXT_CHUNK_OVERLAP']
+        ))
+        # Only chunks whose content is not already stored get embedded
+        new_chunks = metrics.meter('diffing', diff.new_chunks(processor.assign_chunk_ids(chunks)))
+        batches = metrics.meter('embedding', processor.iter_embedding_batches(
+            new_chunks,
+            batch_size=current_app.config['EMBEDDING_SORT_WINDOW']
+        ))
+        stored_batches = metrics.meter('storing', processor.store_vector_batches(collection, batches))
         
-        # Create chunks and convert generator to list
-        chunks = list(processor.create_text_chunks(text))
-        logger.info(f"Created {len(chunks)} chunks")
+        for batch_chunks in stored_batches:
+            if progress_callback:
+                fraction = batch_chunks[-1]['page'] / total_pages
+                progress_callback('embedding', fraction)
+                progress_callback('storing', fraction)
         
-        # Generate embeddings
-        embeddings = processor.generate_embeddings(chunks)
-        logger.info(f"Generated {len(embeddings)} embeddings")
+        # Checked before deleting anything so a bad revision keeps the old chunks
+        if not diff.seen:
+            raise ValueError("No text content extracted from PDF")
         
-        # Store vectors
-        collection_name = processor.store_vectors(syllabus.id, chunks, embeddings)
+        processor.apply_chunk_diff(collection, diff)
+        processor.update_lexical_index(syllabus.id, collection, diff)
+        processor.update_search_index(syllabus.id, syllabus.department, collection)
+        
+        stage_stats = metrics.as_dict()
+        index_report = diff.report()
+        embedding_time = stage_stats['embedding']['wall_time']
+        stage_stats['embedding']['chunks'] = diff.added
+        stage_stats['embedding']['chunks_per_second'] = (
+            round(diff.added / embedding_time, 1) if diff.added and embedding_time else None
+        )
+        logger.info(f"Updated {collection.name}: {index_report}; stage stats: {stage_stats}")
         
         # Update syllabus record
-        syllabus.vector_store_id = collection_name
+        syllabus.vector_store_id = collection.name
+
+        return {
+            'pages': total_pages,
+            'chunks': len(diff.seen),
+            'collection': collection.name,
+            'index': index_report,
+            'stages': stage_stats
+        }
         
     except Exception as e:
         logger.error(f"Error processing syllabus: {str(e)}")
-        raise
\ No newline at end of file
+        raise
+    finally:
+        # The collection may have changed even if ingestion failed part way
+        model_registry.invalidate_syllabus(syllabus.id)
\ No newline at end of file
@@ -0,0 +1,79 @@
+# app/services/pipeline_metrics.py
+import time
+from typing import Iterable, Iterator, Dict, Any
+import psutil
+
+class PipelineMetrics:
+    """Per-stage timing and peak RSS for a chain of generator stages.
+
+    Stages pull from each other lazily, so the work of one stage happens
+    inside another stage's ``next()`` call. ``meter`` wraps each stage and
+    subtracts the time spent in nested stages so every stage reports only
+    its own wall and CPU time. RSS is sampled after every item a stage
+    produces and the highest sample is kept as that stage's peak.
+    """
+
+    def __init__(self):
+        self._process = psutil.Process()
+        self._stages = {}
+        self._active = []
+
+    def meter(self, stage: str, iterable: Iterable) -> Iterator:
+        """Wrap a stage's iterator so its items are timed and sampled."""
+        return self._metered(self._stage(stage), iter(iterable))
+
+    def as_dict(self) -> Dict[str, Dict[str, Any]]:
+        return {
+            stage: {
+                'items': stats['items'],
+                'wall_time': round(stats['wall_time'], 4),
+                'cpu_time': round(stats['cpu_time'], 4),
+                'peak_rss_mb': round(stats['peak_rss_mb'], 1)
+            }
+            for stage, stats in self._stages.items()
+        }
+
+    def _stage(self, stage):
+        return self._stages.setdefault(stage, {
+            'items': 0,
+            'wall_time': 0.0,
+            'cpu_time': 0.0,
+            'peak_rss_mb': 0.0
+        })
+
+    def _metered(self, stats, iterator):
+        while True:
+            # Nested stages record their own time into the frame on top of ours
+            frame = {'wall': 0.0, 'cpu': 0.0}
+            self._active.append(frame)
+            wall_start = time.perf_counter()
+            cpu_start = time.process_time()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                self._record(stats, frame, wall_start, cpu_start, produced=False)
+                return
+            except BaseException:
+                self._record(stats, frame, wall_start, cpu_start, produced=False)
+                raise
+            self._record(stats, frame, wall_start, cpu_start, produced=True)
+            yield item
+
+    def _record(self, stats, frame, wall_start, cpu_start, produced):
+        wall = time.perf_counter() - wall_start
+        cpu = time.process_time() - cpu_start
+        self._active.pop()
+
+        stats['wall_time'] += wall - frame['wall']
+        stats['cpu_time'] += cpu - frame['cpu']
+        stats['peak_rss_mb'] = max(stats['peak_rss_mb'], self._rss_mb())
+        if produced:
+            stats['items'] += 1
+
+        # Charge our inclusive time to the enclosing stage's nested total
+        if self._active:
+            self._active[-1]['wall'] += wall
+            self._active[-1]['cpu'] += cpu
+
+    def _rss_mb(self):
+        return self._process.memory_info().rss / (1024 * 1024)
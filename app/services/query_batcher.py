@@ -0,0 +1,126 @@
+# app/services/query_batcher.py
+import logging
+import queue
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import Future
+from typing import Callable, List
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Recent queueing delays kept for percentile reporting
+DELAY_SAMPLES = 1000
+
+
+class QueryBatcher:
+    """Coalesces query embeddings from concurrent requests into batched encode calls.
+
+    Callers block in ``embed`` while a single dispatcher thread collects
+    requests for up to ``max_wait`` seconds after the first one arrives, or
+    until ``max_batch_size`` are waiting, then encodes them in one call and
+    hands each caller its vector. A lone request pays at most ``max_wait``
+    extra latency; under load the model runs fewer, fuller batches.
+    """
+
+    def __init__(self, encode: Callable[[List[str]], np.ndarray], max_wait: float = 0.005,
+                 max_batch_size: int = 16):
+        self.encode = encode
+        self.max_wait = max_wait
+        self.max_batch_size = max_batch_size
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._batch_sizes = Counter()
+        self._delays = deque(maxlen=DELAY_SAMPLES)
+        self._stats = {'requests': 0, 'batches': 0, 'errors': 0, 'encode_seconds': 0.0}
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='query-batcher', daemon=True)
+        self._thread.start()
+
+    def embed(self, text: str) -> np.ndarray:
+        """Return the embedding of ``text``, encoded together with concurrent requests."""
+        if self._stopped.is_set():
+            raise RuntimeError("Query batcher is stopped")
+        future = Future()
+        self._queue.put((text, time.perf_counter(), future))
+        return future.result()
+
+    def stop(self):
+        self._stopped.set()
+        self._queue.put(None)
+        self._thread.join(timeout=5)
+
+    def _collect(self, first) -> list:
+        batch = [first]
+        deadline = first[1] + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                self._queue.put(None)  # Let the run loop see the stop marker
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            if first is None:
+                break
+            batch = self._collect(first)
+            started = time.perf_counter()
+            with self._lock:
+                self._stats['requests'] += len(batch)
+                self._stats['batches'] += 1
+                self._batch_sizes[len(batch)] += 1
+                self._delays.extend(started - enqueued for _, enqueued, _ in batch)
+            try:
+                vectors = np.asarray(self.encode([text for text, _, _ in batch]), dtype=np.float32)
+            except Exception as e:
+                logger.error(f"Error encoding batch of {len(batch)} queries: {str(e)}")
+                with self._lock:
+                    self._stats['errors'] += 1
+                for _, _, future in batch:
+                    future.set_exception(e)
+                continue
+            with self._lock:
+                self._stats['encode_seconds'] += time.perf_counter() - started
+            for (_, _, future), vector in zip(batch, vectors.reshape(len(batch), -1)):
+                future.set_result(vector)
+
+        # Fail anything that arrived after the stop marker instead of leaving it blocked
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not None:
+                item[2].set_exception(RuntimeError("Query batcher is stopped"))
+
+    def get_stats(self):
+        """Get the batch-size distribution and queueing delay percentiles."""
+        with self._lock:
+            stats = dict(self._stats)
+            batch_sizes = dict(sorted(self._batch_sizes.items()))
+            delays = sorted(self._delays)
+        batches = stats['batches']
+
+        def percentile(fraction):
+            return delays[min(len(delays) - 1, int(fraction * len(delays)))] * 1000 if delays else None
+
+        return {
+            'max_wait_ms': self.max_wait * 1000,
+            'max_batch_size': self.max_batch_size,
+            'requests': stats['requests'],
+            'batches': batches,
+            'errors': stats['errors'],
+            'mean_batch_size': stats['requests'] / batches if batches else None,
+            'batch_sizes': batch_sizes,
+            'queue_delay_p50_ms': percentile(0.5),
+            'queue_delay_p95_ms': percentile(0.95),
+            'mean_encode_ms': stats['encode_seconds'] / batches * 1000 if batches else None
+        }
@@ -0,0 +1,87 @@
+# app/services/query_embedding_cache.py
+import logging
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Callable, Optional
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+TRAILING_PUNCTUATION = re.compile(r'[\s?!.]+$')
+
+
+def normalize_query(query: str) -> str:
+    """Fold case, Unicode form, whitespace and trailing punctuation out of a question."""
+    text = " ".join(unicodedata.normalize('NFKC', query).casefold().split())
+    return TRAILING_PUNCTUATION.sub('', text)
+
+
+class QueryEmbeddingCache:
+    """Bounded in-process LRU of query vectors, keyed by model version and normalized text.
+
+    Students ask the same few questions over and over; a hit returns the
+    stored vector without touching the embedding model. Entries older than
+    ``ttl`` seconds are treated as misses when ``ttl`` is set.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl: Optional[float] = None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()  # (version, normalized text) -> (stored at, vector)
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'expired': 0, 'evictions': 0, 'encode_seconds': 0.0}
+
+    def get(self, version: str, query: str, encode: Callable[[str], np.ndarray]) -> np.ndarray:
+        """Return the vector for ``query``, calling ``encode(normalized)`` on a miss."""
+        normalized = normalize_query(query)
+        key = (version, normalized)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self.ttl is not None and now - entry[0] > self.ttl:
+                del self._entries[key]
+                self._stats['expired'] += 1
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self._stats['hits'] += 1
+                return entry[1]
+            self._stats['misses'] += 1
+
+        start_time = time.perf_counter()
+        vector = np.asarray(encode(normalized), dtype=np.float32).reshape(-1)
+        # Shared between callers, so freeze it against accidental in-place edits
+        vector.flags.writeable = False
+        with self._lock:
+            self._stats['encode_seconds'] += time.perf_counter() - start_time
+            self._entries[key] = (now, vector)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats['evictions'] += 1
+        return vector
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self):
+        """Get hit rate, eviction counts and mean encode time of misses."""
+        with self._lock:
+            stats = dict(self._stats)
+            entries = len(self._entries)
+        lookups = stats['hits'] + stats['misses']
+        return {
+            'entries': entries,
+            'max_entries': self.max_entries,
+            'ttl_seconds': self.ttl,
+            'hits': stats['hits'],
+            'misses': stats['misses'],
+            'hit_rate': stats['hits'] / lookups if lookups else None,
+            'expired': stats['expired'],
+            'evictions': stats['evictions'],
+            'mean_miss_encode_ms': stats['encode_seconds'] / stats['misses'] * 1000 if stats['misses'] else None
+        }
@@ -0,0 +1,95 @@
+# app/services/single_flight.py
+import logging
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Hashable, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class FlightAbandoned(RuntimeError):
+    """The leader stopped before producing a result, as when its client disconnected."""
+
+
+class SingleFlight:
+    """Coalesces concurrent calls with the same key into one computation.
+
+    The first caller for a key becomes its leader and computes the result;
+    callers arriving while it runs follow, waiting for and sharing that
+    result (or its exception) instead of repeating the work. A leader that
+    gives up without a result releases its followers to try again, one of
+    them taking over as leader. Once a flight finishes its key is forgotten,
+    so later calls compute afresh.
+    """
+
+    def __init__(self):
+        self._flights = {}  # key -> [future, follower count]
+        self._lock = threading.Lock()
+        self._stats = {'calls': 0, 'leaders': 0, 'saved_calls': 0, 'failed': 0, 'abandoned': 0,
+                       'largest_group': 0}
+
+    def begin(self, key: Hashable) -> Tuple[Future, bool]:
+        """Join the flight for ``key``; returns (its future, whether the caller leads it).
+
+        A leader must end the flight with ``finish``.
+        """
+        with self._lock:
+            self._stats['calls'] += 1
+            flight = self._flights.get(key)
+            if flight is not None:
+                flight[1] += 1
+                return flight[0], False
+            future = Future()
+            self._flights[key] = [future, 0]
+            self._stats['leaders'] += 1
+            return future, True
+
+    def finish(self, key: Hashable, result: Any = None, error: BaseException = None):
+        """End the flight for ``key``, handing its followers ``result`` or ``error``."""
+        with self._lock:
+            future, followers = self._flights.pop(key)
+            self._stats['largest_group'] = max(self._stats['largest_group'], followers + 1)
+            if isinstance(error, FlightAbandoned):
+                self._stats['abandoned'] += 1
+            else:
+                self._stats['saved_calls'] += followers
+                if error is not None:
+                    self._stats['failed'] += 1
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def do(self, key: Hashable, compute: Callable[[], Any]) -> Tuple[Any, bool]:
+        """Return (``compute()`` or an identical concurrent call's result, whether it was shared)."""
+        while True:
+            future, leader = self.begin(key)
+            if leader:
+                try:
+                    result = compute()
+                except BaseException as e:
+                    # Followers share real errors but retry after an interruption
+                    self.finish(key, error=e if isinstance(e, Exception) else FlightAbandoned())
+                    raise
+                self.finish(key, result=result)
+                return result, False
+            try:
+                return future.result(), True
+            except FlightAbandoned:
+                continue
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get how many calls were coalesced and the upstream calls that saved."""
+        with self._lock:
+            stats = dict(self._stats)
+            in_flight = len(self._flights)
+        return {
+            'in_flight': in_flight,
+            'calls': stats['calls'],
+            'leaders': stats['leaders'],
+            'saved_calls': stats['saved_calls'],
+            'coalesced_rate': stats['saved_calls'] / stats['calls'] if stats['calls'] else None,
+            'failed': stats['failed'],
+            'abandoned': stats['abandoned'],
+            'largest_group': stats['largest_group']
+        }
@@ -0,0 +1,134 @@
+# app/services/syllabus_cache.py
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Rough per-chunk cost of the id, metadata dict and list slots beyond text and vector bytes
+CHUNK_OVERHEAD_BYTES = 256
+
+
+class SyllabusContent:
+    """One syllabus's stored chunks in document order, plus the joined document."""
+
+    def __init__(self, ids: List[str], texts: List[str], metadatas: List[Dict[str, Any]],
+                 vectors: Optional[np.ndarray]):
+        self.ids = ids
+        self.texts = texts
+        self.metadatas = metadatas
+        self.vectors = vectors
+        self.document = " ".join(texts)
+        self._rows = {chunk_id: row for row, chunk_id in enumerate(ids)}
+        self.size_bytes = (
+            sum(len(text) for text in texts) + len(self.document)
+            + (vectors.nbytes if vectors is not None else 0)
+            + CHUNK_OVERHEAD_BYTES * len(ids)
+        )
+
+    @classmethod
+    def from_collection(cls, collection) -> 'SyllabusContent':
+        stored = collection.get(include=['documents', 'metadatas', 'embeddings'])
+        metadatas = [metadata or {} for metadata in (stored.get('metadatas') or [{}] * len(stored['ids']))]
+        # Chunk ids are content hashes, so restore document order
+        order = sorted(range(len(stored['ids'])), key=lambda row: metadatas[row].get('position', 0))
+        embeddings = stored.get('embeddings')
+        vectors = None
+        if embeddings is not None and len(embeddings):
+            vectors = np.asarray(embeddings, dtype=np.float32)[order]
+        return cls(
+            [stored['ids'][row] for row in order],
+            [stored['documents'][row] for row in order],
+            [metadatas[row] for row in order],
+            vectors
+        )
+
+    def vector(self, chunk_id: str) -> Optional[np.ndarray]:
+        row = self._rows.get(chunk_id)
+        if row is None or self.vectors is None:
+            return None
+        return self.vectors[row]
+
+
+class SyllabusContentCache:
+    """In-process LRU of syllabus content, bounded by entry count and memory.
+
+    Callers pass the syllabus's shared content version (see
+    ``IngestionJob.content_version``), read before loading, and an entry is
+    only served while that version is current. Re-indexing in any process
+    therefore retires entries everywhere, and content loaded concurrently
+    with a re-index is tagged with the version before it. ``invalidate``
+    additionally drops an entry right away in the process that changed it.
+    """
+
+    def __init__(self, max_entries: int = 256, max_bytes: int = 64 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # syllabus id -> (version, SyllabusContent)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'stale': 0, 'evictions': 0, 'invalidations': 0, 'oversized': 0}
+
+    def get(self, syllabus_id: int, version: Optional[str], loader: Callable[[], SyllabusContent]
+            ) -> SyllabusContent:
+        """Return cached content for ``version``, calling ``loader`` on a miss."""
+        with self._lock:
+            entry = self._entries.get(syllabus_id)
+            if entry is not None and entry[0] == version:
+                self._entries.move_to_end(syllabus_id)
+                self._stats['hits'] += 1
+                return entry[1]
+            if entry is not None:
+                # Re-indexed since it was loaded, possibly by another process
+                self._discard(syllabus_id)
+                self._stats['stale'] += 1
+            self._stats['misses'] += 1
+
+        content = loader()
+        with self._lock:
+            if content.size_bytes > self.max_bytes:
+                self._stats['oversized'] += 1
+                return content
+            self._discard(syllabus_id)
+            self._entries[syllabus_id] = (version, content)
+            self._bytes += content.size_bytes
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                evicted, (_, evicted_content) = self._entries.popitem(last=False)
+                self._bytes -= evicted_content.size_bytes
+                self._stats['evictions'] += 1
+                logger.debug(f"Evicted syllabus {evicted} content from cache")
+        return content
+
+    def invalidate(self, syllabus_id: int):
+        """Drop a syllabus's content after this process re-indexed or deleted it."""
+        with self._lock:
+            self._discard(syllabus_id)
+            self._stats['invalidations'] += 1
+
+    def _discard(self, syllabus_id: int):
+        entry = self._entries.pop(syllabus_id, None)
+        if entry is not None:
+            self._bytes -= entry[1].size_bytes
+
+    def get_stats(self):
+        """Get hit rate, eviction counts and memory use."""
+        with self._lock:
+            stats = dict(self._stats)
+            entries = len(self._entries)
+            total_bytes = self._bytes
+        lookups = stats['hits'] + stats['misses']
+        return {
+            'entries': entries,
+            'max_entries': self.max_entries,
+            'size_mb': total_bytes / (1024 * 1024),
+            'max_size_mb': self.max_bytes / (1024 * 1024),
+            'hits': stats['hits'],
+            'misses': stats['misses'],
+            'hit_rate': stats['hits'] / lookups if lookups else None,
+            'stale': stats['stale'],
+            'evictions': stats['evictions'],
+            'invalidations': stats['invalidations'],
+            'oversized': stats['oversized']
+        }
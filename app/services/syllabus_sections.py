@@ -0,0 +1,104 @@
+# app/services/syllabus_sections.py
+import logging
+import re
+from typing import Dict, List, Optional, Tuple
+from app.services.lexical_index import tokenize
+
+logger = logging.getLogger(__name__)
+
+# Heading phrases that open each common syllabus section
+SECTION_HEADINGS = {
+    'overview': ('course description', 'course overview', 'about the course', 'course objectives',
+                 'learning objectives', 'learning outcomes', 'prerequisites', 'description', 'overview'),
+    'contact': ('instructor and contact', 'instructor information', 'contact information', 'instructor',
+                'office hours', 'teaching assistants', 'course staff', 'contact'),
+    'materials': ('required materials', 'course materials', 'required texts', 'textbooks', 'textbook',
+                  'readings', 'materials'),
+    'grading': ('grading policy', 'grade breakdown', 'grading', 'grades', 'assessment', 'evaluation', 'exams'),
+    'schedule': ('course schedule', 'tentative schedule', 'weekly schedule', 'important dates', 'schedule',
+                 'calendar'),
+    'policies': ('course policies', 'late policy', 'late work', 'missed work', 'make-up policy', 'attendance',
+                 'academic integrity', 'academic honesty', 'collaboration', 'accommodations', 'lab safety',
+                 'policies'),
+}
+
+# Words in a question that point at one section
+SECTION_CUES = {
+    'overview': {'prerequisite', 'prerequisites', 'prereq', 'objectives', 'outcomes', 'description'},
+    'contact': {'office', 'email', 'instructor', 'professor', 'ta', 'tas', 'contact', 'phone'},
+    'materials': {'textbook', 'textbooks', 'book', 'books', 'edition', 'readings', 'materials', 'buy'},
+    'grading': {'grade', 'grades', 'graded', 'grading', 'worth', 'percent', 'percentage', 'weight',
+                'weighted', 'curve', 'points'},
+    'schedule': {'schedule', 'calendar', 'week', 'weeks', 'date', 'dates'},
+    'policies': {'late', 'policy', 'attendance', 'absence', 'absences', 'collaborate', 'collaboration',
+                 'cheating', 'plagiarism', 'integrity', 'accommodation', 'accommodations', 'extension'},
+}
+
+_SECTION_BY_HEADING = {heading: section for section, headings in SECTION_HEADINGS.items() for heading in headings}
+_PHRASES = '|'.join(re.escape(heading).replace(r'\ ', r'\s+')
+                    for heading in sorted(_SECTION_BY_HEADING, key=len, reverse=True))
+# A heading starts the text or a sentence, and is either set off by punctuation
+# ("Grading:", "Late Policy.") or written in capitals ("GRADING POLICY")
+HEADING_PATTERN = re.compile(
+    rf'(?:^|(?<=[.!?:;)] ))(?:(?i:(?P<marked>{_PHRASES}))\s*[:.–—-](?!\d)|(?P<capitals>[A-Z][A-Z\s-]+)(?= ))'
+)
+
+
+def find_headings(text: str) -> List[Tuple[int, str, str]]:
+    """Return (offset, section, heading text) for each recognized section heading in ``text``."""
+    headings = []
+    for match in HEADING_PATTERN.finditer(text):
+        if match.group('marked'):
+            words = match.group('marked').split()
+        else:
+            # A capitalized run may continue into the section's first words ("GRADING HOMEWORK 20%")
+            words = match.group('capitals').split()
+            while words and " ".join(words).lower() not in _SECTION_BY_HEADING:
+                words.pop()
+        heading = " ".join(words)
+        section = _SECTION_BY_HEADING.get(heading.lower())
+        if section is not None:
+            headings.append((match.start(), section, heading))
+    return headings
+
+
+def query_section(query: str) -> Optional[str]:
+    """Return the section a question clearly targets, or None if it names none or several."""
+    terms = set(tokenize(query))
+    sections = [section for section, cues in SECTION_CUES.items() if terms & cues]
+    return sections[0] if len(sections) == 1 else None
+
+
+class SectionTracker:
+    """Follows section headings through a document as it is chunked.
+
+    Headings are registered page by page with their document offsets; a
+    chunk belongs to the section covering most of its characters.
+    """
+
+    def __init__(self):
+        self._headings = []  # (document offset, section, heading text), in document order
+
+    def add_page(self, offset: int, text: str):
+        for start, section, heading in find_headings(text):
+            self._headings.append((offset + start, section, heading))
+
+    def locate(self, start: int, end: int) -> Dict[str, str]:
+        """Return {'section', 'heading'} for the chunk [start, end), empty before the first heading."""
+        # Headings before the one in effect at ``start`` can no longer matter
+        while len(self._headings) > 1 and self._headings[1][0] <= start:
+            self._headings.pop(0)
+
+        coverage = {}
+        for index, (offset, section, heading) in enumerate(self._headings):
+            if offset >= end:
+                break
+            section_end = self._headings[index + 1][0] if index + 1 < len(self._headings) else end
+            covered = min(section_end, end) - max(offset, start)
+            if covered > 0:
+                key = (section, heading)
+                coverage[key] = coverage.get(key, 0) + covered
+        if not coverage:
+            return {}
+        section, heading = max(coverage, key=coverage.get)
+        return {'section': section, 'heading': heading}
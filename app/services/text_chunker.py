@@ -0,0 +1,159 @@
+# app/services/text_chunker.py
+import logging
+import re
+import threading
+from typing import List, Tuple, Optional
+from app.config import Config
+
+logger = logging.getLogger(__name__)
+
+# A sentence ends at . ! or ? followed by whitespace, or at a line break
+SENTENCE_BREAK = re.compile(r'(?<=[.!?])\s+|\s*\n\s*')
+# Stand-in for tiktoken's pre-tokenizer when the BPE file is unavailable
+APPROXIMATE_TOKEN = re.compile(r'\w+|[^\w\s]+')
+
+_encodings = {}
+_encodings_lock = threading.Lock()
+
+
+def get_encoding(encoding_name: str):
+    """Return a cached tiktoken encoding, or None if it cannot be loaded.
+
+    tiktoken downloads its BPE ranks on first use, so offline hosts fall back
+    to an approximate regex tokenizer instead of failing ingestion.
+    """
+    with _encodings_lock:
+        if encoding_name not in _encodings:
+            try:
+                import tiktoken
+                _encodings[encoding_name] = tiktoken.get_encoding(encoding_name)
+            except Exception as e:
+                logger.warning(f"Could not load tiktoken encoding {encoding_name}, "
+                               f"using approximate token counts: {str(e)}")
+                _encodings[encoding_name] = None
+        return _encodings[encoding_name]
+
+
+class TextChunker:
+    """Single-pass, token-aware sentence chunker.
+
+    Sentence boundaries are found once with one regex scan and every sentence
+    is tokenized once. Chunks are then packed greedily from whole sentences up
+    to ``chunk_size`` tokens, and each next chunk starts at the earliest
+    sentence that keeps at most ``overlap`` tokens of overlap. Sentences longer
+    than a chunk are split on token boundaries. Both pointers only move
+    forward, so chunking is linear in the text length, and results are
+    (start, end) character offsets rather than copies of the text.
+    """
+
+    def __init__(self, chunk_size: Optional[int] = None, overlap: Optional[int] = None,
+                 encoding_name: Optional[str] = None):
+        self.chunk_size = chunk_size or Config.TEXT_CHUNK_SIZE
+        self.overlap = Config.TEXT_CHUNK_OVERLAP if overlap is None else overlap
+        if self.chunk_size <= 0:
+            raise ValueError("chunk_size must be positive")
+        if not 0 <= self.overlap < self.chunk_size:
+            raise ValueError("overlap must be between 0 and chunk_size")
+        self.encoding = get_encoding(encoding_name or Config.TEXT_CHUNK_ENCODING)
+
+    def count_tokens(self, text: str) -> int:
+        if self.encoding is None:
+            return sum(1 for _ in APPROXIMATE_TOKEN.finditer(text))
+        return len(self.encoding.encode_ordinary(text))
+
+    def chunk_offsets(self, text: str) -> List[Tuple[int, int]]:
+        """Return (start, end) character offsets of every chunk in ``text``."""
+        offsets, _ = self.pack(text, final=True)
+        return offsets
+
+    def pack(self, text: str, final: bool = True) -> Tuple[List[Tuple[int, int]], int]:
+        """Chunk ``text`` and return (offsets, resume_offset).
+
+        With ``final=False`` the text is treated as a prefix of a longer
+        stream: chunks that could still change once more text arrives are
+        held back, and ``resume_offset`` is where the caller should restart
+        after appending more text.
+        """
+        starts, ends, tokens = self._split_units(text)
+        unit_count = len(starts)
+        if not unit_count:
+            return [], len(text)
+
+        prefix = [0] * (unit_count + 1)
+        for index, count in enumerate(tokens):
+            prefix[index + 1] = prefix[index] + count
+
+        # The last unit may still grow when the next page is appended
+        stable_units = unit_count if final else unit_count - 1
+
+        offsets = []
+        first = 0
+        last = 0
+        while first < unit_count:
+            last = max(last, first + 1)
+            while last < unit_count and prefix[last + 1] - prefix[first] <= self.chunk_size:
+                last += 1
+            if last >= stable_units and not final:
+                break
+
+            offsets.append((starts[first], ends[last - 1]))
+            if last == unit_count:
+                first = unit_count
+                break
+
+            # Step back over as many trailing sentences as fit in the overlap
+            next_first = first + 1
+            while prefix[last] - prefix[next_first] > self.overlap:
+                next_first += 1
+            first = next_first
+
+        resume_offset = starts[first] if first < unit_count else len(text)
+        return offsets, resume_offset
+
+    def _split_units(self, text: str) -> Tuple[List[int], List[int], List[int]]:
+        """Split text into sentences no longer than a chunk, with token counts."""
+        starts, ends, tokens = [], [], []
+        position = 0
+        for match in SENTENCE_BREAK.finditer(text):
+            self._add_sentence(text, position, match.start(), starts, ends, tokens)
+            position = match.end()
+        self._add_sentence(text, position, len(text), starts, ends, tokens)
+        return starts, ends, tokens
+
+    def _add_sentence(self, text, start, end, starts, ends, tokens):
+        # Trim surrounding whitespace so offsets point at the sentence itself
+        while start < end and text[start].isspace():
+            start += 1
+        while end > start and text[end - 1].isspace():
+            end -= 1
+        if start == end:
+            return
+
+        sentence = text[start:end]
+        token_count = self.count_tokens(sentence)
+        if token_count <= self.chunk_size:
+            starts.append(start)
+            ends.append(end)
+            tokens.append(token_count)
+            return
+
+        # Oversized sentence: cut it into chunk-sized token windows
+        token_starts = self._token_starts(sentence)
+        for window in range(0, len(token_starts), self.chunk_size):
+            window_start = start + token_starts[window]
+            next_window = window + self.chunk_size
+            window_end = start + token_starts[next_window] if next_window < len(token_starts) else end
+            while window_start < window_end and text[window_start].isspace():
+                window_start += 1
+            while window_end > window_start and text[window_end - 1].isspace():
+                window_end -= 1
+            starts.append(window_start)
+            ends.append(window_end)
+            tokens.append(min(self.chunk_size, len(token_starts) - window))
+
+    def _token_starts(self, sentence: str) -> List[int]:
+        if self.encoding is None:
+            return [match.start() for match in APPROXIMATE_TOKEN.finditer(sentence)]
+        token_ids = self.encoding.encode_ordinary(sentence)
+        _, token_starts = self.encoding.decode_with_offsets(token_ids)
+        return token_starts
@@ -1,66 +1,269 @@
 # app/services/vector_store_service.py
 import logging
-import os
-import tempfile
+import re
+import time
 import numpy as np
-import chromadb
-from sentence_transformers import SentenceTransformer
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 import traceback
+from app.config import Config
+from app.extensions import model_registry
+from app.services.embedding_backends import EmbeddingMismatchError, collection_embedding_version
+from app.services.lexical_index import LexicalIndex
+from app.services.syllabus_cache import SyllabusContent
+from app.services.syllabus_sections import query_section
 
 logger = logging.getLogger(__name__)
 
+QUOTED_PHRASE = re.compile(r'"([^"]+)"')
+
 class VectorStoreService:
-    def __init__(self):
-        # Create a temporary directory for ChromaDB
-        self.persist_dir = os.path.join(tempfile.gettempdir(), "chroma_db")
-        os.makedirs(self.persist_dir, exist_ok=True)
-        
-        # Initialize ChromaDB
-        self.chroma_client = chromadb.PersistentClient(
-            path=self.persist_dir
+    def __init__(self, top_k: int = None, full_document_max_chunks: int = None, retrieval_mode: str = None,
+                 section_filter: bool = None):
+        # Reuse the process-wide ChromaDB client and model instead of loading
+        # them again for every chat message
+        self.persist_dir = model_registry.persist_dir
+        self.top_k = top_k or Config.RETRIEVAL_TOP_K
+        self.full_document_max_chunks = (Config.RETRIEVAL_FULL_DOCUMENT_MAX_CHUNKS
+                                         if full_document_max_chunks is None else full_document_max_chunks)
+        self.retrieval_mode = retrieval_mode or Config.RETRIEVAL_MODE
+        self.rrf_k = Config.RETRIEVAL_RRF_K
+        self.literal_margin = Config.RETRIEVAL_LITERAL_MARGIN
+        self.section_filter = Config.RETRIEVAL_SECTION_FILTER if section_filter is None else section_filter
+
+    @property
+    def chroma_client(self):
+        return model_registry.get_chroma_client()
+
+    @property
+    def model(self):
+        return model_registry.get_model()
+
+    def get_collection(self, syllabus_id: int):
+        """Return a syllabus collection, refusing it if another embedding backend built it."""
+        collection = self.chroma_client.get_collection(name=f"syllabus_{syllabus_id}")
+        # Checked against the configured version so a cached query never loads the model
+        version = model_registry.get_backend_version()
+        built_by = collection_embedding_version(collection)
+        if built_by != version:
+            raise EmbeddingMismatchError(
+                f"Collection {collection.name} was built by {built_by} "
+                f"but queries use {version}; re-index the syllabus"
+            )
+        return collection
+
+    def embed_query(self, query: str) -> np.ndarray:
+        """Embed a query with the same backend that built the collections.
+
+        Repeated questions are served from the query embedding cache without
+        running the model; the rest are batched with concurrent requests.
+        """
+        batcher = model_registry.get_query_batcher()
+        return model_registry.get_query_cache().get(
+            model_registry.get_backend_version(),
+            query,
+            batcher.embed if batcher is not None else lambda text: self.model.encode([text])
         )
-        
-        # Initialize the sentence transformer model
-        self.model = SentenceTransformer('paraphrase-MiniLM-L6-v2')
+
+    def get_syllabus_content(self, syllabus_id: int) -> SyllabusContent:
+        """Get a syllabus's chunks, vectors and joined text, cached until it is re-indexed."""
+        def load():
+            collection = self.chroma_client.get_collection(name=f"syllabus_{syllabus_id}")
+            return SyllabusContent.from_collection(collection)
+        return model_registry.get_syllabus_cache().get(syllabus_id, model_registry.content_version(syllabus_id), load)
+
+    def get_section_page(self, syllabus_id: int, section: str) -> Optional[int]:
+        """Get the page a detected syllabus section starts on, or None if it was not found."""
+        try:
+            content = self.get_syllabus_content(syllabus_id)
+        except Exception as e:
+            logger.error(f"Error finding section {section} of syllabus {syllabus_id}: {str(e)}")
+            return None
+        return next((metadata.get('page') for metadata in content.metadatas
+                     if metadata.get('section') == section), None)
 
     def get_full_syllabus_content(self, syllabus_id: int) -> str:
         """Get the full content of the syllabus from ChromaDB."""
         try:
-            collection_name = f"syllabus_{syllabus_id}"
-            collection = self.chroma_client.get_collection(name=collection_name)
-            
-            # Get all documents
-            results = collection.get()
-            
-            if results and 'documents' in results:
-                # Combine all chunks into one text
-                full_text = " ".join(results['documents'])
-                return full_text
-            
-            return ""
+            return self.get_syllabus_content(syllabus_id).document
             
         except Exception as e:
             logger.error(f"Error getting full syllabus content: {str(e)}")
             return ""
 
-    def get_relevant_context(self, syllabus_id: int, query: str, num_results: int = 3) -> List[Dict[str, Any]]:
-        """Get relevant context by using the full syllabus content."""
+    def get_relevant_context(self, syllabus_id: int, query: str, num_results: int = None,
+                             include_embeddings: bool = False) -> List[Dict[str, Any]]:
+        """Get the ``num_results`` chunks most relevant to the query.
+
+        In hybrid mode BM25 and vector rankings are fused with reciprocal-rank
+        fusion, and a literal lookup (see ``_is_literal_match``) is answered
+        from the lexical index alone, without loading the embedding model. Syllabi with no more than ``full_document_max_chunks`` chunks
+        are returned whole as a single context item, as are collections built
+        by a different embedding backend, which cannot be searched with this
+        one. A question that clearly targets one syllabus section (grading,
+        schedule, ...) only searches that section's chunks, if it has enough.
+        With ``include_embeddings`` vector-searched chunks also carry their
+        stored vector, for context assembly.
+        """
         try:
-            # Get full syllabus content
-            full_content = self.get_full_syllabus_content(syllabus_id)
+            num_results = num_results or self.top_k
+            start_time = time.perf_counter()
             
-            if not full_content:
+            lexical_hits = None
+            section = None
+            if self.retrieval_mode != 'vector' or self.section_filter:
+                lexical_store = model_registry.get_lexical_store()
+                lexical_index = lexical_store.get(syllabus_id)
+                if lexical_index is not None:
+                    if self.retrieval_mode != 'vector' and len(lexical_index) <= self.full_document_max_chunks:
+                        return self._full_document_context(syllabus_id)
+                    section = self._target_section(lexical_index, query, num_results)
+                    if section is not None:
+                        lexical_store.record_section_filter()
+                    if self.retrieval_mode != 'vector':
+                        lexical_hits = lexical_store.search(syllabus_id, query, k=num_results, section=section)
+                        if self.retrieval_mode == 'lexical' or self._is_literal_match(query, lexical_hits):
+                            lexical_store.record_fast_path()
+                            return self._lexical_context(lexical_hits)
+            
+            try:
+                collection = self.get_collection(syllabus_id)
+            except EmbeddingMismatchError as e:
+                logger.error(f"Falling back to the full syllabus: {str(e)}")
+                return self._full_document_context(syllabus_id)
+            
+            chunk_count = collection.count()
+            if chunk_count == 0:
                 logger.warning(f"No content found for syllabus {syllabus_id}")
                 return []
+            if chunk_count <= self.full_document_max_chunks:
+                return self._full_document_context(syllabus_id)
+            
+            query_embedding = self.embed_query(query)
+            results = collection.query(
+                query_embeddings=[query_embedding.tolist()],
+                n_results=min(num_results, chunk_count),
+                where={'section': section} if section is not None else None,
+                include=['documents', 'metadatas', 'distances'] + (['embeddings'] if include_embeddings else [])
+            )
+            
+            documents = results['documents'][0]
+            distances = results['distances'][0]
+            metadatas = (results.get('metadatas') or [[{}] * len(documents)])[0]
+            ids = (results.get('ids') or [[None] * len(documents)])[0]
             
-            # Create a context with the full content
-            return [{
-                'text': full_content,
-                'similarity': 1.0
-            }]
+            context = []
+            for index, (chunk_id, document, distance) in enumerate(zip(ids, documents, distances)):
+                metadata = metadatas[index] or {}
+                item = {
+                    'id': chunk_id,
+                    'text': document,
+                    # Collections use cosine space, where distance = 1 - similarity
+                    'similarity': float(1.0 - distance),
+                    'page': metadata.get('page'),
+                    'position': metadata.get('position'),
+                    'section': metadata.get('section')
+                }
+                if include_embeddings:
+                    item['embedding'] = np.asarray(results['embeddings'][0][index], dtype=np.float32)
+                    item['start'] = metadata.get('start')
+                    item['end'] = metadata.get('end')
+                context.append(item)
+            
+            if lexical_hits:
+                context = self._fuse(syllabus_id, context, lexical_hits, query_embedding,
+                                     num_results, include_embeddings)
+            
+            logger.info(f"Retrieved {len(context)} of {chunk_count} chunks for syllabus {syllabus_id}"
+                        f"{f' in section {section}' if section else ''} in {time.perf_counter() - start_time:.3f}s")
+            return context
             
         except Exception as e:
             logger.error(f"Error getting context: {str(e)}")
             logger.error(f"Traceback: {traceback.format_exc()}")
-            return []
\ No newline at end of file
+            return []
+
+    def _target_section(self, lexical_index: LexicalIndex, query: str, num_results: int) -> Optional[str]:
+        """The section a question targets, if it holds enough chunks to fill the results alone."""
+        if not self.section_filter:
+            return None
+        section = query_section(query)
+        if section is None or lexical_index.section_count(section) < num_results:
+            return None
+        return section
+
+    def _is_literal_match(self, query: str, lexical_hits: List[Dict[str, Any]]) -> bool:
+        """True if the query is a literal lookup the best lexical hit answers on its own.
+
+        The hit must contain every content word of the query, and the query
+        must also quote a phrase found in the hit, name a number or course
+        code, or have several terms the hit matches far better than the
+        next. Ordinary short questions, whose one or two terms appear all
+        over a syllabus, go through fusion.
+        """
+        if not lexical_hits or lexical_hits[0]['matched_terms'] != lexical_hits[0]['query_terms']:
+            return False
+        best = lexical_hits[0]
+        text = best['text'].lower()
+        if any(phrase.strip().lower() in text for phrase in QUOTED_PHRASE.findall(query)):
+            return True
+        if any(character.isdigit() for character in query):
+            return True
+        runner_up = lexical_hits[1]['score'] if len(lexical_hits) > 1 else 0.0
+        return best['query_terms'] > 1 and best['score'] >= self.literal_margin * runner_up
+
+    @staticmethod
+    def _lexical_context(lexical_hits: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        top_score = lexical_hits[0]['score'] if lexical_hits else 1.0
+        return [{
+            'id': hit['id'],
+            'text': hit['text'],
+            # BM25 scores are unbounded, so scale them against the best hit
+            'similarity': hit['score'] / top_score,
+            'score': hit['score'],
+            'page': hit.get('page'),
+            'position': hit.get('position'),
+            'section': hit.get('section'),
+            'start': hit.get('start'),
+            'end': hit.get('end')
+        } for hit in lexical_hits]
+
+    def _fuse(self, syllabus_id: int, vector_items: List[Dict[str, Any]], lexical_hits: List[Dict[str, Any]],
+              query_embedding: np.ndarray, num_results: int, include_embeddings: bool) -> List[Dict[str, Any]]:
+        """Combine vector and BM25 rankings with reciprocal-rank fusion."""
+        items = {item['id']: item for item in vector_items}
+        scores = {}
+        for ranking in (vector_items, lexical_hits):
+            for rank, item in enumerate(ranking):
+                scores[item['id']] = scores.get(item['id'], 0.0) + 1.0 / (self.rrf_k + rank + 1)
+        
+        # Chunks only the lexical index found still need their vector for a true similarity
+        lexical_only = [hit for hit in lexical_hits if hit['id'] not in items]
+        if lexical_only:
+            content = self.get_syllabus_content(syllabus_id)
+            query_norm = np.linalg.norm(query_embedding) or 1.0
+            for hit in self._lexical_context(lexical_only):
+                vector = content.vector(hit['id'])
+                if vector is None:
+                    continue  # Index is ahead of or behind the collection
+                hit['similarity'] = float(vector @ query_embedding / ((np.linalg.norm(vector) or 1.0) * query_norm))
+                if include_embeddings:
+                    hit['embedding'] = vector
+                items[hit['id']] = hit
+        
+        fused = sorted(items.values(), key=lambda item: scores[item['id']], reverse=True)[:num_results]
+        for item in fused:
+            item['score'] = scores[item['id']]
+        return fused
+
+    def _full_document_context(self, syllabus_id: int) -> List[Dict[str, Any]]:
+        full_content = self.get_full_syllabus_content(syllabus_id)
+        
+        if not full_content:
+            logger.warning(f"No content found for syllabus {syllabus_id}")
+            return []
+        
+        # Create a context with the full content
+        return [{
+            'text': full_content,
+            'similarity': 1.0
+        }]
@@ -0,0 +1,3 @@
+# benchmarks/__init__.py
+# Run individual benchmarks from the repository root, e.g.
+#   python -m benchmarks.bench_chunking
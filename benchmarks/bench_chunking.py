@@ -0,0 +1,105 @@
+# benchmarks/bench_chunking.py
+"""Micro-benchmark for text chunking on large synthetic documents.
+
+Compares TextChunker against the previous character-based chunker (which
+sliced the text and ran gc.collect() on every iteration) on 1 MB and 10 MB
+texts with normal and no punctuation.
+
+    python -m benchmarks.bench_chunking
+    python -m benchmarks.bench_chunking --sizes 1 10 --legacy-max-mb 1 --json results.json
+"""
+import argparse
+import gc
+import json
+import random
+import time
+from app.services.text_chunker import TextChunker
+
+WORDS = ("course grading homework midterm final exam office hours policy late "
+         "submission attendance lecture lab project quiz reading schedule week "
+         "instructor email prerequisite textbook").split()
+
+
+def synthetic_text(size_mb: float, punctuated: bool = True, seed: int = 0) -> str:
+    rng = random.Random(seed)
+    target = int(size_mb * 1024 * 1024)
+    parts = []
+    length = 0
+    while length < target:
+        sentence = " ".join(rng.choice(WORDS) for _ in range(rng.randint(6, 24)))
+        if punctuated:
+            sentence = sentence.capitalize() + "."
+        parts.append(sentence)
+        length += len(sentence) + 1
+    return " ".join(parts)[:target]
+
+
+def legacy_chunks(text: str, chunk_size: int = 1000, overlap: int = 100):
+    """The chunking loop PDFProcessor.create_text_chunks used before TextChunker."""
+    chunks = []
+    start = 0
+    text_length = len(text)
+    while start < text_length:
+        end = min(start + chunk_size, text_length)
+        chunk = text[start:end]
+        last_period_pos = max(chunk.rfind('. '), chunk.rfind('\n'))
+        if last_period_pos != -1:
+            end = start + last_period_pos + 2
+        current_chunk = text[start:end].strip()
+        if current_chunk:
+            chunks.append(current_chunk)
+        start = max(end - overlap, start + 1)
+        del chunk
+        gc.collect()
+    return chunks
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=float, nargs='+', default=[1, 10], help='Text sizes in MB')
+    parser.add_argument('--legacy-max-mb', type=float, default=1,
+                        help='Only run the legacy chunker up to this size (it is very slow)')
+    parser.add_argument('--json', help='Write results to this file')
+    args = parser.parse_args()
+
+    chunker = TextChunker()
+    results = []
+    print(f"{'size':>6} {'text':<12} {'chunker':<12} {'seconds':>9} {'MB/s':>8} {'chunks':>8}")
+    for size_mb in args.sizes:
+        for punctuated in (True, False):
+            text = synthetic_text(size_mb, punctuated)
+            label = 'punctuated' if punctuated else 'plain'
+
+            runs = [('token', chunker.chunk_offsets)]
+            if size_mb <= args.legacy_max_mb:
+                runs.append(('legacy', legacy_chunks))
+
+            for name, function in runs:
+                seconds, chunks = timed(function, text)
+                results.append({
+                    'size_mb': size_mb,
+                    'text': label,
+                    'chunker': name,
+                    'seconds': round(seconds, 4),
+                    'mb_per_second': round(size_mb / seconds, 2),
+                    'chunks': len(chunks)
+                })
+                print(f"{size_mb:>6g} {label:<12} {name:<12} {seconds:>9.3f} "
+                      f"{size_mb / seconds:>8.2f} {len(chunks):>8}")
+
+    if args.json:
+        with open(args.json, 'w') as file:
+            json.dump({'tokenizer': 'tiktoken' if chunker.encoding else 'approximate',
+                       'chunk_size': chunker.chunk_size,
+                       'overlap': chunker.overlap,
+                       'results': results}, file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+# benchmarks/bench_embedding.py
+"""Benchmark embedding throughput: fixed batches in document order vs. length buckets.
+
+Chunks a synthetic syllabus corpus with the production chunker, then embeds
+it twice with the configured sentence transformer: once the old way (four
+chunks per ``encode`` call, in document order) and once through
+BucketedEncoder. Reports chunks per second for each, to tune
+EMBEDDING_BATCH_SIZE and MAX_BATCH_SIZE_EMBEDDINGS on the target host.
+
+    python -m benchmarks.bench_embedding
+    python -m benchmarks.bench_embedding --pages 50 --batch-sizes 8 16 32 --json results.json
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+import numpy as np
+from app.config import Config
+from app.services.batch_encoder import BucketedEncoder
+from app.services.pdf_service import PDFProcessor
+from benchmarks.corpus import write_syllabus_pdf
+
+
+def corpus_chunks(pages: int):
+    processor = PDFProcessor()
+    with tempfile.TemporaryDirectory() as directory:
+        path = write_syllabus_pdf(os.path.join(directory, 'syllabus.pdf'), pages)
+        # Varied chunk sizes, as a real mix of syllabi would have
+        chunks = []
+        for chunk_size in (40, 120, 200):
+            chunks.extend(chunk['text'] for chunk in processor.iter_chunks(
+                processor.iter_pages(path), chunk_size=chunk_size, overlap=chunk_size // 10
+            ))
+    return chunks
+
+
+def fixed_batches(model, chunks, batch_size=4):
+    """The loop generate_embeddings used before length bucketing."""
+    return np.vstack([
+        model.encode(chunks[i:i + batch_size], convert_to_numpy=True, show_progress_bar=False)
+        for i in range(0, len(chunks), batch_size)
+    ])
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pages', type=int, default=20, help='Pages of synthetic syllabus to embed')
+    parser.add_argument('--model', default=Config.EMBEDDING_MODEL_NAME)
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[Config.EMBEDDING_BATCH_SIZE],
+                        help='EMBEDDING_BATCH_SIZE values to try')
+    parser.add_argument('--max-batch-size', type=int, default=Config.MAX_BATCH_SIZE_EMBEDDINGS)
+    parser.add_argument('--json', help='Write results to this file')
+    args = parser.parse_args()
+
+    import sentence_transformers
+    model = sentence_transformers.SentenceTransformer(args.model)
+    chunks = corpus_chunks(args.pages)
+    model.encode(chunks[:8], show_progress_bar=False)  # Warm up kernels
+
+    results = []
+    print(f"{len(chunks)} chunks, model {args.model}")
+    print(f"{'strategy':<24} {'seconds':>9} {'chunks/s':>9} {'batches':>8} {'padding eff.':>13}")
+
+    seconds, baseline = timed(fixed_batches, model, chunks)
+    results.append({'strategy': 'fixed-4', 'seconds': round(seconds, 3),
+                    'chunks_per_second': round(len(chunks) / seconds, 1)})
+    print(f"{'fixed-4 document order':<24} {seconds:>9.3f} {len(chunks) / seconds:>9.1f} "
+          f"{(len(chunks) + 3) // 4:>8} {'-':>13}")
+
+    for batch_size in args.batch_sizes:
+        encoder = BucketedEncoder(model, batch_size=batch_size, max_batch_size=args.max_batch_size)
+        seconds, embeddings = timed(encoder.encode, chunks)
+        if not np.allclose(embeddings, baseline, atol=1e-4):
+            raise AssertionError("Bucketed embeddings differ from the baseline")
+        stats = encoder.get_stats()
+        results.append({'strategy': f'bucketed-{batch_size}', 'seconds': round(seconds, 3),
+                        'chunks_per_second': round(len(chunks) / seconds, 1),
+                        'batches': stats['batches'], 'padding_efficiency': round(stats['padding_efficiency'], 3)})
+        print(f"{f'bucketed budget={batch_size}':<24} {seconds:>9.3f} {len(chunks) / seconds:>9.1f} "
+              f"{stats['batches']:>8} {stats['padding_efficiency']:>13.2f}")
+
+    if args.json:
+        with open(args.json, 'w') as file:
+            json.dump({'model': args.model, 'chunks': len(chunks), 'results': results}, file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+# benchmarks/bench_extraction.py
+"""Benchmark serial vs. process-pool PDF text extraction.
+
+Generates synthetic syllabus PDFs of several page counts and extracts each
+one serially and across a pool of worker processes, checking that both
+produce identical pages. The pool is warmed up before timing so worker
+spawn cost is not counted, matching a long-running server.
+
+    python -m benchmarks.bench_extraction
+    python -m benchmarks.bench_extraction --pages 200 800 --workers 2 4 --json results.json
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+from app.services.pdf_service import PDFProcessor
+from app.services.pdf_extraction import get_pool
+from benchmarks.corpus import write_syllabus_pdf
+
+
+def extract(processor, path, workers):
+    # threshold=1 forces the pool whenever workers > 1
+    start = time.perf_counter()
+    pages = list(processor.iter_pages(path, workers=workers, parallel_threshold=1))
+    return time.perf_counter() - start, pages
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pages', type=int, nargs='+', default=[200, 500], help='Page counts to generate')
+    parser.add_argument('--workers', type=int, nargs='+', default=[2, 4], help='Pool sizes to compare')
+    parser.add_argument('--json', help='Write results to this file')
+    args = parser.parse_args()
+
+    processor = PDFProcessor()
+    results = []
+    print(f"CPUs available: {os.cpu_count()}")
+    print(f"{'pages':>6} {'workers':>8} {'seconds':>9} {'pages/s':>9} {'speedup':>8}")
+    with tempfile.TemporaryDirectory() as directory:
+        for page_count in args.pages:
+            path = write_syllabus_pdf(os.path.join(directory, f'syllabus_{page_count}.pdf'), page_count)
+            serial_seconds, serial_pages = extract(processor, path, 1)
+            runs = [(1, serial_seconds)]
+
+            for workers in args.workers:
+                get_pool(workers).submit(int).result()  # Spawn workers before timing
+                seconds, pages = extract(processor, path, workers)
+                if pages != serial_pages:
+                    raise AssertionError(f"Parallel extraction with {workers} workers differs from serial")
+                runs.append((workers, seconds))
+
+            for workers, seconds in runs:
+                results.append({
+                    'pages': page_count,
+                    'workers': workers,
+                    'seconds': round(seconds, 4),
+                    'pages_per_second': round(page_count / seconds, 1),
+                    'speedup': round(serial_seconds / seconds, 2)
+                })
+                print(f"{page_count:>6} {workers:>8} {seconds:>9.3f} {page_count / seconds:>9.1f} "
+                      f"{serial_seconds / seconds:>8.2f}")
+
+    if args.json:
+        with open(args.json, 'w') as file:
+            json.dump({'cpu_count': os.cpu_count(), 'results': results}, file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
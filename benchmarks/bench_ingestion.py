@@ -0,0 +1,206 @@
+# benchmarks/bench_ingestion.py
+"""Stage-by-stage ingestion benchmark on synthetic syllabus PDFs.
+
+Builds syllabus-like PDFs (10, 100 and 1000 pages by default, at two
+punctuation densities) and times each ingestion stage on its own:
+extract_text_from_pdf, create_text_chunks, generate_embeddings and
+store_vectors. Every stage records wall time, CPU time and peak RSS, and
+results are written as JSON so runs can be compared across commits.
+
+    python -m benchmarks.bench_ingestion --json results/$(git rev-parse --short HEAD).json
+    python -m benchmarks.bench_ingestion --pages 10 100 --backend hashing
+
+With ``--baseline`` the run is compared against an earlier JSON file and
+the process exits with status 1 if any stage's wall time grew by more than
+``--threshold`` (a fraction; stages faster than ``--min-seconds`` in the
+baseline are ignored as noise):
+
+    python -m benchmarks.bench_ingestion --baseline results/main.json --threshold 0.2
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+import psutil
+from app.config import Config
+from app.extensions import model_registry
+from app.services.pdf_service import PDFProcessor
+from benchmarks.corpus import write_syllabus_pdf
+
+STAGES = ('extract_text_from_pdf', 'create_text_chunks', 'generate_embeddings', 'store_vectors')
+
+
+class RssSampler:
+    """Samples process RSS in a background thread and keeps the peak."""
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.process = psutil.Process()
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def __enter__(self):
+        self.peak = self.process.memory_info().rss
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, self.process.memory_info().rss)
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, self.process.memory_info().rss)
+
+
+def measure(function, *args):
+    """Run ``function`` and return (result, wall, cpu, peak RSS MB, RSS growth MB)."""
+    rss_before = psutil.Process().memory_info().rss
+    with RssSampler() as sampler:
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        result = function(*args)
+        wall = time.perf_counter() - wall_start
+        cpu = time.process_time() - cpu_start
+    return result, wall, cpu, sampler.peak / (1024 * 1024), (sampler.peak - rss_before) / (1024 * 1024)
+
+
+def run_case(processor, path, pages, punctuation_density, syllabus_id):
+    """Time each stage for one generated PDF and return one result per stage."""
+    results = []
+    value = path
+    stage_functions = {
+        'extract_text_from_pdf': processor.extract_text_from_pdf,
+        'create_text_chunks': processor.create_text_chunks,
+        'generate_embeddings': lambda chunks: (chunks, processor.generate_embeddings(chunks)),
+        'store_vectors': lambda pair: processor.store_vectors(syllabus_id, pair[0], pair[1], incremental=False)
+    }
+    for stage in STAGES:
+        value, wall, cpu, peak_rss_mb, rss_growth_mb = measure(stage_functions[stage], value)
+        results.append({
+            'pages': pages,
+            'punctuation_density': punctuation_density,
+            'stage': stage,
+            'wall_time': round(wall, 4),
+            'cpu_time': round(cpu, 4),
+            'peak_rss_mb': round(peak_rss_mb, 1),
+            'rss_growth_mb': round(rss_growth_mb, 1)
+        })
+        print(f"{pages:>6} {punctuation_density:>6} {stage:<24} {wall:>9.3f} {cpu:>9.3f} "
+              f"{peak_rss_mb:>9.1f} {rss_growth_mb:>+8.1f}")
+    return results
+
+
+def case_key(result):
+    return result['pages'], result['punctuation_density'], result['stage']
+
+
+def compare(results, baseline_results, threshold, min_seconds=0.05):
+    """Return the stages whose wall time regressed beyond ``threshold``."""
+    baseline = {case_key(result): result for result in baseline_results}
+    regressions = []
+    for result in results:
+        previous = baseline.get(case_key(result))
+        if previous is None or previous['wall_time'] < min_seconds:
+            continue
+        ratio = result['wall_time'] / previous['wall_time']
+        if ratio > 1 + threshold:
+            regressions.append({
+                'pages': result['pages'],
+                'punctuation_density': result['punctuation_density'],
+                'stage': result['stage'],
+                'baseline_wall_time': previous['wall_time'],
+                'wall_time': result['wall_time'],
+                'ratio': round(ratio, 2)
+            })
+    return regressions
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], stderr=subprocess.DEVNULL,
+                                       text=True).strip()
+    except Exception:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pages', type=int, nargs='+', default=[10, 100, 1000], help='Page counts to generate')
+    parser.add_argument('--punctuation', type=float, nargs='+', default=[0.9, 0.2],
+                        help='Fraction of sentences that end with a period')
+    parser.add_argument('--backend', default=Config.EMBEDDING_BACKEND,
+                        help='Embedding backend; "hashing" runs without model files')
+    parser.add_argument('--json', help='Write results to this file')
+    parser.add_argument('--baseline', help='Compare against results from an earlier run')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='Allowed fractional wall-time increase per stage in --baseline mode')
+    parser.add_argument('--min-seconds', type=float, default=0.05,
+                        help='Ignore stages faster than this in the baseline')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        # Keep benchmark vectors and cached embeddings out of the real stores
+        model_registry.persist_dir = os.path.join(directory, 'chroma')
+        model_registry.embedding_cache_enabled = False
+        model_registry.backend_name = args.backend
+        model_registry.backend_options = {'precision': Config.EMBEDDING_PRECISION,
+                                          'dimension': Config.EMBEDDING_DIMENSION}
+
+        processor = PDFProcessor()
+        results = []
+        print(f"{'pages':>6} {'punct':>6} {'stage':<24} {'wall s':>9} {'cpu s':>9} {'peak MB':>9} {'+MB':>8}")
+        syllabus_id = 0
+        for pages in args.pages:
+            for punctuation_density in args.punctuation:
+                path = write_syllabus_pdf(os.path.join(directory, f'syllabus_{pages}_{punctuation_density}.pdf'),
+                                          pages, punctuation_density)
+                syllabus_id += 1
+                results.extend(run_case(processor, path, pages, punctuation_density, syllabus_id))
+                os.remove(path)
+        model_registry.reset()
+
+    report = {
+        'commit': git_commit(),
+        'timestamp': datetime.utcnow().isoformat(),
+        'python': platform.python_version(),
+        'cpu_count': os.cpu_count(),
+        'backend': args.backend,
+        'model': Config.EMBEDDING_MODEL_NAME,
+        'config': {
+            'TEXT_CHUNK_SIZE': Config.TEXT_CHUNK_SIZE,
+            'TEXT_CHUNK_OVERLAP': Config.TEXT_CHUNK_OVERLAP,
+            'EMBEDDING_BATCH_SIZE': Config.EMBEDDING_BATCH_SIZE,
+            'MAX_BATCH_SIZE_EMBEDDINGS': Config.MAX_BATCH_SIZE_EMBEDDINGS
+        },
+        'results': results
+    }
+    if args.json:
+        with open(args.json, 'w') as file:
+            json.dump(report, file, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+        regressions = compare(results, baseline['results'], args.threshold, args.min_seconds)
+        for regression in regressions:
+            print(f"REGRESSION {regression['stage']} at {regression['pages']} pages "
+                  f"(punctuation {regression['punctuation_density']}): "
+                  f"{regression['baseline_wall_time']:.3f}s -> {regression['wall_time']:.3f}s "
+                  f"(x{regression['ratio']})")
+        if regressions:
+            sys.exit(1)
+        print(f"No stage slower than baseline {baseline.get('commit')} by more than {args.threshold:.0%}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,127 @@
+# benchmarks/bench_retrieval.py
+"""Compare full-document prompts with top-k retrieval and assembled context.
+
+Indexes synthetic syllabi of several sizes, then answers a fixed set of
+student questions several ways: the old behavior (the whole syllabus in the
+prompt), top-k retrieval by vector, BM25 and hybrid (RRF-fused) ranking,
+and hybrid candidates fitted to the token budget by ContextAssembler. Reports prompt tokens and context latency per
+question and, with ``--llm``, end-to-end latency including the chat
+completion (needs OPENAI_API_KEY).
+
+    python -m benchmarks.bench_retrieval --backend hashing
+    python -m benchmarks.bench_retrieval --pages 5 50 --top-k 4 --llm --json results.json
+"""
+import argparse
+import json
+import os
+import statistics
+import tempfile
+import time
+from app.config import Config
+from app.extensions import model_registry
+from app.services.chat_service import ChatService
+from app.services.pdf_service import PDFProcessor
+from app.services.text_chunker import TextChunker
+from app.services.vector_store_service import VectorStoreService
+from benchmarks.corpus import write_syllabus_pdf
+
+QUESTIONS = [
+    "When are office hours?",
+    "How much is the midterm worth?",
+    "What is the late policy for homework?",
+    "Which chapter do we read in week 3?",
+    "Can I collaborate on the project?",
+]
+
+
+def index_syllabus(processor, syllabus_id, path):
+    chunks = processor.create_text_chunks(processor.extract_text_from_pdf(path))
+    processor.store_vectors(syllabus_id, chunks, processor.generate_embeddings(chunks), incremental=False)
+    return len(chunks)
+
+
+MODES = ('full', 'vector', 'lexical', 'hybrid', 'assembled')
+
+
+def ask(chat_service, syllabus_id, question, mode, use_llm):
+    start = time.perf_counter()
+    if mode == 'full':
+        context = chat_service.vector_store._full_document_context(syllabus_id)
+    elif mode in ('vector', 'lexical', 'hybrid'):
+        vector_store = chat_service.vector_store
+        context = VectorStoreService(top_k=vector_store.top_k, retrieval_mode=mode).get_relevant_context(
+            syllabus_id, question
+        )
+    else:
+        candidates = chat_service.vector_store.get_relevant_context(
+            syllabus_id, question, num_results=Config.CONTEXT_CANDIDATES, include_embeddings=True
+        )
+        context, _ = chat_service.context_assembler.assemble(candidates)
+    context_seconds = time.perf_counter() - start
+    messages = chat_service.build_messages(context, question)
+
+    if use_llm:
+        import openai
+        openai.OpenAI().chat.completions.create(
+            model="gpt-3.5-turbo", messages=messages, temperature=0.7, max_tokens=500
+        )
+    return context_seconds, time.perf_counter() - start, messages
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pages', type=int, nargs='+', default=[2, 10, 50, 200])
+    parser.add_argument('--top-k', type=int, default=Config.RETRIEVAL_TOP_K)
+    parser.add_argument('--backend', default=Config.EMBEDDING_BACKEND)
+    parser.add_argument('--llm', action='store_true', help='Also call the chat completion API')
+    parser.add_argument('--json', help='Write results to this file')
+    args = parser.parse_args()
+
+    tokenizer = TextChunker()
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        model_registry.persist_dir = os.path.join(directory, 'chroma')
+        model_registry.embedding_cache_enabled = False
+        model_registry.backend_name = args.backend
+        model_registry.backend_options = {'precision': Config.EMBEDDING_PRECISION,
+                                          'dimension': Config.EMBEDDING_DIMENSION}
+        processor = PDFProcessor()
+        model_registry.lexical_index_dir = os.path.join(directory, 'lexical')
+        chat_service = ChatService(VectorStoreService(top_k=args.top_k, retrieval_mode='hybrid'))
+
+        print(f"{'pages':>6} {'chunks':>7} {'mode':<10} {'prompt tokens':>14} {'context ms':>11} {'total ms':>9}")
+        for syllabus_id, pages in enumerate(args.pages, start=1):
+            path = write_syllabus_pdf(os.path.join(directory, f'syllabus_{pages}.pdf'), pages)
+            chunk_count = index_syllabus(processor, syllabus_id, path)
+
+            for mode in MODES:
+                prompt_tokens, context_times, total_times = [], [], []
+                for question in QUESTIONS:
+                    context_seconds, total_seconds, messages = ask(
+                        chat_service, syllabus_id, question, mode, args.llm
+                    )
+                    prompt_tokens.append(sum(tokenizer.count_tokens(message['content']) for message in messages))
+                    context_times.append(context_seconds * 1000)
+                    total_times.append(total_seconds * 1000)
+
+                row = {
+                    'pages': pages,
+                    'chunks': chunk_count,
+                    'mode': mode,
+                    'mean_prompt_tokens': round(statistics.mean(prompt_tokens)),
+                    'median_context_ms': round(statistics.median(context_times), 2),
+                    'median_total_ms': round(statistics.median(total_times), 2)
+                }
+                results.append(row)
+                print(f"{pages:>6} {chunk_count:>7} {mode:<10} {row['mean_prompt_tokens']:>14} "
+                      f"{row['median_context_ms']:>11.2f} {row['median_total_ms']:>9.2f}")
+        model_registry.reset()
+
+    if args.json:
+        with open(args.json, 'w') as file:
+            json.dump({'backend': args.backend, 'top_k': args.top_k, 'llm': args.llm,
+                       'results': results}, file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+# benchmarks/bench_search.py
+"""Benchmark cross-syllabus search latency as the catalogue grows.
+
+Fills a GlobalSearchIndex with random syllabi (one document vector plus
+GLOBAL_SEARCH_SECTIONS section vectors each, spread over 40 departments)
+up to each requested size, then reports upsert cost, the cold reload a new
+worker process pays, and p50/p95 search latency for the first and a deep
+result page, with and without a department filter.
+
+    python -m benchmarks.bench_search
+    python -m benchmarks.bench_search --syllabi 1000 50000 --dimension 384 --json results.json
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+import numpy as np
+from app.config import Config
+from app.services.global_search_index import GlobalSearchIndex
+
+DEPARTMENTS = [f"DEPT{i}" for i in range(40)]
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def timed_searches(index, queries, **kwargs):
+    times = []
+    for query in queries:
+        start = time.perf_counter()
+        index.search(query, **kwargs)
+        times.append((time.perf_counter() - start) * 1000)
+    return round(percentile(times, 0.5), 3), round(percentile(times, 0.95), 3)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--syllabi', type=int, nargs='+', default=[1000, 10000, 50000])
+    parser.add_argument('--dimension', type=int, default=Config.EMBEDDING_DIMENSION)
+    parser.add_argument('--sections', type=int, default=Config.GLOBAL_SEARCH_SECTIONS)
+    parser.add_argument('--queries', type=int, default=100)
+    parser.add_argument('--json', help='Write results to this file')
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    rows = args.sections + 1
+    results = []
+    print(f"{'syllabi':>8} {'upsert ms':>10} {'reload s':>9} {'p50 ms':>8} {'p95 ms':>8} "
+          f"{'dept p50':>9} {'page 50 p50':>12}")
+    with tempfile.TemporaryDirectory() as directory:
+        index = GlobalSearchIndex(directory, max_sections=args.sections)
+        stored = 0
+        for syllabi in sorted(args.syllabi):
+            start = time.perf_counter()
+            for syllabus_id in range(stored, syllabi):
+                vectors = rng.standard_normal((rows, args.dimension)).astype(np.float32)
+                vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+                index.upsert(syllabus_id, DEPARTMENTS[syllabus_id % len(DEPARTMENTS)], vectors,
+                             np.arange(rows, dtype=np.int32))
+            upsert_ms = (time.perf_counter() - start) * 1000 / max(1, syllabi - stored)
+            stored = syllabi
+
+            start = time.perf_counter()
+            len(GlobalSearchIndex(directory, max_sections=args.sections))
+            reload_seconds = time.perf_counter() - start
+
+            queries = rng.standard_normal((args.queries, args.dimension)).astype(np.float32)
+            p50, p95 = timed_searches(index, queries, min_score=-1.0)
+            department_p50, _ = timed_searches(index, queries, department=DEPARTMENTS[0], min_score=-1.0)
+            deep_p50, _ = timed_searches(index, queries, page=50, per_page=10, min_score=-1.0)
+
+            row = {'syllabi': syllabi, 'upsert_ms': round(upsert_ms, 3), 'reload_seconds': round(reload_seconds, 2),
+                   'search_p50_ms': p50, 'search_p95_ms': p95, 'department_p50_ms': department_p50,
+                   'page_50_p50_ms': deep_p50, 'memory_mb': round(index.get_stats()['memory_mb'], 1)}
+            results.append(row)
+            print(f"{syllabi:>8} {upsert_ms:>10.3f} {reload_seconds:>9.2f} {p50:>8.2f} {p95:>8.2f} "
+                  f"{department_p50:>9.2f} {deep_p50:>12.2f}")
+
+    if args.json:
+        with open(args.json, 'w') as file:
+            json.dump({'dimension': args.dimension, 'sections': args.sections, 'results': results}, file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,126 @@
+# benchmarks/bench_vector_store.py
+"""Compare Chroma with the memory-mapped NumPy vector store.
+
+Grows one store per backend to 1, 10, 100, 1000 and 10000 syllabi (random
+unit vectors, ``--chunks`` per syllabus), and at each size measures:
+
+- open: a fresh client opening a random syllabus and answering one query,
+  i.e. the cost paid by a new worker process or after eviction (Chroma
+  shares one system per path within a process, so its figure understates
+  a truly cold open);
+- query: median and p95 latency of top-k queries against random syllabi
+  through a warm client;
+- disk: bytes on disk for the whole store.
+
+    python -m benchmarks.bench_vector_store
+    python -m benchmarks.bench_vector_store --syllabi 1 10 100 --backends numpy --dtype float16 --json results.json
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+import chromadb
+import numpy as np
+from app.config import Config
+from app.services.numpy_vector_store import NumpyVectorClient
+
+
+def open_client(backend, path, dtype):
+    if backend == 'numpy':
+        return NumpyVectorClient(path, dtype=dtype)
+    return chromadb.PersistentClient(path=path)
+
+
+def add_syllabi(client, first, last, chunks, dimension, rng):
+    for syllabus_id in range(first, last):
+        collection = client.create_collection(name=f"syllabus_{syllabus_id}", metadata={"hnsw:space": "cosine"})
+        vectors = rng.standard_normal((chunks, dimension)).astype(np.float32)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        collection.upsert(
+            ids=[f"chunk_{syllabus_id}_{i}" for i in range(chunks)],
+            embeddings=vectors,
+            documents=[f"Syllabus {syllabus_id} chunk {i}" for i in range(chunks)],
+            metadatas=[{'position': i} for i in range(chunks)]
+        )
+
+
+def query(client, syllabus_id, vector, top_k):
+    collection = client.get_collection(name=f"syllabus_{syllabus_id}")
+    return collection.query(query_embeddings=[vector.tolist()], n_results=top_k,
+                            include=['documents', 'metadatas', 'distances'])
+
+
+def disk_bytes(path):
+    return sum(os.path.getsize(os.path.join(root, name))
+               for root, _, names in os.walk(path) for name in names)
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--syllabi', type=int, nargs='+', default=[1, 10, 100, 1000, 10000])
+    parser.add_argument('--chunks', type=int, default=200, help='Chunks per syllabus')
+    parser.add_argument('--dimension', type=int, default=Config.EMBEDDING_DIMENSION)
+    parser.add_argument('--backends', nargs='+', default=['chroma', 'numpy'], choices=['chroma', 'numpy'])
+    parser.add_argument('--dtype', default=Config.NUMPY_VECTOR_STORE_DTYPE, choices=['float32', 'float16'])
+    parser.add_argument('--top-k', type=int, default=Config.CONTEXT_CANDIDATES)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--opens', type=int, default=20)
+    parser.add_argument('--json', help='Write results to this file')
+    args = parser.parse_args()
+
+    results = []
+    print(f"{'backend':<8} {'syllabi':>8} {'open ms':>9} {'query p50 ms':>13} {'query p95 ms':>13} {'disk MB':>9}")
+    with tempfile.TemporaryDirectory() as directory:
+        for backend in args.backends:
+            path = os.path.join(directory, backend)
+            rng = np.random.default_rng(0)
+            client = open_client(backend, path, args.dtype)
+            stored = 0
+            for syllabi in sorted(args.syllabi):
+                add_syllabi(client, stored, syllabi, args.chunks, args.dimension, rng)
+                stored = syllabi
+
+                queries = rng.standard_normal((args.queries, args.dimension)).astype(np.float32)
+                targets = [random.Random(i).randrange(syllabi) for i in range(args.queries)]
+
+                open_times = []
+                for i in range(args.opens):
+                    start = time.perf_counter()
+                    query(open_client(backend, path, args.dtype), targets[i % len(targets)],
+                          queries[i % len(queries)], args.top_k)
+                    open_times.append((time.perf_counter() - start) * 1000)
+
+                query_times = []
+                for vector, syllabus_id in zip(queries, targets):
+                    start = time.perf_counter()
+                    query(client, syllabus_id, vector, args.top_k)
+                    query_times.append((time.perf_counter() - start) * 1000)
+
+                row = {
+                    'backend': backend,
+                    'syllabi': syllabi,
+                    'median_open_ms': round(statistics.median(open_times), 3),
+                    'query_p50_ms': round(percentile(query_times, 0.5), 3),
+                    'query_p95_ms': round(percentile(query_times, 0.95), 3),
+                    'disk_mb': round(disk_bytes(path) / (1024 * 1024), 1)
+                }
+                results.append(row)
+                print(f"{backend:<8} {syllabi:>8} {row['median_open_ms']:>9.2f} {row['query_p50_ms']:>13.3f} "
+                      f"{row['query_p95_ms']:>13.3f} {row['disk_mb']:>9.1f}")
+
+    if args.json:
+        with open(args.json, 'w') as file:
+            json.dump({'chunks': args.chunks, 'dimension': args.dimension, 'dtype': args.dtype,
+                       'top_k': args.top_k, 'results': results}, file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
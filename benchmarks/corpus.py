@@ -0,0 +1,105 @@
+# benchmarks/corpus.py
+"""Synthetic syllabus-like PDFs for benchmarks.
+
+Writes plain PDF 1.4 files by hand (Helvetica text, one content stream per
+page) so benchmarks need nothing beyond the app's own dependencies.
+"""
+import random
+
+SECTIONS = [
+    ("Course Description", "This course covers {topic} with an emphasis on {topic2} and hands-on {activity}"),
+    ("Instructor and Office Hours", "Office hours are held on {day} from {hour} to {hour2} in room {room}"),
+    ("Grading", "Homework is worth {pct} percent of the final grade and the {exam} is worth {pct2} percent"),
+    ("Schedule", "Week {week} covers {topic} and the reading is chapter {chapter} of the textbook"),
+    ("Late Policy", "Late {activity} submissions lose {pct} percent per day and are not accepted after {days} days"),
+    ("Academic Integrity", "Collaboration on {activity} is allowed but every student must write up their own {exam} answers"),
+]
+TOPICS = ["pipelining", "cache hierarchies", "branch prediction", "virtual memory", "instruction sets",
+          "out-of-order execution", "multicore coherence", "memory consistency", "vector processors"]
+ACTIVITIES = ["lab", "homework", "project", "quiz", "reading"]
+EXAMS = ["midterm", "final exam", "quiz"]
+DAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday"]
+
+PAGE_WIDTH = 612
+PAGE_HEIGHT = 792
+LINES_PER_PAGE = 48
+CHARS_PER_LINE = 95
+
+
+def sentence(rng: random.Random, template: str) -> str:
+    return template.format(
+        topic=rng.choice(TOPICS), topic2=rng.choice(TOPICS), activity=rng.choice(ACTIVITIES),
+        exam=rng.choice(EXAMS), day=rng.choice(DAYS), hour=f"{rng.randint(9, 12)}am",
+        hour2=f"{rng.randint(1, 5)}pm", room=rng.randint(100, 999), pct=rng.randint(5, 40),
+        pct2=rng.randint(10, 50), week=rng.randint(1, 15), chapter=rng.randint(1, 12),
+        days=rng.randint(2, 7)
+    )
+
+
+def page_lines(rng: random.Random, page_number: int, punctuation_density: float):
+    """Lines of one page; ``punctuation_density`` is the chance a sentence ends with a period."""
+    heading, template = SECTIONS[(page_number - 1) % len(SECTIONS)]
+    lines = [f"{heading}", ""]
+    current = ""
+    while len(lines) < LINES_PER_PAGE:
+        text = sentence(rng, rng.choice(SECTIONS)[1])
+        text += ". " if rng.random() < punctuation_density else " "
+        for word in text.split(" "):
+            if len(current) + len(word) + 1 > CHARS_PER_LINE:
+                lines.append(current)
+                current = ""
+                if len(lines) >= LINES_PER_PAGE:
+                    break
+            current = f"{current} {word}" if current else word
+    lines.append(f"Page {page_number}")
+    return lines
+
+
+def escape(text: str) -> str:
+    return text.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+
+
+def write_syllabus_pdf(path: str, pages: int, punctuation_density: float = 0.9, seed: int = 0) -> str:
+    """Write a ``pages``-page syllabus-like PDF to ``path`` and return the path."""
+    rng = random.Random(seed)
+    objects = []  # Object bodies; object number is index + 1
+
+    def add(body: bytes) -> int:
+        objects.append(body)
+        return len(objects)
+
+    catalog = add(b"")  # Filled in once the page tree exists
+    pages_root = add(b"")
+    font = add(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+
+    page_ids = []
+    for page_number in range(1, pages + 1):
+        commands = ["BT", "/F1 10 Tf", "14 TL", f"50 {PAGE_HEIGHT - 50} Td"]
+        for line in page_lines(rng, page_number, punctuation_density):
+            commands.append(f"({escape(line)}) Tj T*")
+        commands.append("ET")
+        stream = "\n".join(commands).encode('latin-1')
+        content = add(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        page_ids.append(add(
+            b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 %d %d] "
+            b"/Resources << /Font << /F1 %d 0 R >> >> /Contents %d 0 R >>"
+            % (pages_root, PAGE_WIDTH, PAGE_HEIGHT, font, content)
+        ))
+
+    kids = b" ".join(b"%d 0 R" % page_id for page_id in page_ids)
+    objects[pages_root - 1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, len(page_ids))
+    objects[catalog - 1] = b"<< /Type /Catalog /Pages %d 0 R >>" % pages_root
+
+    with open(path, 'wb') as file:
+        file.write(b"%PDF-1.4\n")
+        offsets = []
+        for number, body in enumerate(objects, start=1):
+            offsets.append(file.tell())
+            file.write(b"%d 0 obj\n%s\nendobj\n" % (number, body))
+        xref_offset = file.tell()
+        file.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+        for offset in offsets:
+            file.write(b"%010d 00000 n \n" % offset)
+        file.write(b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n"
+                   % (len(objects) + 1, catalog, xref_offset))
+    return path
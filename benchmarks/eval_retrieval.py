@@ -0,0 +1,220 @@
+# benchmarks/eval_retrieval.py
+"""Evaluate retrieval quality against latency over a grid of chunking and retrieval settings.
+
+Takes syllabi with questions labeled by the passage that answers them, and
+for every embedding model, chunk size and overlap ingests them through the
+production streaming pipeline into a fresh vector store and BM25 index.
+Each retrieval mode and top-k is then scored on every question:
+
+- recall@k: fraction of questions with a relevant chunk among the k returned;
+- MRR: mean reciprocal rank of the first relevant chunk (0 when none is returned);
+- query p50/p95: latency of ``get_relevant_context``, with the query
+  embedding cache and batcher disabled so every query runs the model.
+
+A chunk is relevant when it covers at least ``--min-overlap`` of the labeled
+passage. Index size is the bytes on disk of the vector store plus the BM25
+index, and ingestion time covers chunking, embedding and storing every
+syllabus (the model is loaded beforehand).
+
+The dataset is a JSON file ``{"syllabi": [{"pdf": path, "questions": [...]}]}``
+where each syllabus gives either ``pdf`` (relative to the dataset file) or
+its ``pages`` as text, and each question is ``{"question", "passage"}`` with
+the passage quoted verbatim from the syllabus. ``benchmarks/data/retrieval_eval.json``
+is a small hand-labeled example and the default.
+
+    python -m benchmarks.eval_retrieval --models hashing
+    python -m benchmarks.eval_retrieval --models sentence-transformers sentence-transformers:all-MiniLM-L6-v2 \\
+        --chunk-sizes 100 200 400 --overlaps 0 20 --top-k 1 3 5 --json results.json
+"""
+import argparse
+import json
+import os
+import re
+import tempfile
+import time
+from typing import Any, Dict, List, Optional, Tuple
+from app.config import Config
+from app.extensions import model_registry
+from app.services.pdf_service import ChunkDiff, PDFProcessor
+from app.services.vector_store_service import VectorStoreService
+
+DEFAULT_DATASET = os.path.join(os.path.dirname(__file__), 'data', 'retrieval_eval.json')
+MODES = ('vector', 'lexical', 'hybrid')
+
+
+def load_dataset(path: str, processor: PDFProcessor) -> List[Dict[str, Any]]:
+    """Read the dataset, extracting PDF pages and locating each labeled passage."""
+    with open(path) as file:
+        dataset = json.load(file)
+    syllabi = []
+    for number, syllabus in enumerate(dataset['syllabi'], start=1):
+        if 'pdf' in syllabus:
+            pages = list(processor.iter_pages(os.path.join(os.path.dirname(path), syllabus['pdf'])))
+        else:
+            pages = [(page, " ".join(text.split())) for page, text in enumerate(syllabus['pages'], start=1)]
+        # Joined the way iter_chunks numbers document offsets
+        document = " ".join(text for _, text in pages)
+        questions = []
+        for question in syllabus['questions']:
+            span = locate_passage(document, question['passage'])
+            if span is None:
+                raise ValueError(f"Passage for {question['question']!r} not found in syllabus {number}")
+            questions.append({'question': question['question'], 'span': span})
+        syllabi.append({'id': number, 'name': syllabus.get('name', f"syllabus {number}"),
+                        'pages': pages, 'questions': questions})
+    return syllabi
+
+
+def locate_passage(document: str, passage: str) -> Optional[Tuple[int, int]]:
+    """Return the (start, end) offsets of a passage, ignoring case and whitespace differences."""
+    pattern = r'\s+'.join(re.escape(word) for word in passage.split())
+    match = re.search(pattern, document, re.IGNORECASE)
+    return match.span() if match else None
+
+
+def is_relevant(item: Dict[str, Any], span: Tuple[int, int], min_overlap: float) -> bool:
+    start, end = item.get('start'), item.get('end')
+    if start is None or end is None:
+        return False
+    covered = min(end, span[1]) - max(start, span[0])
+    return covered >= min_overlap * (span[1] - span[0])
+
+
+def score(rankings: List[List[Dict[str, Any]]], spans: List[Tuple[int, int]],
+          min_overlap: float) -> Dict[str, float]:
+    """Recall and MRR of retrieved chunk lists against the labeled passage spans."""
+    hits, reciprocal_ranks = 0, 0.0
+    for items, span in zip(rankings, spans):
+        for rank, item in enumerate(items, start=1):
+            if is_relevant(item, span, min_overlap):
+                hits += 1
+                reciprocal_ranks += 1 / rank
+                break
+    return {'recall': hits / len(spans), 'mrr': reciprocal_ranks / len(spans)}
+
+
+def ingest(processor: PDFProcessor, syllabus: Dict[str, Any], chunk_size: int, overlap: int) -> int:
+    """Index one syllabus the way process_pdf does, keeping chunk offsets."""
+    collection, existing = processor.open_collection(syllabus['id'], incremental=False)
+    diff = ChunkDiff(existing)
+    chunks = processor.iter_chunks(iter(syllabus['pages']), chunk_size=chunk_size, overlap=overlap)
+    batches = processor.iter_embedding_batches(diff.new_chunks(processor.assign_chunk_ids(chunks)))
+    for _ in processor.store_vector_batches(collection, batches):
+        pass
+    processor.apply_chunk_diff(collection, diff)
+    processor.update_lexical_index(syllabus['id'], collection, diff)
+    return len(diff.seen)
+
+
+def disk_bytes(*paths: str) -> int:
+    return sum(os.path.getsize(os.path.join(root, name))
+               for path in paths for root, _, names in os.walk(path) for name in names)
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def configure_registry(directory: str, model: str, vector_store: str):
+    backend_name, _, model_name = model.partition(':')
+    model_registry.reset()
+    model_registry.backend_name = backend_name
+    model_registry.model_name = model_name or Config.EMBEDDING_MODEL_NAME
+    model_registry.backend_options = {'precision': Config.EMBEDDING_PRECISION,
+                                      'dimension': Config.EMBEDDING_DIMENSION}
+    model_registry.vector_store_backend = vector_store
+    model_registry.persist_dir = os.path.join(directory, 'vectors')
+    model_registry.lexical_index_dir = os.path.join(directory, 'lexical')
+    model_registry.embedding_cache_enabled = False
+    # Every query should pay for its own embedding
+    model_registry.query_cache_size = 0
+    model_registry.query_batch_enabled = False
+
+
+def evaluate(syllabi, model, chunk_size, overlap, modes, top_ks, min_overlap, vector_store):
+    """Ingest every syllabus with one configuration and score each mode and top-k."""
+    rows = []
+    with tempfile.TemporaryDirectory() as directory:
+        configure_registry(directory, model, vector_store)
+        processor = PDFProcessor()
+        model_registry.get_model()
+
+        start = time.perf_counter()
+        chunks = sum(ingest(processor, syllabus, chunk_size, overlap) for syllabus in syllabi)
+        ingestion_seconds = time.perf_counter() - start
+        index_bytes = disk_bytes(model_registry.persist_dir, model_registry.lexical_index_dir)
+
+        questions = [(syllabus['id'], question) for syllabus in syllabi for question in syllabus['questions']]
+        spans = [question['span'] for _, question in questions]
+        for mode in modes:
+            for top_k in top_ks:
+                # Small syllabi must not short-circuit to the whole document
+                vector_store_service = VectorStoreService(top_k=top_k, full_document_max_chunks=0,
+                                                          retrieval_mode=mode)
+                rankings, latencies = [], []
+                for syllabus_id, question in questions:
+                    start = time.perf_counter()
+                    rankings.append(vector_store_service.get_relevant_context(
+                        syllabus_id, question['question'], include_embeddings=True
+                    ))
+                    latencies.append((time.perf_counter() - start) * 1000)
+                metrics = score(rankings, spans, min_overlap)
+                rows.append({
+                    'model': model,
+                    'chunk_size': chunk_size,
+                    'overlap': overlap,
+                    'mode': mode,
+                    'top_k': top_k,
+                    'recall': round(metrics['recall'], 3),
+                    'mrr': round(metrics['mrr'], 3),
+                    'chunks': chunks,
+                    'index_kb': round(index_bytes / 1024, 1),
+                    'ingestion_seconds': round(ingestion_seconds, 3),
+                    'query_p50_ms': round(percentile(latencies, 0.5), 3),
+                    'query_p95_ms': round(percentile(latencies, 0.95), 3)
+                })
+        model_registry.reset()
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--dataset', default=DEFAULT_DATASET)
+    parser.add_argument('--models', nargs='+', default=[Config.EMBEDDING_BACKEND],
+                        help='Embedding backends, optionally as backend:model_name')
+    parser.add_argument('--chunk-sizes', type=int, nargs='+', default=[50, 100, Config.TEXT_CHUNK_SIZE])
+    parser.add_argument('--overlaps', type=int, nargs='+', default=[0, Config.TEXT_CHUNK_OVERLAP])
+    parser.add_argument('--top-k', type=int, nargs='+', default=[1, 3, Config.RETRIEVAL_TOP_K])
+    parser.add_argument('--modes', nargs='+', default=list(MODES), choices=MODES)
+    parser.add_argument('--min-overlap', type=float, default=0.5,
+                        help='Fraction of the labeled passage a chunk must cover to count as relevant')
+    parser.add_argument('--vector-store', default=Config.VECTOR_STORE_BACKEND, choices=['chroma', 'numpy'])
+    parser.add_argument('--json', help='Write results to this file')
+    args = parser.parse_args()
+
+    syllabi = load_dataset(args.dataset, PDFProcessor())
+    print(f"{len(syllabi)} syllabi, {sum(len(syllabus['questions']) for syllabus in syllabi)} questions")
+    print(f"{'model':<24} {'chunk':>6} {'overlap':>8} {'mode':<8} {'k':>3} {'recall':>7} {'MRR':>6} "
+          f"{'chunks':>7} {'index KB':>9} {'ingest s':>9} {'p50 ms':>8} {'p95 ms':>8}")
+    results = []
+    for model in args.models:
+        for chunk_size in args.chunk_sizes:
+            for overlap in args.overlaps:
+                if overlap >= chunk_size:
+                    continue
+                for row in evaluate(syllabi, model, chunk_size, overlap, args.modes, args.top_k,
+                                    args.min_overlap, args.vector_store):
+                    results.append(row)
+                    print(f"{row['model']:<24} {chunk_size:>6} {overlap:>8} {row['mode']:<8} {row['top_k']:>3} "
+                          f"{row['recall']:>7.3f} {row['mrr']:>6.3f} {row['chunks']:>7} {row['index_kb']:>9.1f} "
+                          f"{row['ingestion_seconds']:>9.3f} {row['query_p50_ms']:>8.2f} {row['query_p95_ms']:>8.2f}")
+
+    if args.json:
+        with open(args.json, 'w') as file:
+            json.dump({'dataset': args.dataset, 'min_overlap': args.min_overlap,
+                       'vector_store': args.vector_store, 'results': results}, file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
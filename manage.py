@@ -1,6 +1,7 @@
 from app import create_app, db
 from app.models.user import User
 from flask_migrate import upgrade
+import sys
 
 app = create_app()
 
@@ -23,5 +24,20 @@ def init_db():
             db.session.commit()
             print("Admin user created successfully!")
 
+def rebuild_search_index():
+    """Index every active syllabus for cross-syllabus search, e.g. after upgrading."""
+    from app.extensions import model_registry
+    from app.models.syllabus import Syllabus
+    from app.services.pdf_service import PDFProcessor
+    with app.app_context():
+        processor = PDFProcessor()
+        for syllabus in Syllabus.query.filter(Syllabus.vector_store_id.isnot(None)):
+            collection = model_registry.get_chroma_client().get_collection(name=syllabus.vector_store_id)
+            processor.update_search_index(syllabus.id, syllabus.department, collection)
+            print(f"Indexed {syllabus.title}")
+
 if __name__ == '__main__':
-    init_db()
\ No newline at end of file
+    if sys.argv[1:] == ['rebuild-search-index']:
+        rebuild_search_index()
+    else:
+        init_db()
\ No newline at end of file
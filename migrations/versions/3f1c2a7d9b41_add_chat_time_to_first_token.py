@@ -0,0 +1,29 @@
+"""Add chats.time_to_first_token for streamed answers
+
+Revision ID: 3f1c2a7d9b41
+Revises: 
+Create Date: 2026-10-18 16:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f1c2a7d9b41'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # The app runs db.create_all() at startup, so a database created after
+    # this column was added already has it
+    columns = {column['name'] for column in sa.inspect(op.get_bind()).get_columns('chats')}
+    if 'time_to_first_token' not in columns:
+        op.add_column('chats', sa.Column('time_to_first_token', sa.Float(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('chats') as batch_op:
+        batch_op.drop_column('time_to_first_token')
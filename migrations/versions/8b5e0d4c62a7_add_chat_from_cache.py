@@ -0,0 +1,29 @@
+"""Add chats.from_cache for answers served from the answer cache
+
+Revision ID: 8b5e0d4c62a7
+Revises: 3f1c2a7d9b41
+Create Date: 2026-10-18 16:10:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8b5e0d4c62a7'
+down_revision = '3f1c2a7d9b41'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Skipped when db.create_all() already created the column
+    columns = {column['name'] for column in sa.inspect(op.get_bind()).get_columns('chats')}
+    if 'from_cache' not in columns:
+        # The server default fills existing rows, so analytics never sees NULL
+        op.add_column('chats', sa.Column('from_cache', sa.Boolean(), nullable=True, server_default=sa.false()))
+
+
+def downgrade():
+    with op.batch_alter_table('chats') as batch_op:
+        batch_op.drop_column('from_cache')
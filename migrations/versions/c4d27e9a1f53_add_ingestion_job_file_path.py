@@ -0,0 +1,28 @@
+"""Add ingestion_jobs.file_path for revised uploads awaiting indexing
+
+Revision ID: c4d27e9a1f53
+Revises: 8b5e0d4c62a7
+Create Date: 2026-10-18 18:20:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4d27e9a1f53'
+down_revision = '8b5e0d4c62a7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Skipped when db.create_all() already created the column
+    columns = {column['name'] for column in sa.inspect(op.get_bind()).get_columns('ingestion_jobs')}
+    if 'file_path' not in columns:
+        op.add_column('ingestion_jobs', sa.Column('file_path', sa.String(length=255), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('ingestion_jobs') as batch_op:
+        batch_op.drop_column('file_path')
@@ -1,3 +1,4 @@
+import tempfile
 import pytest
 from app import create_app, db
 from app.config import Config
@@ -9,6 +10,9 @@ class TestConfig(Config):
     WTF_CSRF_ENABLED = False
     UPLOAD_FOLDER = 'tests/test_uploads'
     SECRET_KEY = 'test-secret-key'
+    INGESTION_ASYNC = False
+    LEXICAL_INDEX_DIR = tempfile.mkdtemp(prefix='lexical_index_')
+    GLOBAL_SEARCH_DIR = tempfile.mkdtemp(prefix='global_search_')
 
 @pytest.fixture(scope='function')
 def app():
@@ -0,0 +1,29 @@
+# tests/test_benchmarks.py
+from benchmarks.bench_ingestion import compare
+
+def result(stage, wall_time, pages=10):
+    return {'pages': pages, 'punctuation_density': 0.9, 'stage': stage, 'wall_time': wall_time}
+
+def test_compare_flags_only_stages_beyond_threshold():
+    baseline = [result('create_text_chunks', 1.0), result('store_vectors', 2.0),
+                result('generate_embeddings', 0.01)]
+    current = [result('create_text_chunks', 1.5), result('store_vectors', 2.1),
+               result('generate_embeddings', 0.05), result('create_text_chunks', 9.0, pages=100)]
+
+    regressions = compare(current, baseline, threshold=0.2)
+
+    # Noise-level baselines and cases missing from the baseline are ignored
+    assert [(r['stage'], r['pages'], r['ratio']) for r in regressions] == [('create_text_chunks', 10, 1.5)]
+
+def test_retrieval_eval_scores_first_chunk_covering_the_passage():
+    from benchmarks.eval_retrieval import locate_passage, score
+
+    document = "Grading. The midterm counts for 20 percent.  Late work loses 10 percent per day."
+    span = locate_passage(document, "late WORK loses 10\npercent")
+    assert document[span[0]:span[1]] == "Late work loses 10 percent"
+
+    partial = {'start': 0, 'end': span[0] + 5}  # Covers only "Late "
+    covering = {'start': span[0] - 10, 'end': len(document)}
+    rankings = [[partial, covering], [partial]]
+
+    assert score(rankings, [span, span], min_overlap=0.5) == {'recall': 0.5, 'mrr': 0.25}
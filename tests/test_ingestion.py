@@ -0,0 +1,185 @@
+# tests/test_ingestion.py
+import io
+import os
+import pytest
+from unittest.mock import Mock, patch
+from app.extensions import db, model_registry
+from app.models.ingestion_job import IngestionJob
+from app.models.syllabus import Syllabus
+from app.models.user import User
+
+@pytest.fixture
+def teacher_client(client, app, tmp_path):
+    app.config['UPLOAD_FOLDER'] = str(tmp_path)
+    teacher = User(
+        username='testteacher',
+        email='teacher@example.com',
+        role='teacher',
+        is_approved=True
+    )
+    teacher.set_password('teacherpass')
+    db.session.add(teacher)
+    db.session.commit()
+    client.post('/login', data={
+        'username': 'testteacher',
+        'password': 'teacherpass'
+    }, follow_redirects=True)
+    return client
+
+def upload(client):
+    return client.post('/teacher/upload_syllabus', data={
+        'title': 'Computer Architecture',
+        'department': 'ECE',
+        'course_number': 'ECE 6913',
+        'syllabus_file': (io.BytesIO(b'%PDF-1.4 fake'), 'syllabus.pdf')
+    }, headers={'Accept': 'application/json'}, content_type='multipart/form-data')
+
+def test_upload_returns_job_and_reports_progress(teacher_client):
+    def fake_process_pdf(syllabus, progress_callback=None, file_name=None):
+        for stage in IngestionJob.STAGES:
+            progress_callback(stage, 1.0)
+        syllabus.vector_store_id = f"syllabus_{syllabus.id}"
+        return {'chunks': 3}
+
+    with patch('app.services.ingestion_queue.process_pdf', side_effect=fake_process_pdf):
+        response = upload(teacher_client)
+
+    assert response.status_code == 202
+    job_id = response.json['job_id']
+
+    status = teacher_client.get(response.json['status_url']).json
+    assert status['id'] == job_id
+    assert status['status'] == IngestionJob.DONE
+    assert status['progress'] == {'extracting': 1.0, 'embedding': 1.0, 'storing': 1.0}
+    assert status['result'] == {'chunks': 3}
+
+    details = teacher_client.get(f"/teacher/syllabus/{response.json['syllabus_id']}").json
+    assert details['status'] == 'active'
+    assert details['job']['id'] == job_id
+
+def test_failed_job_is_reported(teacher_client):
+    with patch('app.services.ingestion_queue.process_pdf', side_effect=ValueError('No text content')):
+        response = upload(teacher_client)
+
+    status = teacher_client.get(response.json['status_url']).json
+    assert status['status'] == IngestionJob.FAILED
+    assert 'No text content' in status['error']
+
+    syllabus = db.session.get(Syllabus, response.json['syllabus_id'])
+    assert syllabus.status == 'failed'
+
+
+def test_upload_is_not_saved_without_its_job(teacher_client, app, tmp_path):
+    queue = app.extensions['ingestion_queue']
+    with patch.object(queue, 'add', side_effect=RuntimeError('queue unavailable')):
+        upload(teacher_client)
+    assert Syllabus.query.count() == 0
+    assert list(tmp_path.iterdir()) == []
+
+    # A job committed but never started is left for recovery
+    with patch.object(queue, 'schedule', side_effect=RuntimeError('executor shut down')):
+        upload(teacher_client)
+    syllabus = Syllabus.query.one()
+    assert syllabus.latest_job.status == IngestionJob.QUEUED
+    assert os.path.exists(tmp_path / syllabus.file_path)
+
+
+def test_syllabus_is_not_deleted_while_its_job_runs(teacher_client, app):
+    with patch.object(app.extensions['ingestion_queue'], 'schedule'):
+        syllabus_id = upload(teacher_client).json['syllabus_id']
+
+    response = teacher_client.post(f'/teacher/delete_syllabus/{syllabus_id}', headers={'Accept': 'application/json'})
+    assert response.status_code == 409
+    assert db.session.get(Syllabus, syllabus_id) is not None
+
+    db.session.get(Syllabus, syllabus_id).latest_job.status = IngestionJob.FAILED
+    db.session.commit()
+    teacher_client.post(f'/teacher/delete_syllabus/{syllabus_id}')
+    db.session.expire_all()
+    assert db.session.get(Syllabus, syllabus_id) is None
+
+
+def test_revision_replaces_the_old_file_only_once_indexed(teacher_client, tmp_path):
+    def revise(name):
+        return teacher_client.post(f'/teacher/syllabus/{syllabus_id}/revise', data={
+            'syllabus_file': (io.BytesIO(b'%PDF-1.4 revised'), name)
+        }, headers={'Accept': 'application/json'}, content_type='multipart/form-data')
+
+    with patch('app.services.ingestion_queue.process_pdf', return_value={}):
+        syllabus_id = upload(teacher_client).json['syllabus_id']
+    original = db.session.get(Syllabus, syllabus_id).file_path
+
+    with patch('app.services.ingestion_queue.process_pdf', side_effect=ValueError('No text content')):
+        revise('broken.pdf')
+    db.session.expire_all()
+    assert db.session.get(Syllabus, syllabus_id).file_path == original
+    assert sorted(path.name for path in tmp_path.iterdir()) == [original]
+
+    with patch('app.services.ingestion_queue.process_pdf', return_value={}) as process:
+        revise('revised.pdf')
+    revised = process.call_args.kwargs['file_name']
+    assert revised.endswith('revised.pdf')
+    db.session.expire_all()
+    assert db.session.get(Syllabus, syllabus_id).file_path == revised
+    assert sorted(path.name for path in tmp_path.iterdir()) == [revised]
+
+
+def test_revised_syllabus_is_reindexed_incrementally(app, tmp_path, monkeypatch):
+    import chromadb
+    from benchmarks.corpus import write_syllabus_pdf
+    from app.services.pdf_service import process_pdf
+
+    from app.services.embedding_backends import HashingBackend
+
+    app.config['UPLOAD_FOLDER'] = str(tmp_path)
+    model = HashingBackend('hashing', dimension=64)
+    model.encode = Mock(wraps=model.encode)
+    model_registry._model = model
+    model_registry._chroma_client = chromadb.PersistentClient(path=str(tmp_path / 'chroma'))
+    monkeypatch.setattr(model_registry, 'embedding_cache_enabled', False)
+    syllabus = Mock(id=1, file_path='syllabus.pdf')
+
+    try:
+        write_syllabus_pdf(str(tmp_path / 'syllabus.pdf'), pages=4)
+        first = process_pdf(syllabus)
+        assert first['index'] == {'added': first['chunks'], 'removed': 0, 'unchanged': 0, 'moved': 0}
+
+        # Same first four pages plus a new one: only the tail is re-embedded
+        write_syllabus_pdf(str(tmp_path / 'syllabus.pdf'), pages=5)
+        model.encode.reset_mock()
+        second = process_pdf(syllabus)
+        report = second['index']
+        assert report['unchanged'] > 0
+        assert report['added'] == sum(len(call.args[0]) for call in model.encode.call_args_list)
+        assert report['added'] + report['unchanged'] == second['chunks']
+
+        collection = model_registry.get_chroma_client().get_collection('syllabus_1')
+        assert collection.count() == second['chunks']
+        pages = {metadata['page'] for metadata in collection.get(include=['metadatas'])['metadatas']}
+        assert pages == {1, 2, 3, 4, 5}
+    finally:
+        model_registry.reset()
+
+
+def test_recovery_leaves_jobs_of_live_workers_alone(app):
+    from datetime import datetime, timedelta
+    syllabus = Syllabus(title='Computer Architecture', department='ECE', course_number='ECE 6913',
+                        file_path='syllabus.pdf', user_id=1)
+    db.session.add(syllabus)
+    db.session.commit()
+    now = datetime.utcnow()
+    queued, running, abandoned, done = jobs = [
+        IngestionJob(syllabus_id=syllabus.id, status=IngestionJob.QUEUED),
+        IngestionJob(syllabus_id=syllabus.id, status=IngestionJob.EMBEDDING, started_at=now),
+        IngestionJob(syllabus_id=syllabus.id, status=IngestionJob.EMBEDDING, started_at=now - timedelta(hours=1)),
+        IngestionJob(syllabus_id=syllabus.id, status=IngestionJob.DONE, started_at=now - timedelta(hours=1)),
+    ]
+    db.session.add_all(jobs)
+    db.session.commit()
+
+    queue = app.extensions['ingestion_queue']
+    with patch.object(queue, '_schedule') as schedule:
+        assert queue.recover() == 2
+    assert [call.args[0] for call in schedule.call_args_list] == [queued.id, abandoned.id]
+    assert abandoned.status == IngestionJob.QUEUED
+    assert running.status == IngestionJob.EMBEDDING
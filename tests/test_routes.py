@@ -86,4 +86,134 @@ def test_admin_dashboard_access(client, session):
     # Access dashboard
     response = client.get('/admin/dashboard', follow_redirects=True)
     assert response.status_code == 200
-    assert b'Pending Teacher Approvals' in response.data
\ No newline at end of file
+    assert b'Pending Teacher Approvals' in response.data
+def test_student_search_ranks_syllabi_by_content(client, test_user, test_teacher, session):
+    from app.extensions import model_registry
+    from app.models.syllabus import Syllabus
+    from app.services.embedding_backends import HashingBackend
+    from app.services.global_search_index import section_vectors
+    backend = HashingBackend('hashing', dimension=128)
+    model_registry._model = backend
+    try:
+        for title, department, text in (('Architecture', 'ECE', "Caches and branch prediction."),
+                                        ('Algorithms', 'CS', "Graphs and dynamic programming.")):
+            syllabus = Syllabus(user_id=test_teacher.id, title=title, department=department,
+                                file_path='x.pdf', vector_store_id='indexed')
+            session.add(syllabus)
+            session.commit()
+            vectors, pages = section_vectors(backend.encode([text]), [1], 4)
+            model_registry.get_search_index().upsert(syllabus.id, department, vectors, pages)
+
+        client.post('/login', data={'username': 'testuser', 'password': 'testpass'})
+        response = client.get('/student/search?q=branch+prediction&per_page=1')
+        assert response.status_code == 200
+        assert response.json['results'][0]['title'] == 'Architecture'
+        assert response.json['total'] >= 1
+
+        response = client.get('/student/search?q=branch+prediction&department=CS')
+        assert all(result['department'] == 'CS' for result in response.json['results'])
+        assert client.get('/student/search').status_code == 400
+    finally:
+        model_registry.reset()
+
+class FakeStream:
+    """Stands in for an OpenAI completion stream."""
+    def __init__(self, pieces):
+        from unittest.mock import Mock
+        self.pieces = pieces
+        self.response = Mock()
+
+    def __iter__(self):
+        from types import SimpleNamespace
+        for piece in self.pieces:
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=piece))])
+
+def test_stream_message_relays_tokens_and_saves_chat_when_finished(client, test_user, test_teacher, session):
+    import json
+    from unittest.mock import patch
+    from app.models.chat import Chat
+    from app.models.syllabus import Syllabus
+    from app.extensions import model_registry
+    from app.services.embedding_backends import HashingBackend
+    syllabus = Syllabus(user_id=test_teacher.id, title='Architecture', department='ECE', file_path='x.pdf')
+    session.add(syllabus)
+    session.commit()
+    model_registry._model = HashingBackend('hashing', dimension=128)
+    client.post('/login', data={'username': 'testuser', 'password': 'testpass'})
+    context = [{'text': "Office hours are Monday.", 'similarity': 1.0, 'page': 2, 'position': 0}]
+
+    try:
+        with patch('app.services.vector_store_service.VectorStoreService.get_relevant_context', return_value=context), \
+                patch('app.services.llm_providers.openai.OpenAI') as get_client:
+            stream = FakeStream(["Office hours", None, " are Monday."])
+            get_client.return_value.chat.completions.create.return_value = stream
+            response = client.post(f'/student/chat/{syllabus.id}/stream', json={'message': "When are office hours?"})
+
+            assert response.mimetype == 'text/event-stream'
+            events = [(block.split('\n')[0][len('event: '):], json.loads(block.split('\n')[1][len('data: '):]))
+                      for block in response.get_data(as_text=True).strip().split('\n\n')]
+            assert [event for event, _ in events] == ['context', 'token', 'token', 'done']
+            assert events[0][1]['context'][0]['page'] == 2
+            chat = session.get(Chat, events[-1][1]['chat_id'])
+            assert chat.response == "Office hours are Monday."
+            assert 0 < chat.time_to_first_token <= chat.response_time
+
+            # A client that disconnects mid-answer cancels the completion and saves nothing
+            stream = FakeStream(["Office", " hours", " are", " Monday."])
+            get_client.return_value.chat.completions.create.return_value = stream
+            response = client.post(f'/student/chat/{syllabus.id}/stream', json={'message': "Office hours?"},
+                                   buffered=False)
+            body = response.iter_encoded()
+            assert next(body).startswith(b'event: context')
+            assert next(body).startswith(b'event: token')
+            response.close()
+            stream.response.close.assert_called_once()
+            assert Chat.query.count() == 1
+    finally:
+        model_registry.reset()
+
+    assert client.post(f'/student/chat/{syllabus.id}/stream', json={}).status_code == 400
+
+def test_repeated_question_is_answered_from_cache_and_flagged(client, test_user, test_teacher, session):
+    from datetime import datetime
+    from unittest.mock import patch
+    from app.models.ingestion_job import IngestionJob
+    from types import SimpleNamespace
+    from app.extensions import model_registry
+    from app.models.chat import Chat
+    from app.models.syllabus import Syllabus
+    from app.services.embedding_backends import HashingBackend
+    syllabus = Syllabus(user_id=test_teacher.id, title='Architecture', department='ECE', file_path='x.pdf')
+    session.add(syllabus)
+    session.commit()
+    model_registry._model = HashingBackend('hashing', dimension=128)
+    client.post('/login', data={'username': 'testuser', 'password': 'testpass'})
+    context = [{'text': "Office hours are Monday.", 'similarity': 1.0, 'page': 2, 'position': 0}]
+    completion = SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content="On Monday."))])
+
+    try:
+        with patch('app.services.vector_store_service.VectorStoreService.get_relevant_context', return_value=context), \
+                patch('app.services.llm_providers.openai.OpenAI') as get_client:
+            get_client.return_value.chat.completions.create.return_value = completion
+            url = f'/student/chat/{syllabus.id}/send'
+            response = client.post(url, json={'message': "When are office hours?"})
+            assert response.json['cached'] is False and response.json['coalesced'] is False
+            response = client.post(url, json={'message': "when are office hours"})
+            assert response.json['cached'] is True
+            assert response.json['response'] == "On Monday."
+            assert get_client.return_value.chat.completions.create.call_count == 1
+
+            # Re-ingesting the syllabus invalidates its answers
+            model_registry.invalidate_syllabus(syllabus.id)
+            assert client.post(url, json={'message': "When are office hours?"}).json['cached'] is False
+            assert client.post(url, json={'message': "When are office hours?"}).json['cached'] is True
+
+            # So does a re-ingestion finished by another process, seen only in the database
+            session.add(IngestionJob(syllabus_id=syllabus.id, status=IngestionJob.DONE, finished_at=datetime.utcnow()))
+            session.commit()
+            assert client.post(url, json={'message': "When are office hours?"}).json['cached'] is False
+
+        assert [chat.from_cache for chat in Chat.query.order_by(Chat.id)] == [False, True, False, True, False]
+        assert model_registry.get_stats()['answer_cache']['hits'] == 2
+    finally:
+        model_registry.reset()
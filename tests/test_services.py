@@ -1,8 +1,22 @@
 # tests/test_services.py
 import pytest
-from unittest.mock import Mock, patch
+from unittest.mock import MagicMock, Mock, patch
 import numpy as np
+import os
+import threading
+import time
+from app.extensions import model_registry
+from app.services.pdf_service import PDFProcessor
 from app.services.vector_store_service import VectorStoreService
+from app.services.text_chunker import TextChunker
+
+@pytest.fixture(autouse=True)
+def reset_model_registry(tmp_path, monkeypatch):
+    model_registry.reset()
+    monkeypatch.setattr(model_registry, 'lexical_index_dir', str(tmp_path / 'lexical'))
+    monkeypatch.setattr(model_registry, 'global_search_dir', str(tmp_path / 'search'))
+    yield
+    model_registry.reset()
 
 @pytest.fixture
 def mock_sentence_transformer():
@@ -17,7 +31,8 @@ def mock_sentence_transformer():
 def mock_chromadb():
     with patch('chromadb.PersistentClient') as mock:
         client = Mock()
-        collection = Mock()
+        collection = Mock(metadata=None)
+        collection.count.return_value = 10
         collection.query.return_value = {
             'documents': [['Sample text']],
             'distances': [[0.1]]
@@ -40,4 +55,632 @@ def test_vector_store_service_get_context(mock_sentence_transformer, mock_chroma
     assert 'text' in context[0]
     assert 'similarity' in context[0]
     assert context[0]['text'] == 'Sample text'
-    assert isinstance(context[0]['similarity'], float)
\ No newline at end of file
+    assert isinstance(context[0]['similarity'], float)
+
+def test_model_registry_shares_model_and_client(mock_sentence_transformer, mock_chromadb):
+    # Simulate concurrent chat requests hitting a cold registry
+    threads = [threading.Thread(target=lambda: VectorStoreService().model) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    processor = PDFProcessor()
+    vector_store = VectorStoreService()
+
+    assert processor.model is vector_store.model
+    assert processor.chroma_client is vector_store.chroma_client
+    assert mock_sentence_transformer.call_count == 1
+    assert mock_chromadb.call_count == 1
+
+    stats = model_registry.get_stats()
+    assert stats['model']['loaded']
+    assert stats['model']['load_time'] is not None
+    assert stats['chroma_client']['loaded']
+
+def test_streaming_chunks_match_full_text_chunking():
+    processor = PDFProcessor()
+    sentence = "Homework is due every Friday at noon. Late work loses ten percent per day. "
+    pages = [(number, (sentence * (number * 7)).strip()) for number in range(1, 6)]
+    full_text = " ".join(text for _, text in pages)
+
+    streamed = list(processor.iter_chunks(iter(pages), chunk_size=60, overlap=12))
+    expected = processor.create_text_chunks(full_text, chunk_size=60, overlap=12)
+
+    assert [chunk['text'] for chunk in streamed] == expected
+    assert [chunk['position'] for chunk in streamed] == list(range(len(expected)))
+    for chunk in streamed:
+        assert full_text[chunk['start']:chunk['end']].strip() == chunk['text']
+    assert streamed[0]['page'] == 1
+    assert streamed[-1]['page'] == 5
+
+
+def test_text_chunker_respects_token_budget_and_overlap():
+    chunker = TextChunker(chunk_size=50, overlap=10)
+    text = " ".join(f"Week {week} covers topic number {week} in detail." for week in range(200))
+
+    offsets = chunker.chunk_offsets(text)
+
+    assert offsets[0][0] == 0
+    assert offsets[-1][1] == len(text)
+    for (start, end), (next_start, _) in zip(offsets, offsets[1:]):
+        assert chunker.count_tokens(text[start:end]) <= 50
+        # Consecutive chunks overlap by whole sentences and always advance
+        assert start < next_start <= end
+        assert chunker.count_tokens(text[next_start:end]) <= 10
+
+def test_text_chunker_splits_unpunctuated_text_in_one_pass():
+    chunker = TextChunker(chunk_size=100, overlap=0)
+    text = " ".join(["syllabus"] * 100000)
+
+    offsets = chunker.chunk_offsets(text)
+
+    assert len(offsets) == -(-chunker.count_tokens(text) // 100)
+    assert all(start < next_start for (start, _), (next_start, _) in zip(offsets, offsets[1:]))
+    # Window edges drop a leading space, which can shift BPE counts by one
+    assert all(chunker.count_tokens(text[start:end]) <= 101 for start, end in offsets)
+
+def test_embedding_cache_skips_unchanged_chunks(tmp_path):
+    model_registry.embedding_cache_path = str(tmp_path / 'embeddings.sqlite3')
+    model = Mock(version='test-model')
+    model.encode.side_effect = lambda texts, **kwargs: np.random.rand(len(texts), 8)
+    model_registry._model = model
+    processor = PDFProcessor()
+
+    first = processor.generate_embeddings(["Office hours are on Thursday.", "The midterm is in week 8."])
+    # A revised syllabus: one chunk unchanged (modulo whitespace), one new
+    second = processor.generate_embeddings(["Office hours  are on Thursday.", "The final is in week 15."])
+
+    assert model.encode.call_args_list[-1].args[0] == ["The final is in week 15."]
+    assert np.array_equal(first[0], second[0])
+    assert second.dtype == np.float32
+
+    stats = model_registry.get_embedding_cache().get_stats()
+    assert stats['hits'] == 1
+    assert stats['misses'] == 3
+
+def test_embedding_cache_evicts_least_recently_used(tmp_path):
+    from app.services.embedding_cache import EmbeddingCache
+    vector_bytes = 8 * 4
+    cache = EmbeddingCache(str(tmp_path / 'embeddings.sqlite3'), max_bytes=4 * vector_bytes)
+
+    cache.put_many('model', ['a', 'b', 'c'], np.ones((3, 8)))
+    time.sleep(0.01)
+    cache.get_many('model', ['a'])
+    cache.put_many('model', ['d'], np.ones((1, 8)))
+    time.sleep(0.01)
+    cache.put_many('model', ['e'], np.ones((1, 8)))
+
+    # Over the cap: the least recently used entries (b, c) go first
+    assert sorted(cache.get_many('model', ['a', 'b', 'c', 'd', 'e'])) == [0, 3, 4]
+    assert cache.get_stats()['evictions'] == 2
+
+def test_parallel_extraction_matches_serial(tmp_path):
+    from benchmarks.corpus import write_syllabus_pdf
+    path = write_syllabus_pdf(str(tmp_path / 'syllabus.pdf'), pages=12)
+    processor = PDFProcessor()
+
+    serial = list(processor.iter_pages(path, workers=1))
+    parallel = list(processor.iter_pages(path, workers=2, parallel_threshold=1, pages_per_task=5))
+
+    assert [number for number, _ in serial] == list(range(1, 13))
+    assert parallel == serial
+
+    # A worker killed mid-job breaks the pool: its ranges are re-extracted
+    # serially and the next job gets a fresh pool
+    from app.services import pdf_extraction
+    broken = pdf_extraction.get_pool(2)
+    for process in list(broken._processes.values()):
+        process.kill()
+    assert list(processor.iter_pages(path, workers=2, parallel_threshold=1, pages_per_task=5)) == serial
+    assert pdf_extraction._pool is not broken
+    assert list(processor.iter_pages(path, workers=2, parallel_threshold=1, pages_per_task=5)) == serial
+
+def test_bucketed_encoder_batches_by_length_and_restores_order():
+    from app.services.batch_encoder import BucketedEncoder
+    model = Mock(max_seq_length=64)
+    model.encode.side_effect = lambda texts, **kwargs: np.array([[len(text)] for text in texts])
+    encoder = BucketedEncoder(model, batch_size=2, max_batch_size=8)
+
+    texts = ["word " * count for count in (60, 3, 40, 2, 61, 4, 1, 5)]
+    embeddings = encoder.encode(texts)
+
+    assert embeddings[:, 0].tolist() == [len(text) for text in texts]
+    batch_sizes = [len(call.args[0]) for call in model.encode.call_args_list]
+    # Sorted longest first, each pass stays within 2 x 64 padded tokens
+    assert batch_sizes == [2, 3, 3]
+    assert encoder.get_stats()['texts'] == 8
+
+def test_collections_refuse_queries_from_another_backend(tmp_path, monkeypatch):
+    import chromadb
+    from app.services.embedding_backends import EmbeddingMismatchError, HashingBackend
+    model_registry._chroma_client = chromadb.PersistentClient(path=str(tmp_path / 'chroma'))
+    monkeypatch.setattr(model_registry, 'embedding_cache_enabled', False)
+    model_registry._model = HashingBackend('hashing', dimension=32)
+
+    PDFProcessor().store_vectors(1, ["Office hours are on Thursday."], np.ones((1, 32)))
+    assert VectorStoreService().get_collection(1).metadata['embedding_version'] == 'hashing-v1/32'
+
+    model_registry._model = HashingBackend('hashing', dimension=64)
+    with pytest.raises(EmbeddingMismatchError):
+        VectorStoreService().get_collection(1)
+
+def test_hashing_backend_is_deterministic_and_normalized():
+    from app.services.embedding_backends import create_backend
+    backend = create_backend('hashing', 'unused', dimension=128)
+
+    first, second, empty = backend.encode(["Midterm in week 8", "midterm in WEEK 8", ""])
+
+    assert np.allclose(first, second)
+    assert np.isclose(np.linalg.norm(first), 1.0)
+    assert not empty.any()
+
+def test_relevant_context_returns_top_k_chunks_with_similarity(tmp_path, monkeypatch):
+    import chromadb
+    from app.services.embedding_backends import HashingBackend
+    model_registry._chroma_client = chromadb.PersistentClient(path=str(tmp_path / 'chroma'))
+    monkeypatch.setattr(model_registry, 'embedding_cache_enabled', False)
+    model_registry._model = HashingBackend('hashing', dimension=256)
+    chunks = [f"Week {week} covers topic number {week} in lecture." for week in range(1, 9)]
+    chunks[5] = "Office hours are Thursday afternoons in room 204."
+    processor = PDFProcessor()
+    processor.store_vectors(1, chunks, processor.generate_embeddings(chunks))
+    processor.store_vectors(2, chunks[:2], processor.generate_embeddings(chunks[:2]))
+
+    context = VectorStoreService(top_k=3, retrieval_mode='vector').get_relevant_context(1, "When are office hours?")
+
+    assert len(context) == 3
+    assert context[0]['text'] == chunks[5]
+    assert context[0]['position'] == 5
+    similarities = [item['similarity'] for item in context]
+    assert similarities == sorted(similarities, reverse=True)
+
+    # Short syllabi are sent whole, in document order
+    short = VectorStoreService(top_k=3, retrieval_mode='vector').get_relevant_context(2, "When are office hours?")
+    assert short == [{'text': " ".join(chunks[:2]), 'similarity': 1.0}]
+
+def test_lexical_index_ranks_by_bm25_and_updates_incrementally():
+    from app.services import lexical_index
+    from app.services.lexical_index import LexicalIndex
+    index = LexicalIndex.build([
+        ('a', "Office hours are Thursday in room 204.", {'page': 1, 'position': 0}),
+        ('b', "The midterm exam is worth 30 percent.", {'page': 1, 'position': 1}),
+        ('c', "Homework is due weekly; late homework loses 10 percent.", {'page': 2, 'position': 2}),
+    ])
+
+    hits = index.search("How much is late homework worth?", k=2)
+    assert [hit['id'] for hit in hits] == ['c', 'b']
+    assert hits[0]['matched_terms'] == 2 and hits[0]['query_terms'] == 4
+    assert hits[0]['page'] == 2
+
+    with patch.object(lexical_index, 'tokenize', wraps=lexical_index.tokenize) as tokenize:
+        updated = index.update([('d', "Quizzes are held every Friday.", {'position': 3})], ['b'],
+                               {'c': {'page': 3, 'position': 1}})
+    assert tokenize.call_count == 1
+    assert sorted(updated.ids.tolist()) == ['a', 'c', 'd']
+    assert updated.search("homework")[0]['page'] == 3
+    assert updated.search("midterm") == []
+
+def test_hybrid_retrieval_answers_literal_queries_without_the_model(tmp_path, monkeypatch):
+    import chromadb
+    from app.services.embedding_backends import HashingBackend
+    model_registry._chroma_client = chromadb.PersistentClient(path=str(tmp_path / 'chroma'))
+    monkeypatch.setattr(model_registry, 'embedding_cache_enabled', False)
+    model_registry._model = HashingBackend('hashing', dimension=256)
+    chunks = [f"Week {week} covers topic number {week} in lecture." for week in range(1, 9)]
+    chunks[5] = "Office hours are Thursday afternoons in room 204."
+    processor = PDFProcessor()
+    processor.store_vectors(1, chunks, processor.generate_embeddings(chunks))
+    service = VectorStoreService(top_k=3)
+
+    with patch.object(model_registry, 'get_model', side_effect=AssertionError("model loaded")):
+        context = service.get_relevant_context(1, "When are office hours?")
+    assert [item['text'] for item in context] == [chunks[5]]
+    assert model_registry.get_lexical_store().get_stats()['fast_path_answers'] == 1
+    with patch.object(model_registry, 'get_model', side_effect=AssertionError("model loaded")):
+        assert service.get_relevant_context(1, "Where is room 204?")[0]['text'] == chunks[5]
+    assert model_registry.get_lexical_store().get_stats()['fast_path_answers'] == 2
+
+    # A one-word question matching many chunks is not a literal lookup
+    common = service.get_relevant_context(1, "When is lecture?", include_embeddings=True)
+    assert len(common) == 3 and all('embedding' in item for item in common)
+    assert model_registry.get_lexical_store().get_stats()['fast_path_answers'] == 2
+
+    # Partial lexical matches are fused with the vector ranking
+    fused = service.get_relevant_context(1, "office schedule for week 3", include_embeddings=True)
+    assert len(fused) == 3
+    assert {chunks[2], chunks[5]} <= {item['text'] for item in fused}
+    scores = [item['score'] for item in fused]
+    assert scores == sorted(scores, reverse=True)
+    assert all(item['embedding'].shape == (256,) for item in fused)
+
+def test_numpy_vector_store_matches_chroma_retrieval(tmp_path, monkeypatch):
+    import chromadb
+    from app.services.embedding_backends import HashingBackend
+    from app.services.numpy_vector_store import NumpyVectorClient
+    monkeypatch.setattr(model_registry, 'embedding_cache_enabled', False)
+    model_registry._model = HashingBackend('hashing', dimension=256)
+    chunks = [f"Week {week} covers topic number {week} in lecture." for week in range(1, 9)]
+    chunks[5] = "Office hours are Thursday afternoons in room 204."
+    service = VectorStoreService(top_k=3, retrieval_mode='vector')
+    processor = PDFProcessor()
+
+    contexts = []
+    clients = (chromadb.PersistentClient(path=str(tmp_path / 'chroma')), NumpyVectorClient(str(tmp_path / 'numpy')))
+    for client in clients:
+        model_registry._chroma_client = client
+        processor.store_vectors(1, chunks, processor.generate_embeddings(chunks))
+        # Re-ingesting a revision upserts, relocates and deletes chunks in place
+        revised = chunks[:3] + chunks[4:] + ["Quizzes are every Friday."]
+        processor.store_vectors(1, revised, processor.generate_embeddings(revised))
+        contexts.append(service.get_relevant_context(1, "When are office hours?"))
+        assert client.get_collection('syllabus_1').count() == len(revised)
+
+    chroma_context, numpy_context = contexts
+    assert [item['id'] for item in numpy_context] == [item['id'] for item in chroma_context]
+    assert [item['position'] for item in numpy_context] == [item['position'] for item in chroma_context]
+    assert np.allclose([item['similarity'] for item in numpy_context],
+                       [item['similarity'] for item in chroma_context], atol=1e-5)
+    assert service.get_full_syllabus_content(1) == " ".join(revised)
+
+def test_syllabus_content_cache_serves_repeat_reads_until_reindexed(tmp_path, monkeypatch):
+    from app.services.embedding_backends import HashingBackend
+    from app.services.numpy_vector_store import NumpyVectorClient
+    from app.services.syllabus_cache import SyllabusContent, SyllabusContentCache
+    client = NumpyVectorClient(str(tmp_path / 'numpy'))
+    model_registry._chroma_client = client
+    monkeypatch.setattr(model_registry, 'embedding_cache_enabled', False)
+    model_registry._model = HashingBackend('hashing', dimension=32)
+    processor = PDFProcessor()
+    service = VectorStoreService()
+    chunks = ["Office hours are on Thursday.", "The midterm is in week 8."]
+    processor.store_vectors(1, chunks, processor.generate_embeddings(chunks))
+
+    with patch.object(SyllabusContent, 'from_collection', wraps=SyllabusContent.from_collection) as load:
+        assert service.get_full_syllabus_content(1) == " ".join(chunks)
+        assert service.get_full_syllabus_content(1) == " ".join(chunks)
+        assert load.call_count == 1
+
+        revised = chunks + ["Quizzes are weekly."]
+        processor.store_vectors(1, revised, processor.generate_embeddings(revised))
+        assert service.get_full_syllabus_content(1) == " ".join(revised)
+        assert load.call_count == 2
+
+        # Re-indexing in another process moves the shared version without invalidating here
+        monkeypatch.setattr(model_registry, 'content_version', lambda syllabus_id: '7:2026-10-18T16:00:00')
+        assert service.get_full_syllabus_content(1) == " ".join(revised)
+        assert service.get_full_syllabus_content(1) == " ".join(revised)
+        assert load.call_count == 3
+    stats = model_registry.get_syllabus_cache().get_stats()
+    assert (stats['hits'], stats['misses'], stats['stale']) == (2, 3, 1)
+
+    # The memory cap evicts least recently used syllabi
+    def load_small():
+        return SyllabusContent(['a'], ['x' * 100], [{}], None)
+    cache = SyllabusContentCache(max_entries=10, max_bytes=2 * load_small().size_bytes)
+    for syllabus_id in (1, 2, 3):
+        cache.get(syllabus_id, None, load_small)
+    assert cache.get_stats()['entries'] == 2
+    assert cache.get_stats()['evictions'] == 1
+
+def test_repeated_questions_reuse_cached_query_embeddings(monkeypatch):
+    from app.services.embedding_backends import HashingBackend
+    from app.services.query_embedding_cache import QueryEmbeddingCache
+    model_registry._model = HashingBackend('hashing', dimension=32)
+    service = VectorStoreService()
+
+    first = service.embed_query("When is the midterm?")
+    with patch.object(model_registry, 'get_model', side_effect=AssertionError("model used")):
+        again = service.embed_query("  when IS the   midterm ")
+    assert np.array_equal(first, again)
+    stats = model_registry.get_query_cache().get_stats()
+    assert (stats['hits'], stats['misses']) == (1, 1)
+
+    # Other model versions never share vectors, and expired entries are re-encoded
+    clock = [100.0]
+    monkeypatch.setattr('app.services.query_embedding_cache.time.monotonic', lambda: clock[0])
+    cache = QueryEmbeddingCache(max_entries=1, ttl=60)
+    encode = Mock(return_value=np.ones(4))
+    cache.get('v1', "midterm", encode)
+    cache.get('v2', "midterm", encode)
+    clock[0] += 61
+    cache.get('v2', "midterm", encode)
+    assert encode.call_count == 3
+    assert cache.get_stats()['evictions'] == 1
+    assert cache.get_stats()['expired'] == 1
+
+def test_global_search_ranks_syllabi_by_content_with_filters_and_pages(tmp_path):
+    from app.services.embedding_backends import HashingBackend
+    from app.services.global_search_index import GlobalSearchIndex, section_vectors
+    backend = HashingBackend('hashing', dimension=256)
+    syllabi = {
+        1: ('ECE', ["Course logistics and grading.", "Pipelining, caches and branch prediction."]),
+        2: ('CS', ["Course logistics and grading.", "Graph algorithms and dynamic programming."]),
+        3: ('ECE', ["Signals, sampling and Fourier transforms.", "Course logistics and grading."]),
+    }
+    index = GlobalSearchIndex(str(tmp_path / 'search'), max_sections=2)
+    for syllabus_id, (department, chunks) in syllabi.items():
+        vectors, pages = section_vectors(backend.encode(chunks), [1, 2], index.max_sections)
+        index.upsert(syllabus_id, department, vectors, pages)
+
+    query = backend.encode(["caches and branch prediction"])[0]
+    results, total = index.search(query, min_score=0.0)
+    assert results[0]['syllabus_id'] == 1
+    assert results[0]['page'] == 2
+    assert total == 3
+
+    ece, ece_total = index.search(query, department='ECE', min_score=0.0)
+    assert {result['syllabus_id'] for result in ece} == {1, 3} and ece_total == 2
+    second_page, _ = index.search(query, page=2, per_page=2, min_score=0.0)
+    assert len(second_page) == 1
+
+    # Deletes free the slot for reuse; another process sees changes on reload
+    index.remove(1)
+    vectors, pages = section_vectors(backend.encode(["Operating systems"]), [1], index.max_sections)
+    index.upsert(4, 'CS', vectors, pages)
+    reloaded = GlobalSearchIndex(str(tmp_path / 'search'), max_sections=2)
+    assert len(reloaded) == 3
+    assert reloaded.search(query, min_score=0.0)[0][0]['syllabus_id'] != 1
+    assert index.get_stats()['syllabi'] == 3
+    assert sorted(os.listdir(tmp_path / 'search')) == [f"syllabus_{i}.npz" for i in (2, 3, 4)]
+
+    # Later reloads read only the entries that changed
+    index.upsert(1, 'ECE', *section_vectors(backend.encode(["Caches and branch prediction"]), [1],
+                                            index.max_sections))
+    index.remove(3)
+    assert reloaded.search(query, min_score=0.0)[0][0]['syllabus_id'] == 1
+    assert len(reloaded) == 3
+    assert reloaded.get_stats()['reloaded_entries'] == 3 + 2
+
+def test_query_batcher_coalesces_concurrent_requests():
+    from app.services.query_batcher import QueryBatcher
+    calls = []
+
+    def encode(texts):
+        calls.append(list(texts))
+        if 'fail' in texts:
+            raise ValueError("model error")
+        return np.array([[len(text), 1.0] for text in texts])
+
+    batcher = QueryBatcher(encode, max_wait=0.05, max_batch_size=4)
+    results = {}
+    threads = [threading.Thread(target=lambda text=text: results.__setitem__(text, batcher.embed(text)))
+               for text in ('a', 'bb', 'ccc', 'dddd', 'eeeee', 'ffffff')]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert all(results[text][0] == len(text) for text in results) and len(results) == 6
+    assert len(calls) < 6
+    assert max(len(call) for call in calls) <= 4
+    stats = batcher.get_stats()
+    assert stats['requests'] == 6 and sum(size * count for size, count in stats['batch_sizes'].items()) == 6
+    assert stats['queue_delay_p95_ms'] is not None
+
+    with pytest.raises(ValueError):
+        batcher.embed('fail')
+    batcher.stop()
+    with pytest.raises(RuntimeError):
+        batcher.embed('late')
+
+def test_reinitializing_the_registry_stops_the_old_query_batcher(app):
+    batcher = model_registry.get_query_batcher()
+    model_registry.init_app(app)
+    assert not batcher._thread.is_alive()
+    assert model_registry.get_query_batcher() is not batcher
+
+def test_reinitializing_the_registry_closes_the_old_llm_client(app, monkeypatch):
+    monkeypatch.setenv('OPENAI_API_KEY', 'test')
+    client = model_registry.get_llm_client()
+    with patch.object(client, 'close', wraps=client.close) as close:
+        model_registry.init_app(app)
+    close.assert_called_once()
+    assert model_registry.get_llm_client() is not client
+
+def test_context_assembler_merges_neighbours_drops_duplicates_and_fits_budget():
+    from app.services.context_assembler import ContextAssembler
+    document = "Office hours are Thursday. They are in room 204. The midterm is in week 8. Quizzes are weekly."
+
+    def chunk(start, end, position, similarity, embedding):
+        return {'text': document[start:end], 'start': start, 'end': end, 'position': position,
+                'similarity': similarity, 'page': 1, 'embedding': np.array(embedding, dtype=np.float32)}
+
+    candidates = [
+        chunk(0, 48, 0, 0.9, [1, 0, 0]),
+        chunk(27, 75, 1, 0.8, [0, 1, 0]),       # Overlaps chunk 0 by "They are in room 204."
+        chunk(0, 48, 7, 0.85, [1, 0, 0.01]),    # Same text repeated elsewhere
+        chunk(76, 95, 3, 0.2, [0, 0, 1]),
+    ]
+    assembler = ContextAssembler(mmr_lambda=0.5)
+    # Room for the two merged neighbours but not the last chunk
+    assembler.token_budget = assembler.chunker.count_tokens(document[:75])
+
+    blocks, stats = assembler.assemble(candidates)
+
+    assert [block['text'] for block in blocks] == [document[:75]]
+    assert blocks[0]['positions'] == [0, 1]
+    assert stats['near_duplicates'] == 1
+    assert stats['over_budget'] == 1
+    assert stats['context_tokens'] == assembler.token_budget
+    assert stats['tokens_saved'] == stats['candidate_tokens'] - stats['context_tokens']
+
+def test_section_detection_tags_chunks_and_prefilters_targeted_questions(tmp_path, monkeypatch):
+    import chromadb
+    from app.services.embedding_backends import HashingBackend
+    from app.services.syllabus_sections import find_headings, query_section
+    assert [(section, heading) for _, section, heading in find_headings(
+        "COURSE SCHEDULE Week 1 intro. Late Policy: no late work. Office hours are Monday."
+    )] == [('schedule', 'COURSE SCHEDULE'), ('policies', 'Late Policy')]
+    assert query_section("How much is the final worth?") == 'grading'
+    assert query_section("Is the late policy graded?") is None  # Names two sections
+
+    processor = PDFProcessor()
+    pages = [(1, "Instructor. Dr. Lee, room 12."), (2, "Grading. Homework is worth 40 percent of the grade.")]
+    chunks = list(processor.iter_chunks(iter(pages), chunk_size=8, overlap=0))
+    assert {(chunk['page'], chunk.get('section')) for chunk in chunks} == {(1, 'contact'), (2, 'grading')}
+
+    model_registry._chroma_client = chromadb.PersistentClient(path=str(tmp_path / 'chroma'))
+    monkeypatch.setattr(model_registry, 'embedding_cache_enabled', False)
+    model_registry._model = HashingBackend('hashing', dimension=256)
+    texts = ["Grading. The midterm is worth 30 percent.", "The final is worth 40 percent.",
+             "Schedule. Week 1 is worth reviewing before the midterm.", "Week 2 covers the final project."]
+    processor.store_vectors(1, texts, processor.generate_embeddings(texts))
+
+    for mode in ('vector', 'hybrid'):
+        context = VectorStoreService(top_k=2, full_document_max_chunks=0, retrieval_mode=mode).get_relevant_context(
+            1, "How much is the midterm worth?"
+        )
+        assert [item['section'] for item in context] == ['grading', 'grading']
+    # A section with fewer chunks than requested is not filtered on
+    context = VectorStoreService(top_k=3, full_document_max_chunks=0, retrieval_mode='vector').get_relevant_context(
+        1, "How much is the midterm worth?"
+    )
+    assert len(context) == 3
+    assert model_registry.get_lexical_store().get_stats()['section_filtered_queries'] == 2
+    assert VectorStoreService().get_section_page(1, 'schedule') is None  # Chunks without pages
+
+    from app.services.numpy_vector_store import NumpyVectorClient
+    model_registry._chroma_client = NumpyVectorClient(str(tmp_path / 'numpy'))
+    processor.store_vectors(2, texts, processor.generate_embeddings(texts))
+    context = VectorStoreService(top_k=2, full_document_max_chunks=0, retrieval_mode='vector').get_relevant_context(
+        2, "How much is the midterm worth?"
+    )
+    assert [item['section'] for item in context] == ['grading', 'grading']
+
+def test_answer_cache_matches_similar_questions_until_invalidated(monkeypatch):
+    from app.services.answer_cache import AnswerCache
+    cache = AnswerCache(max_entries=2, ttl=60, threshold=0.9)
+    vectors = {"When are office hours?": np.array([1.0, 0.0, 0.0]),
+               "What time are office hours": np.array([0.95, 0.3, 0.0]),
+               "How is the course graded?": np.array([0.0, 1.0, 0.0])}
+    embed = Mock(side_effect=lambda question: vectors[question])
+
+    # Nothing cached for the syllabus, so the question is not even embedded
+    assert cache.get(1, 'j1', 'v1', "When are office hours?", embed) is None
+    embed.assert_not_called()
+    cache.put(1, 'j1', 'v1', "When are office hours?", vectors["When are office hours?"], "Mondays.", [])
+
+    assert cache.get(1, 'j1', 'v1', "  when are OFFICE hours", embed)['similarity'] == 1.0
+    embed.assert_not_called()
+    hit = cache.get(1, 'j1', 'v1', "What time are office hours", embed)
+    assert hit['answer'] == "Mondays." and 0.9 <= hit['similarity'] < 1.0
+    assert cache.get(1, 'j1', 'v1', "How is the course graded?", embed) is None
+    assert cache.get(2, 'j1', 'v1', "When are office hours?", embed) is None  # Another syllabus
+    assert cache.get(1, 'j1', 'v2', "When are office hours?", embed) is None  # Another embedding model
+
+    # Once the syllabus is re-indexed anywhere, answers for the old content are dropped
+    assert cache.get(1, 'j2', 'v1', "When are office hours?", embed) is None
+    assert cache.get_stats()['stale'] == 1
+    cache.put(1, 'j2', 'v1', "When are office hours?", vectors["When are office hours?"], "Tuesdays.", [])
+    cache.invalidate(1)
+    assert cache.get(1, 'j2', 'v1', "When are office hours?", embed) is None
+
+    for question in vectors:
+        cache.put(1, 'j2', 'v1', question, vectors[question], question, [])
+    stats = cache.get_stats()
+    assert stats['entries'] == 2 and stats['evictions'] == 1 and stats['exact_hits'] == 1
+
+    monkeypatch.setattr(time, 'monotonic', lambda: 1e12)
+    assert cache.get(1, 'j2', 'v1', "How is the course graded?", embed) is None
+    assert cache.get_stats()['expired'] == 2
+
+def test_llm_client_retries_caps_concurrency_and_hedges_slow_calls():
+    from app.services.llm_client import LLMClient, LLMSaturatedError, MIN_HEDGE_SAMPLES
+    from app.services.llm_providers import ProviderError
+
+    provider = Mock()
+    provider.complete.side_effect = [ProviderError("Upstream error"), "Mondays."]
+    llm = LLMClient(provider, max_concurrency=1, timeout=5, queue_timeout=0.05, backoff_base=0.01)
+    assert llm.complete([{'role': 'user', 'content': "Office hours?"}]) == "Mondays."
+    assert provider.complete.call_args.args[2] <= 5
+    stats = llm.get_stats()
+    assert stats['attempts'] == 2 and stats['retries'] == 1 and stats['errors'] == 1
+
+    # A second call cannot start while the only slot is held by a stream
+    pieces = MagicMock()
+    pieces.__iter__.return_value = iter(["Mon", "days."])
+    provider.stream.return_value = pieces
+    stream = llm.stream([{'role': 'user', 'content': "Office hours?"}])
+    assert next(stream) == "Mon"
+    with pytest.raises(LLMSaturatedError):
+        llm.complete([{'role': 'user', 'content': "Office hours?"}])
+    stream.close()
+    pieces.close.assert_called_once()
+    assert llm.get_stats()['in_flight'] == 0 and llm.get_stats()['rejected'] == 1
+
+    # Once latencies are known, a call slower than their p95 is raced by a hedge
+    replies = iter([0.5, 0.0])
+
+    def complete(*args, **kwargs):
+        time.sleep(next(replies))
+        return "Mondays."
+
+    hedged = LLMClient(Mock(complete=Mock(side_effect=complete)), max_concurrency=2, timeout=5, hedge=True,
+                       hedge_min_delay=0.01)
+    hedged._latencies.extend([0.01] * MIN_HEDGE_SAMPLES)
+    assert hedged.complete([{'role': 'user', 'content': "Office hours?"}]) == "Mondays."
+    stats = hedged.get_stats()
+    assert stats['hedges'] == 1 and stats['hedge_wins'] == 1
+    hedged.close()
+
+def test_fake_llm_server_answers_deterministically_over_the_openai_api():
+    import openai
+    from app.services.fake_llm_server import create_server
+    from app.services.llm_providers import FakeProvider, OpenAIProvider
+    messages = [{'role': 'user', 'content': "Question: When are office hours?"}]
+    fake = FakeProvider(latency_ms=1, latency_distribution='constant', tokens_per_second=1000, answer_tokens=5)
+    answer = fake.complete(messages, 'fake', None)
+    assert answer == fake.complete(messages, 'fake', None)
+    assert answer.startswith("[fake ") and answer.endswith(" When are office")
+
+    server = create_server(fake, port=0)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    provider = OpenAIProvider(base_url=f"http://127.0.0.1:{server.server_address[1]}/v1", api_key='fake')
+    try:
+        assert provider.complete(messages, 'fake', 5) == answer
+        assert "".join(provider.stream(messages, 'fake', 5)) == answer
+        assert provider.complete(messages, 'fake', 5, max_tokens=2) == "".join(fake.answer(messages, 2))
+
+        fake.error_rate = 1.0
+        with pytest.raises(openai.InternalServerError):
+            provider.complete(messages, 'fake', 5)
+    finally:
+        provider.close()
+        server.shutdown()
+        server.server_close()
+
+def test_single_flight_shares_one_computation_between_concurrent_callers():
+    from app.services.single_flight import FlightAbandoned, SingleFlight
+    flights = SingleFlight()
+    release = threading.Event()
+    compute = Mock(side_effect=lambda: release.wait(5) and "Mondays.")
+    results = []
+
+    def ask():
+        results.append(flights.do((1, 0, "when are office hours"), compute))
+
+    threads = [threading.Thread(target=ask) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    while flights.get_stats()['calls'] < 4:
+        time.sleep(0.001)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert compute.call_count == 1
+    assert sorted(results) == [("Mondays.", False)] + [("Mondays.", True)] * 3
+    stats = flights.get_stats()
+    assert stats['saved_calls'] == 3 and stats['largest_group'] == 4 and stats['in_flight'] == 0
+
+    # A follower whose leader gives up computes the answer itself
+    future, leader = flights.begin('key')
+    follower = threading.Thread(target=lambda: results.append(flights.do('key', lambda: "Own answer.")))
+    follower.start()
+    while flights.get_stats()['calls'] < 6:
+        time.sleep(0.001)
+    flights.finish('key', error=FlightAbandoned())
+    follower.join()
+    assert leader and results[-1] == ("Own answer.", False)
+    assert flights.get_stats()['abandoned'] == 1 and flights.get_stats()['saved_calls'] == 3